@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import json
+
+from vidnoz_changes import DeployFingerprints, fingerprint
+from vidnoz_progress import PROGRESS
+
+def test_fingerprint():
+    assert fingerprint(None) is None
+    assert fingerprint("") is None
+    assert fingerprint("共 20 条\n--\n第二页") == fingerprint("共 20 条\n--\n第二页")
+    assert fingerprint("共 20 条\n--\n第二页") != fingerprint("共 20 条\n--\n第二页 v2")
+    assert len(fingerprint("共 20 条")) == 16
+
+def test_only_changed_skips_deploys_whose_list_is_unchanged(tmp_path):
+    path = str(tmp_path / "deploy_fingerprints.json")
+    changes = DeployFingerprints().open(path, only_changed=True, site_wide=["更新公共样式"])
+    try:
+        changes.observe("faq-list", fingerprint("v1"), site="tw")
+        assert not changes.unchanged("faq-list", "更新faq全部列表", site="tw")
+        PROGRESS.emit("deploy", site="tw", page="faq-list", action="更新faq全部列表", result=True)
+        PROGRESS.emit("deploy", site="tw", page="faq-list", action="更新faq全部详情", result=False)
+        PROGRESS.emit("deploy", site="tw", page="faq-list", action="更新公共样式", result=True)
+    finally:
+        changes.close()
+    with open(path, 'r', encoding='utf-8') as f:
+        assert list(json.load(f)["tw"]["faq-list"]) == ["更新faq全部列表"]
+
+    changes = DeployFingerprints().open(path, only_changed=True, site_wide=["更新公共样式"])
+    try:
+        changes.observe("faq-list", fingerprint("v1"), site="tw")
+        assert changes.unchanged("faq-list", "更新faq全部列表", site="tw")
+        # Failed deploys and site-wide actions are never skipped
+        assert not changes.unchanged("faq-list", "更新faq全部详情", site="tw")
+        assert not changes.unchanged("faq-list", "更新公共样式", site="tw")
+        assert not changes.unchanged("faq-list", "更新faq全部列表", site="en")
+        assert changes.skipped == 1
+        changes.observe("faq-list", fingerprint("v2"), site="tw")
+        assert not changes.unchanged("faq-list", "更新faq全部列表", site="tw")
+        # A page without a list has no fingerprint and is always deployed
+        changes.observe("faq-list", None, site="tw")
+        assert not changes.unchanged("faq-list", "更新faq全部列表", site="tw")
+    finally:
+        changes.close()
+
+def test_nothing_is_skipped_without_only_changed():
+    changes = DeployFingerprints().open(None)
+    try:
+        changes.observe("faq-list", fingerprint("v1"), site="tw")
+        PROGRESS.emit("deploy", site="tw", page="faq-list", action="更新faq全部列表", result=True)
+        assert not changes.unchanged("faq-list", "更新faq全部列表", site="tw")
+        changes.only_changed = True
+        assert changes.unchanged("faq-list", "更新faq全部列表", site="tw")
+    finally:
+        changes.close()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from vidnoz_http_engine import (HttpConnectionPool, interpret_response, load_endpoints, missing_endpoints,
+                                process_site_http, required_actions)
+from vidnoz_mock_server import MOCK_ENDPOINTS, MockConfig, start_mock_server
+from vidnoz_plan import build_plan
+from vidnoz_rate_limit import LIMITER
+
+USERNAME = "lixiaohui@qq.com"
+PASSWORD = "123456"
+
+@pytest.fixture
+def mock_panel():
+    LIMITER.configure({"default": {"rate": 1000.0, "burst": 1000}})
+    servers = []
+
+    def start(**config):
+        server = start_mock_server(0, config=MockConfig(**config))
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    LIMITER.configure()
+
+@pytest.fixture
+def pool():
+    pool = HttpConnectionPool(timeout=10)
+    yield pool
+    pool.close()
+
+def site_url(server, site):
+    return f"http://{site}.localhost:{server.server_port}/frontend/login"
+
+def test_interpret_response():
+    assert interpret_response(200, {"code": 0}) is True
+    assert interpret_response(200, {"code": 500, "msg": "Deploy failed"}) is False
+    assert interpret_response(401, {"code": 401}) is False
+    assert interpret_response(502, None) is None
+    assert interpret_response(429, None) is None
+    assert interpret_response(429, {"code": 429, "msg": "Too many requests"}) is None
+    assert interpret_response(200, None) is None
+
+def test_endpoints_must_be_configured(tmp_path):
+    assert load_endpoints(str(tmp_path / "missing.json")) == {"login": None, "actions": {}}
+    assert missing_endpoints(load_endpoints(None), ["更新公共样式"]) == ["login", "更新公共样式"]
+    actions = required_actions(True, site_ids=["tw", "en"])
+    assert len(actions) == 7
+    assert missing_endpoints(MOCK_ENDPOINTS, actions) == []
+    path = tmp_path / "http_endpoints.json"
+    path.write_text('{"login": "/api/login", "actions": {"更新公共样式": "/api/style"}}', encoding="utf-8")
+    endpoints = load_endpoints(str(path))
+    assert missing_endpoints(endpoints, required_actions(False)) == []
+    assert missing_endpoints(endpoints, actions) == actions[1:]
+
+def test_single_page_run(mock_panel, pool):
+    server = mock_panel()
+    assert process_site_http(pool, site_url(server, "tw"), "tw", USERNAME, PASSWORD, endpoints=MOCK_ENDPOINTS) is True
+    assert server.mock_state.deploys == [("tw.localhost", "update-common-style", True)]
+
+def test_multi_page_run_deploys_every_action_once(mock_panel, pool):
+    server = mock_panel()
+    assert process_site_http(pool, site_url(server, "en"), "en", USERNAME, PASSWORD, multi_page=True,
+                             endpoints=MOCK_ENDPOINTS) is True
+    actions = [action for site, action, ok in server.mock_state.deploys]
+    assert actions == [
+        "update-common-style", "update-blog-list", "update-blog-detail", "update-faq-list",
+        "update-faq-detail", "update-pressroom-list", "update-pressroom-detail",
+    ]
+    assert {site for site, action, ok in server.mock_state.deploys} == {"en.localhost"}
+    # Keep-alive connections are reused across the requests of the site
+    assert len(pool._idle) == 1
+
+def test_missing_optional_page_is_skipped(mock_panel, pool):
+    server = mock_panel(has_pressroom=False)
+    steps = build_plan()
+    assert process_site_http(pool, site_url(server, "tw"), "tw", USERNAME, PASSWORD, multi_page=True,
+                             endpoints=MOCK_ENDPOINTS, steps=steps) is True
+    assert len(server.mock_state.deploys) == 5
+
+def test_failed_login_and_failed_deploy(mock_panel, pool):
+    server = mock_panel(failure_rate=1.0)
+    assert process_site_http(pool, site_url(server, "tw"), "tw", USERNAME, "wrong", endpoints=MOCK_ENDPOINTS) is False
+    assert server.mock_state.deploys == []
+    assert process_site_http(pool, site_url(server, "tw"), "tw", USERNAME, PASSWORD, multi_page=True,
+                             endpoints=MOCK_ENDPOINTS) is False
+    # The run stops at the first failed deploy
+    assert server.mock_state.deploys == [("tw.localhost", "update-common-style", False)]
+
+def test_unreachable_backend_is_unknown(pool):
+    assert process_site_http(pool, "http://127.0.0.1:9/frontend/login", "tw", USERNAME, PASSWORD,
+                             endpoints=MOCK_ENDPOINTS) is None
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import json
+
+from vidnoz_journal import DRY_RUN_SUFFIX, RunJournal, journal_path, latest_run, new_run_id
+from vidnoz_plan import build_plan
+from vidnoz_progress import PROGRESS
+
+SITES = {"tw": "http://manage-tw.vidnoz.com", "en": "http://manage.vidnoz.com", "jp": "http://manage-jp.vidnoz.com"}
+
+def deploy(site, page, action, result=True):
+    return {"event": "deploy", "site": site, "page": page, "action": action, "result": result}
+
+def finished(site, result, **fields):
+    return {"event": "site_finished", "site": site, "result": result, **fields}
+
+def test_sites_to_run():
+    journal = RunJournal()
+    for entry in (finished("tw", True), finished("en", False), {"event": "site_started", "site": "jp"}):
+        journal.record(entry)
+    assert list(journal.sites_to_run(SITES)) == ["en", "jp"]
+    assert list(journal.sites_to_run(SITES, retry_failed=True)) == ["en"]
+
+def test_cancelled_site_runs_again():
+    journal = RunJournal()
+    journal.record(finished("tw", None, cancelled=True))
+    assert list(journal.sites_to_run(SITES)) == ["tw", "en", "jp"]
+    assert journal.result("tw") is None
+    assert list(journal.sites_to_run(SITES, retry_failed=True)) == []
+
+def test_remaining_steps_skips_successful_deploys():
+    journal = RunJournal()
+    steps = build_plan()
+    assert journal.remaining_steps("tw", steps) is steps
+    journal.record(deploy("tw", "aritcle-list", "更新公共样式"))
+    journal.record(deploy("tw", "aritcle-list", "更新blog全部列表"))
+    journal.record(deploy("tw", "faq-list", "更新faq全部列表", result=False))
+    remaining = journal.remaining_steps("tw", steps)
+    assert [(step.page, step.buttons) for step in remaining] == [
+        ("aritcle-list", ["更新blog全部详情"]),
+        ("faq-list", ["更新faq全部列表", "更新faq全部详情"]),
+        ("pressroom-list", ["更新pressroom全部列表", "更新pressroom全部详情"]),
+    ]
+    assert journal.remaining_steps("en", steps) is steps
+
+def test_site_wide_action_counts_on_any_page():
+    journal = RunJournal()
+    journal.record(deploy("tw", "faq-list", "更新公共样式"))
+    remaining = journal.remaining_steps("tw", build_plan())
+    assert remaining[0].buttons == ["更新blog全部列表", "更新blog全部详情"]
+
+def test_reopened_journal_replays_its_file(tmp_path):
+    path = str(tmp_path / "run" / "journal.jsonl")
+    journal = RunJournal().open(path)
+    try:
+        PROGRESS.emit("deploy", site="tw", page="faq-list", action="更新faq全部列表", result=True)
+        PROGRESS.emit("site_finished", site="en", result=True)
+    finally:
+        journal.close()
+    # A line cut short by a crash is ignored
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(finished("jp", True))[:20])
+
+    resumed = RunJournal().open(path, replay=True)
+    try:
+        assert ("faq-list", "更新faq全部列表") in resumed.sites["tw"].deployed
+        assert list(resumed.sites_to_run(SITES)) == ["tw", "jp"]
+    finally:
+        resumed.close()
+    # New entries start on a line of their own after the cut line
+    with open(path, 'r', encoding='utf-8') as f:
+        assert f.read().endswith("\n")
+
+def test_entries_are_kept_in_memory_without_a_file():
+    journal = RunJournal()
+    journal.record(deploy("tw", "faq-list", "更新faq全部列表"))
+    assert journal.path is None
+    assert ("faq-list", "更新faq全部列表") in journal.sites["tw"].deployed
+
+def test_new_run_does_not_replay_an_existing_journal(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(finished("tw", True)) + "\n")
+    journal = RunJournal().open(path)
+    try:
+        assert journal.sites == {}
+        assert list(journal.sites_to_run(SITES)) == ["tw", "en", "jp"]
+    finally:
+        journal.close()
+
+def test_run_ids_are_unique():
+    run_ids = {new_run_id() for _ in range(100)}
+    assert len(run_ids) == 100
+    assert new_run_id(dry_run=True).endswith(DRY_RUN_SUFFIX)
+
+def test_latest_run_skips_dry_runs(tmp_path):
+    runs_dir = str(tmp_path)
+    assert latest_run(runs_dir) is None
+    for run_id in ("20240610-093000-aaaaaa", "20240610-100000-bbbbbb" + DRY_RUN_SUFFIX, "20240610-110000-cccccc"):
+        RunJournal().open(journal_path(runs_dir, run_id)).close()
+    (tmp_path / "20240610-120000-dddddd").mkdir()
+    assert latest_run(runs_dir) == "20240610-110000-cccccc"
+    RunJournal().open(journal_path(runs_dir, "20240610-130000-eeeeee" + DRY_RUN_SUFFIX)).close()
+    assert latest_run(runs_dir) == "20240610-110000-cccccc"
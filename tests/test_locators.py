@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from vidnoz_capabilities import CapabilityCache
+from vidnoz_locators import LOGIN_BUTTON, locate
+
+class StubDriver:
+    """Answers the LOCATE script with the first strategy of the given names, in the order it got them"""
+
+    def __init__(self, matching):
+        self.matching = matching
+        self.orders = []
+
+    def execute_script(self, script, strategies, click):
+        self.orders.append([s["name"] for s in strategies])
+        for s in strategies:
+            if s["name"] in self.matching:
+                return {"element": object(), "strategy": s["name"], "text": "login"}
+        return None
+
+def test_fallback_wins_right_away_when_nothing_else_matches(tmp_path):
+    profile = CapabilityCache(str(tmp_path / "caps.json")).for_site("tw")
+    driver = StubDriver({"form-button"})
+    match = locate(driver, LOGIN_BUTTON, 10, click=True, profile=profile, key="login")
+    assert match.strategy == "form-button"
+    assert len(driver.orders) == 1
+    # A fallback is never remembered as the site's winner
+    assert profile.locator("login") is None
+
+def test_specific_strategy_beats_fallback_in_the_same_poll(tmp_path):
+    profile = CapabilityCache(str(tmp_path / "caps.json")).for_site("tw")
+    assert locate(StubDriver({"submit", "form-button"}), LOGIN_BUTTON, 1, profile=profile,
+                  key="login").strategy == "submit"
+    assert profile.locator("login") == "submit"
+    driver = StubDriver({"form-button"})
+    locate(driver, LOGIN_BUTTON, 1, profile=profile, key="login")
+    assert driver.orders[0] == ["submit", "xpath", "button-text", "form-button"]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from vidnoz_plan import DEFAULT_PLAN, build_plan, count_actions
+
+def pages_and_buttons(steps):
+    return [(step.page, step.buttons) for step in steps]
+
+def test_site_wide_action_runs_once_on_the_first_page():
+    steps = build_plan()
+    assert pages_and_buttons(steps) == [
+        ("aritcle-list", ["更新公共样式", "更新blog全部列表", "更新blog全部详情"]),
+        ("faq-list", ["更新faq全部列表", "更新faq全部详情"]),
+        ("pressroom-list", ["更新pressroom全部列表", "更新pressroom全部详情"]),
+    ]
+    assert count_actions(steps) == 7
+    assert steps[0].site_wide == ["更新公共样式"]
+    assert steps[2].optional
+
+def test_site_wide_action_moves_to_the_first_required_page():
+    plan = {
+        "site_wide_actions": ["更新公共样式"],
+        "pages": [
+            {"name": "pressroom-list", "buttons": ["更新公共样式", "更新pressroom全部列表"], "optional": True},
+            {"name": "faq-list", "buttons": ["更新faq全部列表", "更新公共样式"]},
+        ],
+    }
+    assert pages_and_buttons(build_plan(plan)) == [
+        ("pressroom-list", ["更新pressroom全部列表"]),
+        ("faq-list", ["更新公共样式", "更新faq全部列表"]),
+    ]
+
+def test_page_left_without_buttons_is_dropped():
+    plan = {
+        "site_wide_actions": ["更新公共样式"],
+        "pages": [
+            {"name": "home", "buttons": ["更新公共样式"]},
+            {"name": "faq-list", "buttons": ["更新公共样式", "更新faq全部列表"]},
+        ],
+    }
+    assert pages_and_buttons(build_plan(plan)) == [("home", ["更新公共样式"]), ("faq-list", ["更新faq全部列表"])]
+    plan["pages"][0]["optional"] = True
+    plan["pages"][0]["buttons"] = ["更新公共样式"]
+    assert pages_and_buttons(build_plan(plan)) == [("faq-list", ["更新公共样式", "更新faq全部列表"])]
+
+def test_site_overrides():
+    plan = dict(DEFAULT_PLAN, sites={
+        "tw": {"drop_pages": ["aritcle-list"]},
+        "en": {"add_pages": [{"name": "tools-list", "buttons": ["更新tools全部列表"]}],
+               "pages": [{"name": "faq-list", "buttons": ["更新faq全部列表"]}]},
+    })
+    assert [step.page for step in build_plan(plan, "tw")] == ["faq-list", "pressroom-list"]
+    assert build_plan(plan, "tw")[0].buttons[0] == "更新公共样式"
+    assert pages_and_buttons(build_plan(plan, "en")) == [
+        ("aritcle-list", ["更新公共样式", "更新blog全部列表", "更新blog全部详情"]),
+        ("faq-list", ["更新faq全部列表"]),
+        ("pressroom-list", ["更新pressroom全部列表", "更新pressroom全部详情"]),
+        ("tools-list", ["更新tools全部列表"]),
+    ]
+    # Overrides of one site leave the shared plan untouched
+    assert DEFAULT_PLAN["pages"][0]["buttons"][0] == "更新公共样式"
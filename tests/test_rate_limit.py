@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pytest
+
+from vidnoz_cancel import CancelToken
+from vidnoz_rate_limit import DEFAULT_LIMITS, RateLimiter, TokenBucket
+
+def make_bucket(**settings):
+    limits = dict(DEFAULT_LIMITS)
+    limits.update(settings)
+    return TokenBucket(**limits)
+
+def test_burst_is_free_then_callers_queue():
+    bucket = make_bucket(rate=1.0, burst=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    first = bucket.reserve()
+    second = bucket.reserve()
+    assert 0.9 < first <= 1.0
+    assert 1.9 < second <= 2.0
+
+def test_error_backs_off_down_to_min_rate():
+    bucket = make_bucket(rate=0.4, backoff=0.5, min_rate=0.05)
+    bucket.report(False)
+    assert bucket.rate == 0.2
+    for _ in range(10):
+        bucket.report(False)
+    assert bucket.rate == 0.05
+
+def test_error_drops_the_remaining_burst():
+    bucket = make_bucket(rate=1.0, burst=3)
+    bucket.report(False)
+    assert bucket.reserve() > 0
+
+def test_recovery_is_capped_at_max_rate():
+    bucket = make_bucket(rate=1.9, recovery=0.5, max_rate=2.0)
+    bucket.report(True)
+    assert bucket.rate == 2.0
+
+def test_configured_rate_above_max_rate_is_kept():
+    bucket = make_bucket(rate=100.0, max_rate=2.0)
+    bucket.report(True)
+    assert bucket.rate == 100.0
+    bucket.report(False)
+    for _ in range(2000):
+        bucket.report(True)
+    assert bucket.rate == 100.0
+
+def test_limiter_shares_buckets_within_a_group():
+    limiter = RateLimiter({
+        "default": {"rate": 0.5},
+        "groups": {"asia": {"hosts": ["manage-jp.vidnoz.com", "manage-kr.vidnoz.com"], "rate": 1.0}},
+        "hosts": {"manage.vidnoz.com": {"rate": 0.2}},
+    })
+    jp = limiter.bucket("http://manage-jp.vidnoz.com/frontend/login")
+    assert jp is limiter.bucket("http://manage-kr.vidnoz.com/frontend/login")
+    assert jp.rate == 1.0
+    assert limiter.bucket("http://manage.vidnoz.com/frontend/login").rate == 0.2
+    assert limiter.bucket("http://manage-tw.vidnoz.com/frontend/login").rate == 0.5
+    assert set(limiter.summary()) == {"asia", "manage.vidnoz.com", "manage-tw.vidnoz.com"}
+
+def test_async_wait_is_interrupted_by_cancelling_the_run():
+    limiter = RateLimiter({"default": {"rate": 0.1, "burst": 1}})
+    token = CancelToken()
+    url = "http://manage.vidnoz.com/frontend/login"
+
+    async def acquire_twice():
+        await limiter.acquire_async(url, cancel_token=token)
+        asyncio.get_running_loop().call_later(0.2, token.cancel)
+        await limiter.acquire_async(url, cancel_token=token)
+
+    started = time.monotonic()
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(acquire_twice())
+    assert time.monotonic() - started < 1
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+
+from vidnoz_session_cache import SessionCache, origin_of
+
+def write_cache(path, entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f)
+
+def entry(origin):
+    return {"saved_at": time.time(), "origin": origin, "cookies": [{"name": "token", "value": "x"}]}
+
+def test_origin_of():
+    assert origin_of("http://manage-tw.vidnoz.com/admin/index") == "http://manage-tw.vidnoz.com"
+
+def test_get_matching_origin(tmp_path):
+    cache_path = str(tmp_path / "session_cache.json")
+    write_cache(cache_path, {"tw": entry("http://manage-tw.vidnoz.com")})
+    cache = SessionCache(cache_path)
+    assert cache.get("tw", "http://manage-tw.vidnoz.com/admin")["cookies"][0]["name"] == "token"
+    assert cache.get("tw") is not None
+
+def test_get_drops_entry_of_another_origin(tmp_path):
+    cache_path = str(tmp_path / "session_cache.json")
+    write_cache(cache_path, {"tw": entry("http://manage-jp.vidnoz.com")})
+    cache = SessionCache(cache_path)
+    assert cache.get("tw", "http://manage-tw.vidnoz.com/admin") is None
+    with open(cache_path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == {}
+    assert SessionCache(cache_path).get("tw") is None
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from vidnoz_automation import run_sites_in_workers
+from vidnoz_cancel import CancelToken
+
+SITES = {f"site{i}": f"http://manage-{i}.vidnoz.com/frontend/login" for i in range(8)}
+
+def test_results_are_keyed_by_site():
+    results = run_sites_in_workers(SITES, 3, lambda site_id, site_url: site_id != "site3")
+    assert set(results) == set(SITES)
+    assert results["site0"] == {"url": SITES["site0"], "result": True, "cancelled": False}
+    assert results["site3"]["result"] is False
+
+def test_concurrency_is_bounded():
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def process_site(site_id, site_url):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return True
+
+    results = run_sites_in_workers(SITES, 3, process_site)
+    assert all(entry["result"] is True for entry in results.values())
+    assert active[1] == 3
+
+def test_worker_exception_does_not_lose_other_sites():
+    def process_site(site_id, site_url):
+        if site_id in ("site0", "site5"):
+            raise RuntimeError("browser crashed")
+        return None if site_id == "site6" else True
+
+    results = run_sites_in_workers(SITES, 1, process_site)
+    assert set(results) == set(SITES)
+    assert results["site0"]["result"] is False
+    assert results["site5"]["result"] is False
+    assert results["site6"]["result"] is None
+    assert results["site7"]["result"] is True
+
+def test_cancelled_run_stops_taking_sites():
+    token = CancelToken()
+
+    def process_site(site_id, site_url):
+        if site_id == "site1":
+            token.cancel()
+            return None
+        return True
+
+    results = run_sites_in_workers(SITES, 1, process_site, cancel_token=token)
+    assert results["site0"] == {"url": SITES["site0"], "result": True, "cancelled": False}
+    assert results["site1"]["cancelled"] is True
+    assert set(results) == {"site0", "site1"}
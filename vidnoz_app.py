@@ -3,27 +3,79 @@ import os
 import sys
 import json
 import time
-import random
-import traceback
+import logging
 import argparse
 import threading
+import queue
+import asyncio
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox
 
-from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException
+from vidnoz_driver_pool import DriverPool
+from vidnoz_session_cache import SessionCache
+from vidnoz_capabilities import CapabilityCache
+from vidnoz_plan import PlanStep, load_plan, build_plan, count_actions
+from vidnoz_waits import (RECORDER as WAIT_RECORDER, wait_until, load_page, document_ready, login_form_ready,
+                          login_finished, panel_ready, dialog_closed, overlays_cleared)
+from vidnoz_http_engine import (HttpConnectionPool, load_endpoints, missing_endpoints, process_site_http,
+                                required_actions)
+import vidnoz_scripts as scripts
+from vidnoz_locators import locate, button_with_text, LOGIN_BUTTON, CONFIRM_BUTTON
+from vidnoz_cdp import automate_vidnoz_async
+from vidnoz_rate_limit import LIMITER as RATE_LIMITER, load_rate_limits
+from vidnoz_trace import TRACER
+from vidnoz_telemetry import TELEMETRY
+from vidnoz_log import (LOG, LOG_FILE as DEFAULT_LOG_FILE, configure_logging, current_context, debug_enabled,
+                        log_context, add_handler, remove_handler)
+from vidnoz_log_view import LogSink, LogView, LEVELS, REFRESH_MS
+from vidnoz_progress_view import ProgressGrid
+from vidnoz_progress import PROGRESS
+from vidnoz_journal import JOURNAL, journal_path, latest_run, new_run_id
+from vidnoz_changes import (CHANGES, DEFAULT_FINGERPRINT_FILE, FINGERPRINT_SELECTOR, FINGERPRINT_MAX_PAGES,
+                            FINGERPRINT_PAGE_TIMEOUT, fingerprint)
+from vidnoz_load_profile import DEFAULT_LOAD_PROFILE, LOAD_PROFILES, apply_to_options, apply_to_driver
+from vidnoz_cancel import CancelToken, Cancelled, activate as activate_cancel_token
+from vidnoz_fixtures import DEFAULT_FIXTURE_FILE, start_replay_server, replay_sites
 
 # 配置变量
 DEFAULT_SITES = []
 EXECUTE_MULTI_PAGE_UPDATE = False
+UPDATE_PLAN_FILE = "update_plan.json"  # 可选的多页面更新计划（页面和按钮），见 vidnoz_plan.py
+PAGE_CONCURRENCY = 1  # 多页面模式下同一站点并行处理的页面数（每个页面使用独立的浏览器）
 LOGIN_WAIT_TIME = 15  # 等待登录完成的秒数
-SITE_INTERVAL_TIME = 20  # 站点之间等待的秒数
 LOGIN_RETRY_COUNT = 3  # 最大登录重试次数
 DEPLOYMENT_WAIT_TIME = 45  # 等待部署状态的秒数
+CONFIRM_DIALOG_WAIT_TIME = 6  # 点击按钮后等待确认对话框的秒数
+CONCURRENCY = 1  # 并行处理的站点数，每个站点使用独立的浏览器
+ENGINE = "browser"  # "browser" 驱动Chrome，"http" 直接调用管理后台的接口，"cdp" 通过DevTools协议异步驱动Chrome
+HTTP_ENDPOINTS_FILE = "http_endpoints.json"  # 管理后台的接口配置，http引擎必需
+HTTP_VERIFY_CERTIFICATES = True  # False 时http引擎接受自签名或无效的证书
+LOGIN_USERNAME = "lixiaohui@qq.com"  # 管理后台账号
+LOGIN_PASSWORD = "123456"
+USE_SESSION_CACHE = True  # 复用磁盘上缓存的登录会话以跳过登录流程
+SESSION_CACHE_FILE = "session_cache.json"  # 保存缓存会话的文件，按站点标识符索引
+SESSION_CACHE_MAX_AGE = 12 * 3600  # 缓存会话的最长有效秒数
+USE_CAPABILITY_CACHE = True  # 记住每个站点有效的定位器和存在的页面
+CAPABILITY_CACHE_FILE = "site_capabilities.json"  # 按站点标识存储的站点能力信息文件
+CAPABILITY_MAX_AGE = 7 * 24 * 3600  # 页面是否存在的记录超过此秒数后重新探测
+TRACE_ENABLED = True  # 每次运行把各站点的阶段耗时写入 RUNS_DIR/<运行ID>/trace.json
+RUNS_DIR = "runs"  # 运行记录目录，每次运行一个子目录
+COMMAND_TELEMETRY = False  # 按命令类型和调用位置统计每个WebDriver命令（有少量额外开销）
+TELEMETRY_TOP_N = 15  # 命令统计表输出的行数
+DRY_RUN_FIXTURE = DEFAULT_FIXTURE_FILE  # 演练模式回放的录制会话，见 vidnoz_fixtures.py
+REPLAY_SPEED = 1.0  # 演练回放速度，2 表示两倍速，0 表示无延迟
+LOG_LEVEL = "INFO"  # DEBUG 时还会记录（并获取）确认对话框文本等详细信息
+LOG_FILE = DEFAULT_LOG_FILE  # 每次运行的 JSON lines 日志（按大小轮转），None 表示不写文件
+LOG_CONSOLE = False  # 日志由界面的日志区域显示，不再写入标准输出
+CRASH_RECOVERY_ATTEMPTS = 2  # 浏览器在站点处理中途崩溃时，在新浏览器中继续该站点的最多次数
+ONLY_CHANGED = False  # 跳过列表页面自上次部署成功后没有变化的部署
+FINGERPRINT_FILE = DEFAULT_FINGERPRINT_FILE  # 上次部署成功时的列表指纹，见 vidnoz_changes.py
+LOAD_PROFILE = DEFAULT_LOAD_PROFILE  # 页面加载模式 "full"、"lean" 或 "minimal"，见 vidnoz_load_profile.py
+CLOSE_WAIT_SECONDS = 30  # 关闭窗口时最多等待运行线程退出的秒数，之后照常关闭浏览器池
 
 # 全局变量
 CURRENT_DRIVER = None    # 当前WebDriver实例
@@ -33,291 +85,115 @@ def take_screenshot(driver, name):
     """空函数，不进行截图"""
     return None
 
-def wait_and_click(driver, selector, by=By.CSS_SELECTOR, timeout=10, description="element"):
-    """等待元素出现并点击，带重试和详细日志"""
+def probe_logged_in(driver, timeout=10):
+    """等待登录表单或管理面板渲染完成，已登录时返回True"""
+    state = wait_until(driver, lambda d: d.execute_script(scripts.LOGIN_STATE), timeout, "session_probe",
+                       poll_frequency=0.25)
+    return state == "panel"
+
+@TRACER.traced("confirm_dialog")
+def handle_confirmation_dialog(driver, profile=None):
+    """处理确认对话框，点击'Sure'按钮
+
+    通过一次注入脚本等待可见的确认对话框，点击其中的确认按钮（sure/yes/ok/确认/confirm）并返回点击结果。
+    """
+    LOG.debug("最多等待 %s 秒等待确认对话框...", CONFIRM_DIALOG_WAIT_TIME)
+    strategies = profile.order("confirm", CONFIRM_BUTTON) if profile is not None else CONFIRM_BUTTON
+    start_time = time.time()
     try:
-        element = WebDriverWait(driver, timeout).until(
-            EC.element_to_be_clickable((by, selector))
-        )
-        print(f"找到 {description}，尝试点击...")
-        
-        try:
-            # 尝试使用JavaScript点击
-            driver.execute_script("arguments[0].click();", element)
-            print(f"成功使用JavaScript点击 {description}")
-            return True
-        except Exception as js_error:
-            print(f"JavaScript点击失败: {js_error}")
-            try:
-                # 尝试常规点击
-                element.click()
-                print(f"成功使用常规方式点击 {description}")
-                return True
-            except Exception as click_error:
-                print(f"常规点击失败: {click_error}")
-                return False
-    except TimeoutException:
-        print(f"等待 {description} 超时")
-        return False
+        outcome = scripts.run_async_script(driver, scripts.CONFIRM_DIALOG, CONFIRM_DIALOG_WAIT_TIME * 1000, strategies,
+                                           debug_enabled(), timeout=CONFIRM_DIALOG_WAIT_TIME + 10)
     except Exception as e:
-        print(f"等待/点击 {description} 错误: {e}")
-        return False
-
-def handle_confirmation_dialog(driver):
-    """处理确认对话框，点击'确认'按钮"""
-    confirmation_clicked = False
-    
-    # 尝试三次
-    for attempt in range(3):
+        LOG.warning("处理确认对话框时出错: %s", e)
+        outcome = None
+    outcome = outcome if isinstance(outcome, dict) else {}
+    confirmation_clicked = bool(outcome.get("clicked"))
+    WAIT_RECORDER.record("confirm_dialog_open", CONFIRM_DIALOG_WAIT_TIME, time.time() - start_time,
+                         confirmation_clicked)
+    if profile is not None:
+        profile.record_locator("confirm", outcome.get("strategy") if confirmation_clicked else None)
         if confirmation_clicked:
-            break
-            
-        print(f"尝试查找并点击确认按钮 (尝试 {attempt+1}/3)...")
-        
-        try:
-            # 获取页面上所有对话框的HTML用于调试
-            page_html = driver.page_source
-            dialog_html = ""
-            
-            dialogs = driver.find_elements(By.CSS_SELECTOR, ".el-message-box, .el-dialog, .modal, .dialog, [role='dialog']")
-            print(f"找到 {len(dialogs)} 个可能的对话框")
-            
-            for i, dialog in enumerate(dialogs):
-                try:
-                    dialog_html += f"\n对话框 {i+1} HTML: {dialog.get_attribute('outerHTML')}"
-                    
-                    # 检查对话框是否可见
-                    if not dialog.is_displayed():
-                        print(f"对话框 {i+1} 不可见，跳过")
-                        continue
-                        
-                    print(f"分析对话框 {i+1}, 文本: {dialog.text}")
-                    
-                    # 如果对话框包含"确认更新"文本
-                    if "确认更新" in dialog.text or "确认" in dialog.text:
-                        print(f"对话框 {i+1} 包含确认文本")
-                        
-                        # 查找所有按钮
-                        buttons = dialog.find_elements(By.TAG_NAME, "button")
-                        print(f"在对话框中找到 {len(buttons)} 个按钮")
-                        
-                        # 遍历所有按钮
-                        for j, button in enumerate(buttons):
-                            try:
-                                button_text = button.text.strip().lower()
-                                print(f"按钮 {j+1} 文本: '{button_text}'")
-                                
-                                if any(text in button_text for text in ['sure', 'yes', 'ok', '确认', 'confirm']):
-                                    print(f"找到确认按钮: '{button_text}'")
-                                    
-                                    try:
-                                        # 使用JavaScript点击
-                                        driver.execute_script("arguments[0].click();", button)
-                                        print("使用JavaScript点击确认按钮")
-                                        confirmation_clicked = True
-                                        time.sleep(1)
-                                        break
-                                    except Exception as js_error:
-                                        print(f"JavaScript点击失败: {js_error}")
-                                        try:
-                                            # 尝试常规点击
-                                            button.click()
-                                            print("使用常规方式点击确认按钮")
-                                            confirmation_clicked = True
-                                            time.sleep(1)
-                                            break
-                                        except Exception as click_error:
-                                            print(f"确认按钮的常规点击失败: {click_error}")
-                            except Exception as button_error:
-                                print(f"处理按钮 {j+1} 错误: {button_error}")
-                        
-                        # 如果点击成功，跳出对话框循环
-                        if confirmation_clicked:
-                            break
-                except Exception as dialog_error:
-                    print(f"处理对话框 {i+1} 错误: {dialog_error}")
-            
-            # 如果通过对话框没有找到按钮，尝试直接搜索
-            if not confirmation_clicked:
-                print("通过对话框未找到确认按钮，尝试直接搜索...")
-                
-                # 尝试多种选择器
-                selectors = [
-                    "//button[contains(., 'Sure')]",
-                    "//button[contains(., 'sure')]",
-                    "//button[contains(., '确认')]",
-                    "//button[contains(., 'Yes')]",
-                    "//button[contains(., 'OK')]",
-                    "//button[contains(., 'Confirm')]",
-                    ".el-button--primary",  # Element UI 主要按钮
-                    ".btn-primary",          # Bootstrap 主要按钮
-                    ".confirm-btn"           # 常见确认按钮类
-                ]
-                
-                for selector in selectors:
-                    try:
-                        selector_type = By.XPATH if selector.startswith("//") else By.CSS_SELECTOR
-                        buttons = driver.find_elements(selector_type, selector)
-                        
-                        print(f"选择器 '{selector}' 找到 {len(buttons)} 个按钮")
-                        
-                        for j, button in enumerate(buttons):
-                            if button.is_displayed() and button.is_enabled():
-                                try:
-                                    print(f"尝试点击按钮: {button.text}")
-                                    driver.execute_script("arguments[0].click();", button)
-                                    print(f"使用JavaScript点击按钮")
-                                    confirmation_clicked = True
-                                    time.sleep(1)
-                                    break
-                                except Exception as js_error:
-                                    print(f"JavaScript点击失败: {js_error}")
-                                    try:
-                                        button.click()
-                                        print(f"使用常规方式点击按钮")
-                                        confirmation_clicked = True
-                                        time.sleep(1)
-                                        break
-                                    except Exception as click_error:
-                                        print(f"常规点击失败: {click_error}")
-                        
-                        if confirmation_clicked:
-                            break
-                    except Exception as selector_error:
-                        print(f"使用选择器 '{selector}' 时出错: {selector_error}")
-            
-            # 保存当前尝试的调试信息
-            if not confirmation_clicked:
-                print("当前尝试未找到确认按钮")
-                print(f"页面对话框 HTML: {dialog_html}")
-        
-        except Exception as attempt_error:
-            print(f"在尝试 {attempt+1} 中查找确认按钮时出错: {attempt_error}")
-            traceback.print_exc()
-        
-        # 如果未点击且还有更多尝试，等待后再试
-        if not confirmation_clicked and attempt < 2:
-            print(f"等待2秒后进行下一次尝试...")
-            time.sleep(2)
+            profile.record_dialog(outcome)
     
-    return confirmation_clicked
+    if not confirmation_clicked:
+        LOG.warning("未找到确认按钮")
+        return False
+    
+    if outcome.get("strategy") == "dialog-text":
+        LOG.debug("已点击对话框中的确认按钮 '%s'，对话框内容: %s", outcome.get('button'), outcome.get('dialog'))
+    else:
+        LOG.debug("已点击主按钮 '%s'（未找到包含确认文本的对话框）", outcome.get('button'))
+    wait_until(driver, dialog_closed(), 1, "confirm_dialog_close")
+    return True
 
+@TRACER.traced("deployment_status")
 def check_deployment_status(driver, site_url):
-    """检查部署状态，返回True（成功），False（失败）或None（未知）"""
-    # 更长时间等待部署状态指示器
-    max_wait_time = DEPLOYMENT_WAIT_TIME  # 从30秒增加到45秒
+    """检查部署状态，返回True（成功），False（失败）或None（未知）
+
+    页面中注入的观察器在成功提示或登出提示出现时立即返回，整个等待只需一次WebDriver调用。
+    """
+    LOG.debug("最多等待 %s 秒获取部署状态...", DEPLOYMENT_WAIT_TIME)
     start_time = time.time()
-    deployment_status_found = False
+    try:
+        # 上一个按钮的成功提示可能仍然可见，只有新出现的提示才算数
+        status = scripts.run_async_script(driver, scripts.DEPLOYMENT_STATUS, DEPLOYMENT_WAIT_TIME * 1000, True,
+                                          timeout=DEPLOYMENT_WAIT_TIME + 10)
+    except Exception as e:
+        LOG.warning("检查部署状态时出错: %s", e)
+        status = None
+    status = status if isinstance(status, dict) else {}
+    WAIT_RECORDER.record("deployment_status", DEPLOYMENT_WAIT_TIME, time.time() - start_time,
+                         status.get("status") is not None)
     
-    while time.time() - start_time < max_wait_time and not deployment_status_found:
-        try:
-            # 检查部署失败（.blog-login元素）
-            login_elements = driver.find_elements(By.CSS_SELECTOR, ".blog-login")
-            if login_elements and any(element.is_displayed() for element in login_elements):
-                print("\n===================================")
-                print(f"[X] 站点 {site_url} 部署失败！系统可能已登出。")
-                print("===================================\n")
-                deployment_status_found = True
-                return False
-            
-            # 检查部署成功（.el-message--success元素）
-            success_elements = driver.find_elements(By.CSS_SELECTOR, ".el-message--success")
-            if success_elements and any(element.is_displayed() for element in success_elements):
-                print("\n===================================")
-                print(f"[+] 站点 {site_url} 部署成功！样式已更新。")
-                print("===================================\n")
-                deployment_status_found = True
-                return True
-            
-            # 扩展检查：寻找可能表示成功的元素
-            success_indicators = driver.find_elements(By.CSS_SELECTOR, ".success, .alert-success, .text-success")
-            if success_indicators and any(element.is_displayed() for element in success_indicators):
-                print("\n===================================")
-                print(f"[+] 站点 {site_url} 似乎已成功部署！找到成功指示器。")
-                print("===================================\n")
-                deployment_status_found = True
-                return True
-                
-            # 等待一下再次检查
-            time.sleep(1)
-            print(f"等待部署状态... 已等待 {int(time.time() - start_time)} 秒", end="\r")
-        except Exception as e:
-            print(f"检查部署状态时出错: {e}")
-            time.sleep(1)
+    if status.get("status") == "failure":
+        # 失败（包括错误提示）由调用方报告给限速器
+        if status.get("indicator") == "error":
+            LOG.error("[X] 站点 %s 部署被拒绝: %s", site_url, status.get('detail') or '')
+        else:
+            LOG.error("[X] 站点 %s 部署失败！系统可能已登出。", site_url)
+        return False
     
-    if not deployment_status_found:
-        print("\n===================================")
-        print(f"[!] 站点 {site_url} 部署状态未知！超时，请手动检查。")
-        print("===================================\n")
-        return None
+    if status.get("status") == "success":
+        if status.get("indicator") == "toast":
+            LOG.info("[+] 站点 %s 部署成功！样式已更新。", site_url)
+        else:
+            LOG.info("[+] 站点 %s 似乎已成功部署！找到成功指示器。", site_url)
+        LOG.info("%.1f 秒后出现状态: %s", status.get('waited', 0) / 1000, status.get('detail') or '')
+        return True
     
+    LOG.warning("[!] 站点 %s 部署状态未知！超时，请手动检查。", site_url)
     return None
 
-def click_button_with_confirmation(driver, button_text, site_url):
+@TRACER.traced("deploy {button_text}")
+def click_button_with_confirmation(driver, button_text, site_url, profile=None, page=None):
     """点击指定文本的按钮，处理确认对话框，检查部署状态"""
     try:
-        print(f"\n----- 尝试点击按钮: '{button_text}' -----")
-        
-        # 尝试查找按钮
-        button_found = False
-        
-        # 方法1：通过包含文本的XPath查找按钮
-        try:
-            button_xpath = f"//button[contains(., '{button_text}')]"
-            button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, button_xpath))
-            )
-            button_found = True
-            print(f"找到按钮: '{button_text}' (XPath)")
-        except:
-            print(f"通过XPath未找到按钮: '{button_text}'")
-        
-        # 方法2：遍历所有按钮
-        if not button_found:
-            print("尝试遍历所有按钮...")
-            buttons = driver.find_elements(By.TAG_NAME, "button")
-            for btn in buttons:
-                try:
-                    if button_text in btn.text and btn.is_displayed():
-                        button = btn
-                        button_found = True
-                        print(f"找到按钮: '{button_text}' (遍历)")
-                        break
-                except:
-                    continue
-        
-        if not button_found:
-            print(f"未找到按钮: '{button_text}'")
+        LOG.info("----- 尝试点击按钮: '%s' -----", button_text)
+        
+        # 按站点后台限速，部署按钮不会密集地打到同一个后台
+        RATE_LIMITER.acquire(site_url, "rate_limit_deploy", WAIT_RECORDER)
+        # 所有定位策略在同一个轮询循环中竞争，找到即点击
+        match = locate(driver, button_with_text(button_text), 10, "button_locate", click=True,
+                       profile=profile, key=button_text)
+        if not match:
+            LOG.warning("未找到按钮: '%s'", button_text)
             return False
-        
-        # 点击按钮
-        try:
-            driver.execute_script("arguments[0].click();", button)
-            print(f"使用JavaScript点击按钮: '{button_text}'")
-        except:
-            try:
-                button.click()
-                print(f"使用常规方式点击按钮: '{button_text}'")
-            except Exception as click_error:
-                print(f"无法点击按钮 '{button_text}': {click_error}")
-                return False
-        
-        # 等待确认对话框出现
-        print("等待确认对话框...")
-        time.sleep(2)
+        LOG.info("已点击按钮: '%s' (策略: %s)", button_text, match.strategy)
         
         # 处理确认对话框
-        confirmation_clicked = handle_confirmation_dialog(driver)
+        confirmation_clicked = handle_confirmation_dialog(driver, profile)
         
         if not confirmation_clicked:
-            print(f"\n===================================")
-            print(f"[!] 无法点击确认按钮，'{button_text}' 可能未执行。")
-            print("===================================\n")
+            LOG.warning("[!] 无法点击确认按钮，'%s' 可能未执行。", button_text)
             return False
         
         # 检查部署状态
-        print(f"检查 '{button_text}' 部署状态...")
+        LOG.debug("检查 '%s' 部署状态...", button_text)
         deployment_result = check_deployment_status(driver, site_url)
+        PROGRESS.emit("deploy", action=button_text, page=page, result=deployment_result)
+        if deployment_result is not None:
+            # 失败的部署会降低该后台的速率，成功后逐渐恢复
+            RATE_LIMITER.report(site_url, deployment_result)
         
         if deployment_result is False:
             # 部署失败，返回失败
@@ -327,317 +203,428 @@ def click_button_with_confirmation(driver, button_text, site_url):
         return True
         
     except Exception as e:
-        print(f"按钮点击过程 '{button_text}' 出错: {e}")
-        traceback.print_exc()
+        LOG.warning("按钮点击过程 '%s' 出错: %s", button_text, e, exc_info=True)
         return False
 
-def perform_multi_page_updates(driver, base_url):
-    """执行多页面按钮点击更新操作"""
+def page_fingerprint(driver):
+    """当前页面列表（包括所有分页）的指纹，没有列表时返回None"""
+    try:
+        return fingerprint(scripts.run_async_script(
+            driver, scripts.LIST_CONTENT, FINGERPRINT_SELECTOR, FINGERPRINT_MAX_PAGES,
+            FINGERPRINT_PAGE_TIMEOUT * 1000, timeout=FINGERPRINT_MAX_PAGES * FINGERPRINT_PAGE_TIMEOUT + 5))
+    except Exception:
+        return None
+
+@TRACER.traced("page {step.page}")
+def update_page(driver, base_url, step, buttons, profile=None, progress=""):
+    """访问更新计划中的一个页面并依次点击其按钮
+    
+    所有按钮部署成功返回True，任一失败返回False，可选页面不存在（未点击任何按钮）返回None。
+    """
+    page_url = f"{base_url}/frontend/page/{step.page}"
+    
+    if step.optional and profile is not None and profile.page_exists(step.page) is False:
+        LOG.info("%s已知此站点没有页面 %s，跳过", progress, step.page)
+        return None
+    
+    LOG.info("%s访问页面: %s", progress, page_url)
+    try:
+        load_page(driver, page_url, "list_page_navigate")
+        wait_until(driver, panel_ready(), 3, "list_page_load")
+    except Exception as e:
+        if not step.optional:
+            raise
+        LOG.warning("访问页面 %s 时出错: %s", step.page, e)
+        LOG.info("跳过页面 %s", step.page)
+        return None
+    
+    if step.optional:
+        # 可选页面可能不存在，检查预期按钮是否已渲染
+        if not wait_until(driver, panel_ready(buttons[0]), 5, "optional_page_probe"):
+            LOG.info("页面 %s 不存在或找不到预期按钮，跳过此页面", step.page)
+            if profile is not None:
+                profile.record_page(step.page, False)
+            return None
+        LOG.debug("页面 %s 存在，继续执行", step.page)
+        if profile is not None:
+            profile.record_page(step.page, True)
+    
+    # 跳过列表自上次部署成功后没有变化的操作，只有 --only-changed 时才读取列表（所有分页）
+    if CHANGES.only_changed:
+        CHANGES.observe(step.page, page_fingerprint(driver))
+        unchanged = [btn_text for btn_text in buttons if CHANGES.unchanged(step.page, btn_text)]
+        if unchanged:
+            LOG.info("%s页面 %s 自上次部署后没有变化，跳过: %s", progress, step.page, ", ".join(unchanged))
+            buttons = [btn_text for btn_text in buttons if btn_text not in unchanged]
+    
+    # 按顺序点击按钮
+    for btn_text in buttons:
+        if not click_button_with_confirmation(driver, btn_text, page_url, profile, step.page):
+            LOG.error("[X] 无法在页面 %s 上点击 '%s'，中止操作", step.page, btn_text)
+            return False
+        wait_until(driver, overlays_cleared(), 2, "between_buttons")  # 等待对话框和提示消失
+    return True
+
+def run_plan_sequentially(driver, base_url, steps, profile=None):
+    """在同一个浏览器中依次处理计划中的页面
+    
+    计划在可选页面上执行的全站操作，如果该页面不存在，会顺延到下一个页面执行。
+    """
+    carried = []
+    for index, step in enumerate(steps, 1):
+        buttons = carried + step.buttons
+        carried = []
+        result = update_page(driver, base_url, step, buttons, profile, f"[{index}/{len(steps)}] ")
+        if result is False:
+            return False
+        if result is None:
+            carried = [button for button in buttons if button not in step.buttons or button in step.site_wide]
+    return True
+
+def perform_multi_page_updates(driver, base_url, profile=None, steps=None, driver_pool=None):
+    """按更新计划执行多页面按钮点击更新操作
+    
+    steps 为站点的 PlanStep 列表（见 vidnoz_plan.build_plan）。PAGE_CONCURRENCY 大于1且提供了
+    浏览器池时，各页面在共享登录会话的多个浏览器中并行处理。
+    """
     if not EXECUTE_MULTI_PAGE_UPDATE:
-        print("\n多页面更新功能已禁用。要启用，请将 EXECUTE_MULTI_PAGE_UPDATE 设置为 True\n")
+        LOG.info("多页面更新功能已禁用。要启用，请将 EXECUTE_MULTI_PAGE_UPDATE 设置为 True")
         return True
     
-    print("\n===== 开始多页面更新操作 =====\n")
+    if steps is None:
+        steps = build_plan(load_plan(UPDATE_PLAN_FILE))
+    
+    LOG.info("===== 开始多页面更新操作 =====")
+    LOG.info("更新计划: %s 个页面共 %s 个操作", len(steps), count_actions(steps))
     
     try:
-        # 1. 文章列表页面 - aritcle-list
-        article_page = f"{base_url}/frontend/page/aritcle-list"
-        print(f"\n[1/3] 访问文章列表页面: {article_page}")
-        driver.get(article_page)
-        time.sleep(3)
-        
-        # 按顺序点击按钮
-        article_buttons = ["更新公共样式", "更新blog全部列表", "更新blog全部详情"]
-        for btn_text in article_buttons:
-            if not click_button_with_confirmation(driver, btn_text, article_page):
-                print(f"\n[X] 无法在文章页面上点击 '{btn_text}'，中止操作")
-                return False
-            time.sleep(2)  # 按钮之间等待
-        
-        # 2. FAQ列表页面 - faq-list
-        faq_page = f"{base_url}/frontend/page/faq-list"
-        print(f"\n[2/3] 访问FAQ列表页面: {faq_page}")
-        driver.get(faq_page)
-        time.sleep(3)
-        
-        # 按顺序点击按钮
-        faq_buttons = ["更新公共样式", "更新faq全部列表", "更新faq全部详情"]
-        for btn_text in faq_buttons:
-            if not click_button_with_confirmation(driver, btn_text, faq_page):
-                print(f"\n[X] 无法在FAQ页面上点击 '{btn_text}'，中止操作")
-                return False
-            time.sleep(2)  # 按钮之间等待
-        
-        # 3. 新闻页面 - pressroom-list（可能不存在）
-        pressroom_page = f"{base_url}/frontend/page/pressroom-list"
-        print(f"\n[3/3] 尝试访问新闻页面: {pressroom_page}")
-        
-        # 检查页面是否存在
-        try:
-            driver.get(pressroom_page)
-            time.sleep(3)
-            
-            # 检查页面是否加载了预期内容
-            try:
-                # 尝试找到至少一个按钮以确认页面已正确加载
-                WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.XPATH, "//button[contains(., '更新公共样式')]"))
-                )
-                print("新闻页面存在，继续执行")
-                
-                # 按顺序点击按钮
-                pressroom_buttons = ["更新公共样式", "更新pressroom全部列表", "更新pressroom全部详情"]
-                for btn_text in pressroom_buttons:
-                    if not click_button_with_confirmation(driver, btn_text, pressroom_page):
-                        print(f"\n[X] 无法在新闻页面上点击 '{btn_text}'，中止操作")
-                        return False
-                    time.sleep(2)  # 按钮之间等待
-                
-            except (TimeoutException, NoSuchElementException):
-                print("新闻页面不存在或找不到预期按钮，跳过此页面")
-        
-        except Exception as e:
-            print(f"访问新闻页面时出错: {e}")
-            print("跳过新闻页面更新")
-        
-        print("\n[+] 多页面更新操作已完成！")
-        return True
+        # 可选页面上的全站操作可能需要顺延到下一个页面，这种计划保持顺序执行
+        parallel = (PAGE_CONCURRENCY > 1 and driver_pool is not None and len(steps) > 1
+                    and not any(step.optional and step.site_wide for step in steps))
+        if parallel:
+            result = perform_page_groups_concurrently(driver, base_url, profile, steps, driver_pool)
+        else:
+            result = run_plan_sequentially(driver, base_url, steps, profile)
+        if result:
+            LOG.info("[+] 多页面更新操作已完成！")
+        return result
         
     except Exception as e:
-        print(f"\n[X] 多页面更新过程中出错: {e}")
-        traceback.print_exc()
-        return False 
+        LOG.error("[X] 多页面更新过程中出错: %s", e, exc_info=True)
+        return False
 
-def process_site(driver, site_url, site_label=None):
-    """处理单个站点的登录和更新操作"""
+def perform_page_groups_concurrently(driver, base_url, profile, steps, driver_pool):
+    """先执行全站操作，再在多个浏览器中并行处理计划中的页面
+    
+    辅助浏览器从浏览器池中借用，并获得已登录浏览器的cookie和localStorage；已登录的浏览器同样处理页面。
+    任一页面失败时返回False。
+    """
+    # 全站操作首先在已登录的浏览器中、在计划的页面上执行
+    host = next((step for step in steps if step.site_wide), None)
+    if host is not None:
+        site_wide_step = PlanStep(host.page, host.site_wide, host.optional)
+        if update_page(driver, base_url, site_wide_step, site_wide_step.buttons, profile, "[site-wide] ") is False:
+            return False
+    
+    groups = [PlanStep(step.page, [b for b in step.buttons if b not in step.site_wide], step.optional)
+              for step in steps]
+    groups = [group for group in groups if group.buttons]
+    worker_count = min(PAGE_CONCURRENCY, len(groups))
+    LOG.info("在 %s 个并行浏览器中处理 %s 个页面...", worker_count, len(groups))
+    
+    session = SessionCache.capture(driver)
+    group_queue = queue.Queue()
+    for index, group in enumerate(groups, 1):
+        group_queue.put((index, group))
+    results = []
+    results_lock = threading.Lock()
+    
+    def page_worker(worker_driver):
+        while True:
+            try:
+                index, group = group_queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = update_page(worker_driver, base_url, group, group.buttons, profile,
+                                     f"[{index}/{len(groups)}] ")
+            except Exception as e:
+                LOG.error("[X] 更新页面 %s 时出错: %s", group.page, e)
+                result = False
+            if result is False and not DriverPool.is_alive(worker_driver):
+                # 浏览器已失效：由其他浏览器继续该页面尚未部署的按钮
+                LOG.warning("[!] 浏览器在页面 %s 上失去响应，交由其他浏览器继续", group.page)
+                remaining = JOURNAL.remaining_steps(current_context().get("site"), [group])
+                if remaining:
+                    group_queue.put((index, remaining[0]))
+                return
+            with results_lock:
+                results.append(result)
+    
+    # 辅助浏览器在站点轨道下各自使用一个轨道
+    site_track = TRACER.current_track()
+    
+    def helper_worker():
+        with TRACER.track(f"{site_track} / {threading.current_thread().name}"), \
+                log_context(site=site_track, worker=threading.current_thread().name):
+            helper = None
+            try:
+                helper = driver_pool.acquire()
+                driver_pool.track_origin(helper, base_url)
+                if COMMAND_TELEMETRY:
+                    TELEMETRY.instrument(helper)
+                # 只能在站点的源上设置cookie
+                load_page(helper, base_url, "helper_navigate")
+                SessionCache.inject(helper, session)
+                page_worker(helper)
+            except Cancelled:
+                # 由站点自己的线程报告运行已取消
+                pass
+            except Exception as e:
+                # 剩余页面由其他浏览器处理
+                LOG.warning("[!] 并行浏览器出错: %s", e)
+            finally:
+                if helper is not None:
+                    driver_pool.release(helper)
+    
+    helpers = []
+    for worker_index in range(worker_count - 1):
+        helper = threading.Thread(target=helper_worker, name=f"page-worker-{worker_index+1}", daemon=True)
+        helper.start()
+        helpers.append(helper)
+    page_worker(driver)
+    for helper in helpers:
+        helper.join()
+    
+    if not group_queue.empty():
+        LOG.error("[X] 处理中的浏览器失效，剩余 %s 个页面未处理", group_queue.qsize())
+        return False
+    
+    if any(result is False for result in results):
+        LOG.error("[X] 并行多页面更新至少有一个页面失败")
+        return False
+    return True
+
+def process_site(driver, site_url, site_label=None, session_cache=None, capabilities=None, update_plan=None,
+                 driver_pool=None, cancel_token=None):
+    """处理单个站点的登录和更新操作
+    
+    提供 SessionCache 时，先恢复 site_label 对应的缓存会话，
+    只有在会话过期时才填写登录表单。
+    """
     try:
         label_info = f" [{site_label}]" if site_label else ""
-        print(f"\n===== 处理站点{label_info}: {site_url} =====")
+        LOG.info("===== 处理站点%s: %s =====", label_info, site_url)
         
         # 从URL中提取基本URL
         base_url = '/'.join(site_url.split('/')[:3])  # 获取http(s)://domain.com部分
         
-        print("导航到网站...")
+        # 该站点已知的定位器和页面信息
+        profile = capabilities.for_site(site_label) if capabilities and site_label else None
+        
+        TRACER.phase("navigate")
+        LOG.debug("导航到网站...")
         try:
-            driver.get(site_url)
+            RATE_LIMITER.acquire(site_url, "rate_limit_navigate", WAIT_RECORDER)
+            load_page(driver, site_url, "site_navigate")
         except Exception as e:
-            print(f"导航到站点时出错: {e}")
+            LOG.warning("导航到站点时出错: %s", e)
             take_screenshot(driver, "navigation_error")
             # 如果导航错误，尝试刷新
             try:
-                print("尝试刷新页面...")
-                driver.refresh()
-                time.sleep(2)
-            except:
+                LOG.info("尝试刷新页面...")
+                load_page(driver, name="nav_error_reload")
+                wait_until(driver, document_ready(), 2, "refresh_after_nav_error")
+            except Exception:
                 pass
         
-        # 添加随机延迟以避免速率限制
-        rand_delay = random.uniform(1, 3)
-        time.sleep(rand_delay)
+        TRACER.phase("session_restore")
+        # 先恢复缓存的会话，只有会话过期时才执行完整登录
+        session_restored = False
+        cached_session = session_cache.get(site_label, site_url) if session_cache and site_label else None
+        if cached_session:
+            LOG.info("恢复缓存的登录会话...")
+            SessionCache.inject(driver, cached_session)
+            load_page(driver, name="session_reload")
+            if probe_logged_in(driver):
+                LOG.info("缓存的会话仍然有效，跳过登录")
+                session_restored = True
+            else:
+                LOG.info("缓存的会话已过期，执行完整登录")
+                session_cache.invalidate(site_label)
+        
+        TRACER.phase("login")
+        # eager 和 none 加载策略下页面可能仍在渲染，先等待登录表单或后台出现
+        if not session_restored:
+            probe_logged_in(driver)
         
         # 登录重试
         login_success = False
         for login_attempt in range(LOGIN_RETRY_COUNT):
+            if cancel_token is not None:
+                cancel_token.check()
             # 检查是否需要登录（如果用户名输入存在）
             login_fields = driver.find_elements(By.CSS_SELECTOR, "input[placeholder='User Name']")
             if not login_fields or not any(field.is_displayed() for field in login_fields):
-                print("已经登录，无需再次登录")
+                LOG.info("已经登录，无需再次登录")
                 login_success = True
                 break
                 
             if login_attempt > 0:
-                print(f"\n----- 登录重试尝试 {login_attempt+1}/{LOGIN_RETRY_COUNT} -----")
+                LOG.info("----- 登录重试尝试 %s/%s -----", login_attempt+1, LOGIN_RETRY_COUNT)
                 # 重试前刷新页面
                 try:
-                    print("重试前刷新页面...")
-                    driver.refresh()
-                    time.sleep(3)
-                except:
+                    LOG.info("重试前刷新页面...")
+                    load_page(driver, name="login_retry_reload")
+                    wait_until(driver, document_ready(), 3, "login_retry_refresh")
+                except Exception:
                     pass
             
-            print("检测到登录页面，正在执行登录...")
+            LOG.info("检测到登录页面，正在执行登录...")
             try:
-                # 等待登录页面完全加载
-                time.sleep(3)
+                # 等待登录表单完全渲染
+                wait_until(driver, login_form_ready(), 3, "login_form")
                 
-                username_field = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "input[placeholder='User Name']"))
-                )
+                username_field = wait_until(driver, EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, "input[placeholder='User Name']")), 10, "login_username_field")
+                if username_field is None:
+                    raise TimeoutException("User Name field not found")
                 
-                print("输入用户名...")
+                LOG.debug("输入用户名...")
                 username_field.clear()  # 先清除字段
-                username_field.send_keys("lixiaohui@qq.com")
+                username_field.send_keys(LOGIN_USERNAME)
                 
-                print("输入密码...")
+                LOG.debug("输入密码...")
                 password_field = driver.find_element(By.CSS_SELECTOR, "input[placeholder='Password']")
                 password_field.clear()  # 先清除字段
-                password_field.send_keys("123456")
-                
-                print("点击登录按钮...")
-                login_button_clicked = False
+                password_field.send_keys(LOGIN_PASSWORD)
                 
-                # 首先尝试使用标准方法点击登录按钮
-                login_success = wait_and_click(driver, "//button[contains(., 'login')]", By.XPATH, 10, "登录按钮")
-                if not login_success:
-                    # 尝试其他方式查找提交按钮
-                    print("尝试其他方式查找登录按钮...")
-                    login_buttons = driver.find_elements(By.TAG_NAME, "button")
-                    for button in login_buttons:
-                        if button.is_displayed() and button.is_enabled():
-                            try:
-                                driver.execute_script("arguments[0].click();", button)
-                                print("使用JavaScript点击可能的登录按钮")
-                                login_button_clicked = True
-                                break
-                            except:
-                                try:
-                                    button.click()
-                                    print("点击可能的登录按钮")
-                                    login_button_clicked = True
-                                    break
-                                except:
-                                    continue
+                LOG.debug("点击登录按钮...")
+                RATE_LIMITER.acquire(site_url, "rate_limit_login", WAIT_RECORDER)
+                match = locate(driver, LOGIN_BUTTON, 10, "login_button_locate", click=True,
+                               profile=profile, key="login")
+                if match:
+                    LOG.info("已点击登录按钮 (策略: %s)", match.strategy)
                 else:
-                    login_button_clicked = True
-                
-                if not login_button_clicked:
-                    print("无法找到或点击任何登录按钮")
+                    LOG.warning("无法找到或点击任何登录按钮")
                     continue
                 
-                print(f"等待 {LOGIN_WAIT_TIME} 秒让登录完成...")
-                time.sleep(LOGIN_WAIT_TIME)  # 增加等待时间
+                LOG.debug("最多等待 %s 秒让登录完成...", LOGIN_WAIT_TIME)
+                wait_until(driver, login_finished(), LOGIN_WAIT_TIME, "login_complete")
                 
                 # 如果这是重试，尝试清除cookie和缓存
                 if login_attempt > 0:
-                    print("为此域清除cookie...")
+                    LOG.debug("为此域清除cookie...")
                     driver.delete_all_cookies()
-                    time.sleep(2)
                 
                 # 检查是否仍在登录页面
                 login_fields_after = driver.find_elements(By.CSS_SELECTOR, "input[placeholder='User Name']")
                 if login_fields_after and any(field.is_displayed() for field in login_fields_after):
-                    print("登录似乎失败，仍在登录页面")
+                    LOG.warning("登录似乎失败，仍在登录页面")
                     
                     # 检查任何错误消息
                     error_messages = driver.find_elements(By.CSS_SELECTOR, ".el-message--error, .error-message, .alert-danger")
                     if error_messages and any(msg.is_displayed() for msg in error_messages):
                         for msg in error_messages:
                             if msg.is_displayed():
-                                print(f"发现错误消息: {msg.text}")
+                                LOG.warning("发现错误消息: %s", msg.text)
+                    # 登录失败也会降低该后台的速率
+                    RATE_LIMITER.report(site_url, False)
                     
                     # 继续下一次重试尝试
                     continue
                 else:
-                    print("登录成功！")
+                    LOG.info("登录成功！")
+                    RATE_LIMITER.report(site_url, True)
                     login_success = True
                     break
                 
             except Exception as e:
-                print(f"登录过程中出错: {e}")
+                LOG.warning("登录过程中出错: %s", e)
                 take_screenshot(driver, "login_error")
-                traceback.print_exc()
+                LOG.debug("Traceback", exc_info=True)
                 # 继续下一次重试尝试
                 continue
         
         # 如果所有登录尝试失败，跳过此站点
         if not login_success:
-            print(f"\n[X] 站点{label_info}登录失败，经过 {LOGIN_RETRY_COUNT} 次尝试，跳过此站点")
+            LOG.error("[X] 站点%s登录失败，经过 %s 次尝试，跳过此站点", label_info, LOGIN_RETRY_COUNT)
             return False
         
+        TRACER.phase("session_save")
+        # 保存新的会话，下次运行可以跳过登录流程
+        if session_cache and site_label and not session_restored:
+            try:
+                session_cache.save(site_label, driver)
+                LOG.info("已缓存登录会话")
+            except Exception as e:
+                LOG.warning("缓存登录会话时出错: %s", e)
+        
+        TRACER.phase("panel_navigate")
         # 登录成功后重新导航到目标页面
-        print("重新导航到目标页面...")
-        driver.get(site_url)
-        time.sleep(5)  # 等待页面加载
+        LOG.info("重新导航到目标页面...")
+        load_page(driver, site_url, "panel_navigate_load")
+        wait_until(driver, panel_ready(), 5, "panel_after_login")  # 等待页面加载
         
+        TRACER.phase("update")
         # 检查是否应执行多页面更新
         if EXECUTE_MULTI_PAGE_UPDATE:
             # 执行多页面更新操作
-            multi_page_result = perform_multi_page_updates(driver, base_url)
+            steps = build_plan(update_plan or load_plan(UPDATE_PLAN_FILE), site_label)
+            # 续跑时跳过此前已成功的部署
+            steps = JOURNAL.remaining_steps(site_label, steps)
+            multi_page_result = perform_multi_page_updates(driver, base_url, profile, steps, driver_pool)
             if not multi_page_result:
-                print(f"\n[X] 站点{label_info}多页面更新操作失败")
+                LOG.error("[X] 站点%s多页面更新操作失败", label_info)
+                # 浏览器失效不代表会话失效，保留会话供恢复时使用
+                if session_cache and site_label and DriverPool.is_alive(driver):
+                    session_cache.invalidate(site_label)
                 return False
-            print(f"\n[+] 站点{label_info}多页面更新操作成功完成")
+            LOG.info("[+] 站点%s多页面更新操作成功完成", label_info)
             return True
             
         # 如果不执行多页面更新，执行单按钮更新
         # 查找并点击"更新公共样式"按钮
-        print("寻找更新按钮...")
+        LOG.debug("寻找更新按钮...")
         try:
-            # 尝试多种方法找到更新按钮
-            update_button_found = False
-            
-            # 方法1：XPath
-            try:
-                update_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//button[contains(., '更新公共样式')]"))
-                )
-                print("找到更新按钮 (XPath)")
-                update_button_found = True
-            except:
-                print("通过XPath未找到更新按钮")
-            
-            # 方法2：查找所有按钮
-            if not update_button_found:
-                print("尝试查找所有按钮...")
-                buttons = driver.find_elements(By.TAG_NAME, "button")
-                for button in buttons:
-                    try:
-                        if "更新公共样式" in button.text and button.is_displayed():
-                            update_button = button
-                            update_button_found = True
-                            print("找到更新按钮（通过遍历按钮）")
-                            break
-                    except:
-                        continue
-            
-            if not update_button_found:
-                print("未找到更新按钮，尝试截取当前页面...")
+            RATE_LIMITER.acquire(site_url, "rate_limit_deploy", WAIT_RECORDER)
+            match = locate(driver, button_with_text("更新公共样式"), 10, "update_button_locate", click=True,
+                           profile=profile, key="更新公共样式")
+            if not match:
+                LOG.warning("未找到更新按钮，尝试截取当前页面...")
                 take_screenshot(driver, "no_update_button")
                 return False
-            
-            print("点击更新按钮...")
-            try:
-                driver.execute_script("arguments[0].click();", update_button)
-                print("使用JavaScript点击更新按钮")
-            except:
-                try:
-                    update_button.click()
-                    print("使用常规方法点击更新按钮")
-                except Exception as click_error:
-                    print(f"无法点击更新按钮: {click_error}")
-                    take_screenshot(driver, "update_button_click_error")
-                    return False
+            LOG.info("已点击更新按钮 (策略: %s)", match.strategy)
             
             # 处理确认对话框
-            print("等待确认对话框...")
-            time.sleep(2)
-            take_screenshot(driver, "after_update_click")
-            
-            # 处理确认对话框
-            confirmation_clicked = handle_confirmation_dialog(driver)
+            confirmation_clicked = handle_confirmation_dialog(driver, profile)
             
             # 检查部署状态
             if confirmation_clicked:
-                print("已点击确认按钮，检查部署状态...")
+                LOG.info("已点击确认按钮，检查部署状态...")
                 deployment_result = check_deployment_status(driver, site_url)
+                PROGRESS.emit("deploy", action="更新公共样式", result=deployment_result)
+                if deployment_result is not None:
+                    RATE_LIMITER.report(site_url, deployment_result)
+                if deployment_result is False and session_cache and site_label:
+                    # 系统可能已登出，不再复用此会话
+                    session_cache.invalidate(site_label)
                 return deployment_result
             else:
-                print("\n===================================")
-                print(f"[!] 站点{label_info}无法点击确认按钮，部署可能未开始。")
-                print("===================================\n")
+                LOG.warning("[!] 站点%s无法点击确认按钮，部署可能未开始。", label_info)
                 take_screenshot(driver, "no_confirmation_button")
                 return False
                 
         except Exception as e:
-            print(f"\n[X] 站点{label_info}更新过程错误: {e}")
+            LOG.error("[X] 站点%s更新过程错误: %s", label_info, e)
             take_screenshot(driver, "update_process_error")
-            traceback.print_exc()
+            LOG.debug("Traceback", exc_info=True)
             return False
             
     except Exception as e:
-        print(f"\n[X] 站点{label_info}处理错误: {e}")
+        LOG.error("[X] 站点%s处理错误: %s", label_info, e)
         take_screenshot(driver, "process_site_error")
-        traceback.print_exc()
+        LOG.debug("Traceback", exc_info=True)
         return False
     
     return None  # 默认返回未知状态
@@ -655,7 +642,7 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
     """
     try:
         if not os.path.exists(file_path):
-            print(f"文件不存在: {file_path}")
+            LOG.error("文件不存在: %s", file_path)
             return None
             
         # 根据文件扩展名确定如何加载
@@ -669,7 +656,7 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
                 # 处理新格式：urls是一个字典
                 if isinstance(data, dict) and 'urls' in data and isinstance(data['urls'], dict):
                     sites_dict = data['urls']
-                    print(f"从JSON文件加载了 {len(sites_dict)} 个站点")
+                    LOG.info("从JSON文件加载了 %s 个站点", len(sites_dict))
                 
                 # 处理旧格式：urls是一个列表
                 elif isinstance(data, dict) and 'urls' in data and isinstance(data['urls'], list):
@@ -677,17 +664,17 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
                     # 使用索引作为键
                     for i, url in enumerate(urls_list):
                         sites_dict[f"site{i+1}"] = url
-                    print(f"从JSON文件加载了 {len(sites_dict)} 个站点（转换了旧格式）")
+                    LOG.info("从JSON文件加载了 %s 个站点（转换了旧格式）", len(sites_dict))
                 
                 # 处理直接列表
                 elif isinstance(data, list):
                     # 使用索引作为键
                     for i, url in enumerate(data):
                         sites_dict[f"site{i+1}"] = url
-                    print(f"从JSON文件加载了 {len(sites_dict)} 个站点（列表格式）")
+                    LOG.info("从JSON文件加载了 %s 个站点（列表格式）", len(sites_dict))
                 
                 else:
-                    print("无效的JSON格式，应该是URL字典、URL列表或带有'urls'键的对象")
+                    LOG.error("无效的JSON格式，应该是URL字典、URL列表或带有'urls'键的对象")
                     return None
                 
         elif ext == '.txt':
@@ -696,9 +683,9 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
                 lines = [line.strip() for line in f if line.strip()]
                 for i, url in enumerate(lines):
                     sites_dict[f"site{i+1}"] = url
-                print(f"从文本文件加载了 {len(sites_dict)} 个站点")
+                LOG.info("从文本文件加载了 %s 个站点", len(sites_dict))
         else:
-            print(f"不支持的文件类型: {ext}")
+            LOG.error("不支持的文件类型: %s", ext)
             return None
             
         # 应用包含和排除过滤器
@@ -707,17 +694,17 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
         if include_sites:
             # 仅包括指定站点
             include_list = include_sites.split(',')
-            print(f"仅包含这些站点: {include_list}")
+            LOG.info("仅包含这些站点: %s", include_list)
             for site_id in include_list:
                 if site_id in sites_dict:
                     filtered_dict[site_id] = sites_dict[site_id]
                 else:
-                    print(f"警告: 指定的包含站点 '{site_id}' 不存在")
+                    LOG.warning("指定的包含站点 '%s' 不存在", site_id)
         
         elif exclude_sites:
             # 排除指定站点
             exclude_list = exclude_sites.split(',')
-            print(f"排除这些站点: {exclude_list}")
+            LOG.info("排除这些站点: %s", exclude_list)
             for site_id, url in sites_dict.items():
                 if site_id not in exclude_list:
                     filtered_dict[site_id] = url
@@ -726,40 +713,16 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
             # 无过滤，使用所有站点
             filtered_dict = sites_dict
         
-        print(f"过滤后保留了 {len(filtered_dict)} 个站点")
+        LOG.info("过滤后保留了 %s 个站点", len(filtered_dict))
         
         return filtered_dict
         
     except Exception as e:
-        print(f"加载站点文件时出错: {e}")
-        traceback.print_exc()
+        LOG.error("加载站点文件时出错: %s", e, exc_info=True)
         return None 
 
-def automate_vidnoz(sites_dict=None):
-    """处理多个站点的主函数"""
-    if sites_dict is None or not sites_dict:
-        print("未提供有效的站点列表")
-        return {}
-    
-    # 显示要处理的站点
-    print(f"准备处理 {len(sites_dict)} 个站点:")
-    for i, (site_id, url) in enumerate(sites_dict.items()):
-        print(f"{i}. [{site_id}] {url}")
-    print("\n")
-    
-    # 显示多页面更新设置状态
-    if EXECUTE_MULTI_PAGE_UPDATE:
-        print("[!] 多页面更新功能已启用，将执行多页面按钮点击序列")
-    else:
-        print("[i] 多页面更新功能已禁用，仅执行常规公共样式更新")
-    
-    # 显示计时配置
-    print(f"[i] 登录等待时间: {LOGIN_WAIT_TIME} 秒")
-    print(f"[i] 站点间隔时间: {SITE_INTERVAL_TIME} 秒")
-    print(f"[i] 登录重试次数: {LOGIN_RETRY_COUNT}")
-    print(f"[i] 部署等待时间: {DEPLOYMENT_WAIT_TIME} 秒")
-    
-    # Chrome选项设置
+def create_chrome_options():
+    """创建所有浏览器实例共用的Chrome选项"""
     chrome_options = Options()
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
@@ -775,92 +738,439 @@ def automate_vidnoz(sites_dict=None):
     chrome_options.add_argument("--disable-extensions")
     # 设置窗口大小以确保元素可见（在无头模式下很重要）
     chrome_options.add_argument("--window-size=1920,1080")
+    # 加载模式的页面加载策略，并在渲染器中关闭图片
+    apply_to_options(chrome_options, LOAD_PROFILE)
     
     # 添加实验选项
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
     chrome_options.add_experimental_option("useAutomationExtension", False)
-    
-    # 添加特定站点处理
+    return chrome_options
+
+def setup_driver(driver):
+    """在新浏览器中屏蔽加载模式不需要的资源，由DriverPool调用"""
+    try:
+        apply_to_driver(driver, LOAD_PROFILE)
+    except Exception as e:
+        # 页面仍可使用，只是会加载全部资源
+        LOG.warning("屏蔽加载模式 %s 的资源时出错: %s", LOAD_PROFILE, e)
+
+def run_site_with_pooled_browser(site_id, site_url, driver_pool, session_cache=None, capabilities=None,
+                                 update_plan=None, cancel_token=None):
+    """使用浏览器池中的预热浏览器处理单个站点并返回结果"""
+    site_driver = None
+    try:
+        with TRACER.span("driver_acquire"):
+            site_driver = driver_pool.acquire()
+        driver_pool.track_origin(site_driver, site_url)
+        if COMMAND_TELEMETRY:
+            TELEMETRY.instrument(site_driver)
+        
+        # 处理此单个站点
+        result = process_site(site_driver, site_url, site_id, session_cache=session_cache,
+                              capabilities=capabilities, update_plan=update_plan, driver_pool=driver_pool,
+                              cancel_token=cancel_token)
+        for attempt in range(1, CRASH_RECOVERY_ATTEMPTS + 1):
+            if result is not False or DriverPool.is_alive(site_driver):
+                break
+            if cancel_token is not None:
+                cancel_token.check()
+            # 浏览器在站点处理中途崩溃或卡死：新浏览器恢复登录，
+            # 继续运行日志中尚未记录为部署成功的计划步骤
+            LOG.warning("[!] 站点 [%s] 的浏览器失去响应，在新浏览器中继续 (%s/%s)",
+                        site_id, attempt, CRASH_RECOVERY_ATTEMPTS)
+            with TRACER.span("driver_replace"):
+                site_driver = driver_pool.replace(site_driver)
+            driver_pool.track_origin(site_driver, site_url)
+            if COMMAND_TELEMETRY:
+                TELEMETRY.instrument(site_driver)
+            result = process_site(site_driver, site_url, site_id, session_cache=session_cache,
+                                  capabilities=capabilities, update_plan=update_plan, driver_pool=driver_pool,
+                                  cancel_token=cancel_token)
+        return result
+    except Cancelled:
+        LOG.warning("[!] 站点 [%s] 已取消", site_id)
+        raise
+    except Exception as e:
+        LOG.error("[X] 处理站点 [%s] 时出错: %s", site_id, e, exc_info=True)
+        return False
+    finally:
+        # 将浏览器归还浏览器池，其会话会为下一个站点清空
+        if site_driver is not None:
+            TRACER.end_phase()
+            LOG.debug("释放站点 [%s] 的浏览器...", site_id)
+            with TRACER.span("driver_release"):
+                driver_pool.release(site_driver)
+
+def run_site_over_http(site_id, site_url, http_pool, endpoints, update_plan=None):
+    """不使用浏览器，通过后台接口处理单个站点并返回结果"""
+    try:
+        return process_site_http(http_pool, site_url, site_id, LOGIN_USERNAME, LOGIN_PASSWORD,
+                                 multi_page=EXECUTE_MULTI_PAGE_UPDATE, endpoints=endpoints,
+                                 steps=JOURNAL.remaining_steps(site_id, build_plan(update_plan, site_id)))
+    except Cancelled:
+        LOG.warning("[!] 站点 [%s] 已取消", site_id)
+        raise
+    except Exception as e:
+        LOG.error("[X] 处理站点 [%s] 时出错: %s", site_id, e, exc_info=True)
+        return False
+
+def run_sites_in_workers(sites_dict, concurrency, run_site, cancel_token=None):
+    """在有上限的工作线程池中依次处理站点，返回 {site_id: {'url', 'result', 'cancelled'}}
+
+    被 cancel_token 中断的站点结果为 None 且 cancelled 为 True，取消前尚未开始的站点不在结果中。
+    """
+    # 结果由多个工作线程写入，使用锁保护
     results = {}
+    results_lock = threading.Lock()
     
-    # 使用全新的浏览器实例处理每个站点，以避免会话冲突
+    site_queue = queue.Queue()
     for i, (site_id, site_url) in enumerate(sites_dict.items(), 1):
-        print(f"\n[{i}/{len(sites_dict)}] 处理站点 [{site_id}]: {site_url}")
-        
-        # 为每个站点创建新的浏览器实例
-        print(f"为站点 [{site_id}] 启动新的Chrome实例...")
-        site_driver = webdriver.Chrome(options=chrome_options)
-        site_driver.set_window_size(1920, 1080)
-        
-        try:
-            # 处理此单个站点
-            result = process_site(site_driver, site_url, site_id)
-            results[site_id] = {
-                'url': site_url,
-                'result': result
-            }
-        except Exception as e:
-            print(f"\n[X] 处理站点 [{site_id}] 时出错: {e}")
-            traceback.print_exc()
-            results[site_id] = {
-                'url': site_url,
-                'result': False
-            }
-        finally:
-            # 关闭此浏览器实例
-            print(f"关闭站点 [{site_id}] 的浏览器...")
+        site_queue.put((i, site_id, site_url))
+    
+    def site_worker():
+        # 每个工作线程依次处理站点
+        while True:
+            if cancel_token is not None and cancel_token.cancelled:
+                return
             try:
-                site_driver.quit()
-            except:
-                pass
+                i, site_id, site_url = site_queue.get_nowait()
+            except queue.Empty:
+                return
             
-            # 站点之间暂停
-            if i < len(sites_dict):
-                print(f"等待 {SITE_INTERVAL_TIME} 秒后继续下一个站点...")
-                time.sleep(SITE_INTERVAL_TIME)
+            LOG.info("[%s/%s] 处理站点 [%s]: %s", i, len(sites_dict), site_id, site_url)
+            # 每个站点的阶段记录在以站点标识符命名的轨道上
+            with TRACER.track(site_id, "site", url=site_url) as span, log_context(site=site_id):
+                started = time.time()
+                PROGRESS.emit("site_started", url=site_url)
+                try:
+                    result = run_site(site_id, site_url)
+                    # 运行取消后仍未成功的站点是被取消中断的（其浏览器已退出）
+                    cancelled = cancel_token is not None and cancel_token.cancelled and result is not True
+                except Cancelled:
+                    cancelled = True
+                except Exception as e:
+                    # 意外错误只让当前站点失败，工作线程继续处理下一个站点
+                    LOG.error("[X] 站点 [%s] 处理出错: %s", site_id, e, exc_info=True)
+                    result, cancelled = False, False
+                if cancelled:
+                    result = None
+                span["result"] = "cancelled" if cancelled else result
+                PROGRESS.emit("site_finished", result=result, cancelled=cancelled, duration=time.time() - started)
+            with results_lock:
+                results[site_id] = {
+                    'url': site_url,
+                    'result': result,
+                    'cancelled': cancelled
+                }
+    
+    # 使用有上限的独立工作线程池处理站点
+    workers = []
+    for worker_index in range(concurrency):
+        worker = threading.Thread(target=site_worker, name=f"site-worker-{worker_index+1}", daemon=True)
+        worker.start()
+        workers.append(worker)
+    for worker in workers:
+        worker.join()
+    return results
+
+def automate_vidnoz(sites_dict=None, concurrency=None, driver_pool=None, engine=None, rate_limits=None,
+                    dry_run=None, cancel_token=None, resume=None, retry_failed=False):
+    """处理多个站点的主函数
+    
+    Args:
+        sites_dict: 站点标识符和URL的字典
+        concurrency: 并行处理的站点数，默认为 CONCURRENCY
+        driver_pool: 由调用方保持的 DriverPool，使浏览器在多次运行之间保持预热；
+            未提供时创建临时浏览器池并在结束时关闭
+        engine: "browser"、"http" 或 "cdp"，默认为 ENGINE
+        rate_limits: sites.json 中的 "rate_limits" 配置，见 vidnoz_rate_limit.py
+        dry_run: 用 --record 录制的会话文件；提供时所有站点由本地回放服务器提供，
+            不会访问真实的管理后台
+        cancel_token: 停止运行的CancelToken，取消时中断等待并结束正在使用的浏览器
+        resume: 要继续的此前运行的编号（RUNS_DIR 下的目录），按其日志跳过已成功的站点和部署
+        retry_failed: 只重新运行上次结果为 False 或 None 的站点，针对 resume 指定的运行，
+            未指定时针对最近一次有日志的运行
+    """
+    configure_logging(LOG_LEVEL, LOG_FILE, console=LOG_CONSOLE)
+    
+    # 取消令牌在整个运行中生效，等待原语默认使用它
+    cancel_token = activate_cancel_token(cancel_token or CancelToken())
+    
+    if sites_dict is None or not sites_dict:
+        LOG.warning("未提供有效的站点列表")
+        return {}
+    
+    if engine is None:
+        engine = ENGINE
+    # http 引擎只调用为本部署配置的接口，运行开始前先检查
+    endpoints = None
+    if engine == "http":
+        endpoints = load_endpoints(HTTP_ENDPOINTS_FILE)
+        missing = missing_endpoints(endpoints, required_actions(EXECUTE_MULTI_PAGE_UPDATE,
+                                                                load_plan(UPDATE_PLAN_FILE), sites_dict))
+        if missing:
+            LOG.error("[X] %s 中缺少以下后台接口的配置: %s（见 README）", HTTP_ENDPOINTS_FILE, ", ".join(missing))
+            return {}
+    
+    # 每次运行都记录运行日志；续跑时沿用此前运行的日志
+    if retry_failed and not resume:
+        resume = latest_run(RUNS_DIR)
+        if resume is None:
+            LOG.error("%s 中没有可重试的运行日志", RUNS_DIR)
+            return {}
+    if resume and not os.path.exists(journal_path(RUNS_DIR, resume)):
+        LOG.error("%s 中没有运行 %s 的日志", RUNS_DIR, resume)
+        return {}
+    run_id = resume or new_run_id(dry_run=bool(dry_run))
+    try:
+        JOURNAL.open(journal_path(RUNS_DIR, run_id), replay=bool(resume))
+    except OSError as e:
+        LOG.warning("打开运行日志出错: %s", e)
+    requested_sites = sites_dict
+    skipped = {}
+    if resume:
+        sites_dict = JOURNAL.sites_to_run(requested_sites, retry_failed)
+        skipped = {site_id: {'url': site_url, 'result': True} for site_id, site_url in requested_sites.items()
+                   if site_id not in sites_dict and JOURNAL.result(site_id) is True}
+        LOG.info("[i] %s运行 %s: 待处理 %s 个站点，已成功 %s 个", '重试失败站点，' if retry_failed else '继续',
+                 run_id, len(sites_dict), len(skipped))
+        if not sites_dict:
+            LOG.info("运行 %s 没有剩余的站点", run_id)
+            JOURNAL.close()
+            return skipped
+    
+    if concurrency is None:
+        concurrency = CONCURRENCY
+    concurrency = max(1, min(int(concurrency), len(sites_dict)))
+    if ONLY_CHANGED and engine == "http":
+        # http 引擎不打开列表页面，无法计算指纹
+        LOG.warning("[!] 变更检测需要打开列表页面，http 引擎会部署所有操作")
+    
+    # 演练模式在本地回放录制的会话，不会访问真实的管理后台
+    replay_server = None
+    if dry_run:
+        try:
+            replay_server = start_replay_server(dry_run, speed=REPLAY_SPEED)
+        except (OSError, ValueError, KeyError) as e:
+            LOG.error("加载录制文件 %s 出错: %s", dry_run, e)
+            return {}
+        sites_dict = replay_sites(sites_dict, replay_server.server_port)
+        LOG.info("[i] 演练模式: 以 %s 倍速回放 %s，端口 %s", REPLAY_SPEED, dry_run, replay_server.server_port)
+    
+    # 显示要处理的站点
+    LOG.info("准备处理 %s 个站点:", len(sites_dict))
+    for i, (site_id, url) in enumerate(sites_dict.items()):
+        LOG.info("%s. [%s] %s", i, site_id, url)
+    
+    # 显示多页面更新设置状态
+    if EXECUTE_MULTI_PAGE_UPDATE:
+        LOG.info("[!] 多页面更新功能已启用，将执行多页面按钮点击序列")
+    else:
+        LOG.info("[i] 多页面更新功能已禁用，仅执行常规公共样式更新")
+    
+    # 显示计时配置
+    LOG.info("[i] 登录等待时间: %s 秒", LOGIN_WAIT_TIME)
+    LOG.info("[i] 后台限速: %s (自适应令牌桶)", 'sites.json 配置' if rate_limits else '默认')
+    LOG.info("[i] 登录重试次数: %s", LOGIN_RETRY_COUNT)
+    LOG.info("[i] 部署等待时间: %s 秒", DEPLOYMENT_WAIT_TIME)
+    LOG.info("[i] 引擎: %s", engine)
+    LOG.info("[i] 并发站点数: %s", concurrency)
+    LOG.info("[i] 每个站点并行页面数: %s", PAGE_CONCURRENCY)
+    LOG.info("[i] 会话缓存: %s", SESSION_CACHE_FILE if USE_SESSION_CACHE else '已禁用')
+    LOG.info("[i] 站点能力缓存: %s", CAPABILITY_CACHE_FILE if USE_CAPABILITY_CACHE else '已禁用')
+    LOG.info("[i] 变更检测: %s", '只部署有变化的列表' if ONLY_CHANGED else '关闭')
+    LOG.info("[i] 页面加载模式: %s（页面加载策略 %s）", LOAD_PROFILE,
+             LOAD_PROFILES[LOAD_PROFILE]['page_load_strategy'])
+    LOG.info("[i] 阶段追踪: %s", RUNS_DIR if TRACE_ENABLED else '已禁用')
+    LOG.info("[i] WebDriver命令统计: %s", '已启用' if COMMAND_TELEMETRY else '已禁用')
+    
+    # 登录会话在多次运行之间缓存在磁盘上（演练模式的回放站点不使用缓存）
+    use_caches = replay_server is None
+    session_cache = (SessionCache(SESSION_CACHE_FILE, SESSION_CACHE_MAX_AGE)
+                     if USE_SESSION_CACHE and use_caches else None)
+    
+    # 记录每个站点有效的定位器、存在的页面和确认对话框的形式
+    capabilities = (CapabilityCache(CAPABILITY_CACHE_FILE, CAPABILITY_MAX_AGE)
+                    if USE_CAPABILITY_CACHE and use_caches else None)
+    
+    # 多页面更新的页面和按钮，每个站点单独生成去重后的计划
+    update_plan = load_plan(UPDATE_PLAN_FILE)
+    
+    # 按站点和操作保存已部署列表的指纹（演练模式除外）
+    CHANGES.open(FINGERPRINT_FILE if use_caches else None, only_changed=ONLY_CHANGED,
+                 site_wide=update_plan.get("site_wide_actions", []))
+    
+    # 条件等待的实际耗时在运行结束时输出
+    WAIT_RECORDER.reset()
+    
+    # 记录每次运行的阶段耗时，结束时写入 trace 文件
+    TRACER.reset()
+    TRACER.enabled = TRACE_ENABLED
+    
+    # 可选：统计每个WebDriver命令的次数、耗时和数据量
+    TELEMETRY.reset()
+    TELEMETRY.enabled = COMMAND_TELEMETRY
+    
+    # 每次运行按配置重新建立各后台的令牌桶
+    RATE_LIMITER.configure(rate_limits)
+    
+    if engine == "http":
+        # 本次运行的所有站点共享长连接
+        http_pool = HttpConnectionPool(verify_certificates=HTTP_VERIFY_CERTIFICATES)
+        owns_pool = False
+        run_site = lambda site_id, site_url: run_site_over_http(site_id, site_url, http_pool, endpoints, update_plan)
+        remove_cancel_callback = lambda: None
+    elif engine == "cdp":
+        http_pool = None
+        owns_pool = False
+        run_site = None
+        remove_cancel_callback = lambda: None
+    else:
+        # 浏览器只启动一次并在站点之间复用
+        http_pool = None
+        owns_pool = driver_pool is None
+        if owns_pool:
+            driver_pool = DriverPool(create_chrome_options, setup=setup_driver)
+        # 多页面并行时每个站点额外需要辅助浏览器
+        warm_count = concurrency * PAGE_CONCURRENCY if EXECUTE_MULTI_PAGE_UPDATE else concurrency
+        LOG.info("预热 %s 个Chrome实例...", warm_count)
+        try:
+            with TRACER.span("driver_warm_up", count=warm_count):
+                driver_pool.warm_up(warm_count)
+        except Exception as e:
+            LOG.warning("启动Chrome时出错: %s", e)
+        run_site = lambda site_id, site_url: run_site_with_pooled_browser(site_id, site_url, driver_pool,
+                                                                          session_cache, capabilities, update_plan,
+                                                                          cancel_token)
+        # 取消时结束正在使用的浏览器进程，使阻塞中的WebDriver调用立即返回
+        remove_cancel_callback = cancel_token.on_cancel(driver_pool.kill_leased)
+    
+    # 通知界面等订阅者本次运行的站点列表
+    run_started = time.time()
+    PROGRESS.emit("run_started", sites=list(sites_dict), concurrency=concurrency, engine=engine)
+    
+    with TRACER.span("run", sites=len(sites_dict), engine=engine):
+        if engine == "cdp":
+            # 所有站点在同一个事件循环和同一个Chrome中运行，每个站点使用独立的浏览器上下文
+            results = asyncio.run(automate_vidnoz_async(
+                sites_dict, concurrency, LOGIN_USERNAME, LOGIN_PASSWORD,
+                multi_page=EXECUTE_MULTI_PAGE_UPDATE, update_plan=update_plan, login_wait_time=LOGIN_WAIT_TIME,
+                login_retry_count=LOGIN_RETRY_COUNT, deployment_wait_time=DEPLOYMENT_WAIT_TIME,
+                confirm_wait_time=CONFIRM_DIALOG_WAIT_TIME,
+                page_concurrency=PAGE_CONCURRENCY, cancel_token=cancel_token, load_profile=LOAD_PROFILE))
+        else:
+            results = run_sites_in_workers(sites_dict, concurrency, run_site, cancel_token)
+    remove_cancel_callback()
+    
+    if cancel_token.cancelled:
+        LOG.warning("[!] 运行已取消，%s 个站点在处理中被中断，%s 个站点未开始",
+                    sum(1 for site in results.values() if site.get('cancelled')), len(sites_dict) - len(results))
+    
+    if owns_pool:
+        LOG.info("关闭浏览器...")
+        driver_pool.close()
+    if http_pool is not None:
+        http_pool.close()
+    if replay_server is not None:
+        replay_server.shutdown()
+    JOURNAL.close()
+    CHANGES.close()
+    
+    # 续跑前已成功的站点同样计入摘要，按原始站点顺序输出
+    results = {**skipped, **results}
+    results = {site_id: results[site_id] for site_id in requested_sites if site_id in results}
     
     # 显示摘要结果
-    print("\n===== 批处理结果摘要 =====")
+    LOG.info("===== 批处理结果摘要 =====")
     successful = sum(1 for site in results.values() if site['result'] is True)
     failed = sum(1 for site in results.values() if site['result'] is False)
-    unknown = sum(1 for site in results.values() if site['result'] is None)
+    cancelled_sites = [site_id for site_id, site_info in results.items() if site_info.get('cancelled')]
+    unknown = sum(1 for site in results.values() if site['result'] is None and not site.get('cancelled'))
+    PROGRESS.emit("run_finished", successful=successful, failed=failed, unknown=unknown,
+                  cancelled=len(cancelled_sites), duration=time.time() - run_started)
     
-    print(f"总站点: {len(results)}")
-    print(f"成功: {successful}")
-    print(f"失败: {failed}")
-    print(f"未知状态: {unknown}")
+    LOG.info("总站点: %s", len(results))
+    LOG.info("成功: %s", successful)
+    LOG.info("失败: %s", failed)
+    LOG.info("未知状态: %s", unknown)
+    if cancelled_sites:
+        LOG.info("已取消（未处理完）: %s", len(cancelled_sites))
     
-    print("\n详细结果:")
+    LOG.info("详细结果:")
     for site_id, site_info in results.items():
-        status = "[+] 成功" if site_info['result'] is True else "[X] 失败" if site_info['result'] is False else "[!] 未知"
-        print(f"{status}: [{site_id}] {site_info['url']}")
+        if site_info.get('cancelled'):
+            status = "[-] 已取消"
+        else:
+            status = "[+] 成功" if site_info['result'] is True else "[X] 失败" if site_info['result'] is False else "[!] 未知"
+        LOG.info("%s: [%s] %s", status, site_id, site_info['url'])
+    
+    rates = RATE_LIMITER.summary()
+    if rates:
+        LOG.info("后台速率 (次/秒):")
+        for key, rate in rates.items():
+            LOG.info("  %s: %.2f", key, rate)
+    
+    if ONLY_CHANGED:
+        LOG.info("跳过的未变化部署: %s", CHANGES.skipped)
+    
+    wait_lines = WAIT_RECORDER.format_summary()
+    if wait_lines:
+        LOG.info("等待统计:")
+        for line in wait_lines:
+            LOG.info("%s", line)
+    
+    if COMMAND_TELEMETRY:
+        command_lines = TELEMETRY.format_summary(TELEMETRY_TOP_N)
+        if command_lines:
+            LOG.info("WebDriver命令统计:")
+            for line in command_lines:
+                LOG.info("%s", line)
+    
+    # 运行报告与 trace 文件保存在同一目录，包含结果和各项统计
+    report = {
+        "run_id": run_id,
+        "engine": engine,
+        "concurrency": concurrency,
+        "dry_run": dry_run,
+        "cancelled": cancel_token.cancelled,
+        "cancelled_sites": cancelled_sites,
+        "skipped": list(skipped),
+        "skipped_unchanged": CHANGES.skipped,
+        "load_profile": LOAD_PROFILE,
+        "results": {site_id: site_info['result'] for site_id, site_info in results.items()},
+        "waits": WAIT_RECORDER.summary(),
+        "rates": rates,
+    }
+    if COMMAND_TELEMETRY:
+        report["webdriver_commands"] = TELEMETRY.report(TELEMETRY_TOP_N)
+    report_path = os.path.join(RUNS_DIR, run_id, "report.json")
+    try:
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        LOG.info("运行报告已写入 %s", report_path)
+    except OSError as e:
+        LOG.warning("写入运行报告时出错: %s", e)
+    
+    if TRACE_ENABLED:
+        trace_path = os.path.join(RUNS_DIR, run_id, "trace.json")
+        try:
+            span_count = TRACER.export(trace_path)
+            LOG.info("已将 %s 个耗时区间写入 %s（可在 https://ui.perfetto.dev 打开）", span_count, trace_path)
+        except OSError as e:
+            LOG.warning("写入 trace 文件时出错: %s", e)
     
-    print("\n程序执行完成。")
+    LOG.info("程序执行完成。")
     
     return results
 
-# 重定向控制台输出到GUI
-class ConsoleRedirector:
-    def __init__(self, text_widget):
-        self.text_widget = text_widget
-        self.buffer = ""
-        
-    def write(self, string):
-        self.buffer += string
-        if '\n' in self.buffer or len(self.buffer) > 80:
-            self.flush()
-    
-    def flush(self):
-        if self.buffer:
-            self.text_widget.configure(state="normal")
-            self.text_widget.insert(tk.END, self.buffer)
-            self.text_widget.see(tk.END)
-            self.text_widget.configure(state="disabled")
-            self.buffer = ""
+# 最近一次加载的sites.json路径，用于读取其中的限速配置
+SITES_CONFIG_PATH = None
 
 # 加载站点配置
 def load_sites_config():
     """加载站点配置从sites.json文件或使用内置配置"""
+    global SITES_CONFIG_PATH
     # 内置默认配置
     default_config = {
         "en": "http://manage.vidnoz.com/frontend/login",
@@ -889,42 +1199,42 @@ def load_sites_config():
             base_dir = script_dir
         
         sites_path = os.path.join(script_dir, "sites.json")
-        print(f"尝试从以下位置加载站点配置: {sites_path}")
+        LOG.info("尝试从以下位置加载站点配置: %s", sites_path)
         
         if not os.path.exists(sites_path):
             # 尝试在基本目录中查找
             sites_path = os.path.join(base_dir, "sites.json")
-            print(f"在脚本目录中未找到sites.json，尝试: {sites_path}")
+            LOG.info("在脚本目录中未找到sites.json，尝试: %s", sites_path)
             if not os.path.exists(sites_path):
                 # 尝试在当前工作目录中查找
                 sites_path = os.path.join(os.getcwd(), "sites.json")
-                print(f"在基本目录中未找到sites.json，尝试: {sites_path}")
+                LOG.info("在基本目录中未找到sites.json，尝试: %s", sites_path)
                 if not os.path.exists(sites_path):
-                    print("未找到sites.json文件，使用内置默认配置")
+                    LOG.info("未找到sites.json文件，使用内置默认配置")
                     
                     # 可选：将默认配置保存到文件中，以便用户之后编辑
                     try:
                         with open(os.path.join(script_dir, "sites.json"), 'w', encoding='utf-8') as f:
                             json.dump({"urls": default_config}, f, ensure_ascii=False, indent=4)
-                            print(f"已将默认配置保存到: {os.path.join(script_dir, 'sites.json')}")
+                            LOG.info("已将默认配置保存到: %s", os.path.join(script_dir, 'sites.json'))
                     except Exception as save_error:
-                        print(f"保存默认配置文件时出错: {save_error}")
+                        LOG.warning("保存默认配置文件时出错: %s", save_error)
                     
                     return default_config
         
-        print(f"使用站点配置: {sites_path}")
+        LOG.info("使用站点配置: %s", sites_path)
+        SITES_CONFIG_PATH = sites_path
         
         with open(sites_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
             if isinstance(data, dict) and 'urls' in data and isinstance(data['urls'], dict):
                 return data['urls']
             else:
-                print("无效的站点配置格式，使用内置默认配置")
+                LOG.info("无效的站点配置格式，使用内置默认配置")
                 return default_config
     except Exception as e:
-        print(f"加载站点配置出错: {e}")
-        print("使用内置默认配置")
-        traceback.print_exc()
+        LOG.warning("加载站点配置出错: %s", e)
+        LOG.info("使用内置默认配置", exc_info=True)
         return default_config
 
 # 主应用
@@ -932,7 +1242,7 @@ class VidnozApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Vidnoz 自动化工具")
-        self.root.geometry("800x600")
+        self.root.geometry("800x760")
         self.root.minsize(800, 600)
         
         # 设置图标（如果有的话）
@@ -951,12 +1261,21 @@ class VidnozApp:
             root.destroy()
             return
         
+        # 工作线程的日志先进入队列，由界面线程定时批量显示
+        self.log_sink = LogSink()
+        add_handler(self.log_sink.handler)
+        
         # 创建界面
         self.create_widgets()
         
         # 任务运行状态
         self.is_running = False
         self.thread = None
+        self.cancel_token = CancelToken()
+        
+        # 浏览器池在多次运行之间保持预热，窗口关闭时释放
+        self.driver_pool = DriverPool(create_chrome_options, setup=setup_driver)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # 定时器更新UI
         self.update_ui()
@@ -1016,6 +1335,18 @@ class VidnozApp:
         ttk.Checkbutton(options_frame, text="多页面更新（更新所有页面和样式）", 
                       variable=self.update_mode).grid(row=0, column=1, sticky=tk.W, padx=5)
         
+        # 只部署列表有变化的内容
+        self.only_changed = tk.BooleanVar(value=ONLY_CHANGED)
+        ttk.Checkbutton(options_frame, text="仅部署有变化的列表",
+                        variable=self.only_changed).grid(row=0, column=2, sticky=tk.W, padx=5)
+        
+        # 并发数
+        ttk.Label(options_frame, text="并发数:").grid(row=1, column=0, sticky=tk.W, padx=5)
+        
+        self.concurrency = tk.IntVar(value=CONCURRENCY)
+        ttk.Spinbox(options_frame, from_=1, to=max(1, len(self.sites)), width=5,
+                    textvariable=self.concurrency).grid(row=1, column=1, sticky=tk.W, padx=5)
+        
         # 控制按钮
         buttons_frame = ttk.Frame(control_frame)
         buttons_frame.pack(fill=tk.X, padx=5, pady=10)
@@ -1023,12 +1354,30 @@ class VidnozApp:
         self.start_button = ttk.Button(buttons_frame, text="开始执行", command=self.start_automation)
         self.start_button.pack(side=tk.LEFT, padx=5)
         
+        self.stop_button = ttk.Button(buttons_frame, text="停止", state=tk.DISABLED, command=self.stop_automation)
+        self.stop_button.pack(side=tk.LEFT, padx=5)
+        
+        # 日志级别筛选
+        self.log_level = tk.StringVar(value="信息")
+        log_level_box = ttk.Combobox(buttons_frame, textvariable=self.log_level, values=list(LEVELS),
+                                     width=6, state="readonly")
+        log_level_box.pack(side=tk.RIGHT, padx=5)
+        log_level_box.bind("<<ComboboxSelected>>", lambda event: self.log_view.set_level(LEVELS[self.log_level.get()]))
+        ttk.Label(buttons_frame, text="日志级别:").pack(side=tk.RIGHT)
+        
+        # 站点进度：每个站点一行，显示当前阶段、耗时和结果
+        progress_frame = ttk.LabelFrame(main_frame, text="站点进度", padding=10)
+        progress_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.progress_grid = ProgressGrid(progress_frame, height=min(8, max(3, len(self.sites))))
+        self.progress_grid.pack(fill=tk.X, expand=True)
+        
         # 日志区域
         log_frame = ttk.LabelFrame(main_frame, text="执行日志", padding=10)
         log_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
-        self.log_text = scrolledtext.ScrolledText(log_frame, width=80, height=20, wrap=tk.WORD, state=tk.DISABLED)
-        self.log_text.pack(fill=tk.BOTH, expand=True)
+        self.log_view = LogView(log_frame, self.log_sink, width=80, height=20, wrap=tk.WORD)
+        self.log_view.pack(fill=tk.BOTH, expand=True)
         
         # 状态栏
         self.status_var = tk.StringVar(value="就绪")
@@ -1084,63 +1433,105 @@ class VidnozApp:
             return
         
         # 设置多页面更新模式
-        global EXECUTE_MULTI_PAGE_UPDATE
+        global EXECUTE_MULTI_PAGE_UPDATE, ONLY_CHANGED, LOG_LEVEL
         EXECUTE_MULTI_PAGE_UPDATE = self.update_mode.get()
+        ONLY_CHANGED = self.only_changed.get()
+        
+        # 选择“调试”时才记录（并获取）调试信息
+        LOG_LEVEL = "DEBUG" if self.log_view.level <= logging.DEBUG else "INFO"
+        
+        # 获取并发数
+        try:
+            concurrency = max(1, int(self.concurrency.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showwarning("警告", "并发数必须是正整数")
+            return
         
         # 清空日志
-        self.log_text.configure(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.configure(state=tk.DISABLED)
+        self.log_view.clear()
         
         # 禁用开始按钮
         self.start_button.configure(state=tk.DISABLED)
+        self.stop_button.configure(state=tk.NORMAL)
         
-        # 重定向控制台输出
+        # 未经过日志的输出（print、异常堆栈）同样进入日志队列
         self.original_stdout = sys.stdout
-        self.redirector = ConsoleRedirector(self.log_text)
-        sys.stdout = self.redirector
+        sys.stdout = self.log_sink
         
         # 更新状态
         self.is_running = True
         self.status_var.set("正在执行...")
         
+        # 停止按钮通过取消令牌中断等待并结束正在使用的浏览器
+        self.cancel_token = CancelToken()
+        
         # 创建新线程执行自动化任务
-        self.thread = threading.Thread(target=self.run_automation, args=(sites_to_process,))
+        self.thread = threading.Thread(target=self.run_automation, args=(sites_to_process, concurrency))
         self.thread.daemon = True
         self.thread.start()
     
-    def run_automation(self, sites):
+    def run_automation(self, sites, concurrency=1):
         try:
             # 执行自动化任务
-            automate_vidnoz(sites)
+            automate_vidnoz(sites, concurrency=concurrency, driver_pool=self.driver_pool,
+                            rate_limits=load_rate_limits(SITES_CONFIG_PATH), cancel_token=self.cancel_token)
         except Exception as e:
-            print(f"\n[X] 执行过程中发生错误: {e}")
-            traceback.print_exc()
+            LOG.error("[X] 执行过程中发生错误: %s", e, exc_info=True)
         finally:
             # 恢复控制台输出
+            self.log_sink.flush()
             sys.stdout = self.original_stdout
             
             # 更新UI状态
-            if self.is_running:
-                self.is_running = False
-                # 使用after方法确保在主线程中更新UI
-                self.root.after(0, self.update_after_completion)
+            self.is_running = False
+            # 使用after方法确保在主线程中更新UI
+            self.root.after(0, self.update_after_completion)
     
     def update_after_completion(self):
         self.start_button.configure(state=tk.NORMAL)
-        self.status_var.set("执行完成")
+        self.stop_button.configure(state=tk.DISABLED)
+        self.status_var.set("已停止" if self.cancel_token.cancelled else "执行完成")
         
         # 刷新最后的日志
-        if hasattr(self, 'redirector'):
-            self.redirector.flush()
+        self.log_view.drain()
+    
+    def stop_automation(self):
+        if not self.is_running:
+            return
+        
+        self.stop_button.configure(state=tk.DISABLED)
+        self.status_var.set("正在停止...")
+        
+        # 正在进行的等待立即中断，使用中的浏览器被结束，后续站点不再开始
+        LOG.warning("用户请求停止处理，正在中断当前站点...")
+        self.cancel_token.cancel("用户停止")
+    
+    def on_close(self):
+        # 运行中关闭窗口时先取消运行，并结束正在使用的浏览器，工作线程随即退出
+        if self.is_running:
+            self.cancel_token.cancel("窗口关闭")
+            self.driver_pool.kill_leased()
+        remove_handler(self.log_sink.handler)
+        self.progress_grid.close()
+        self.root.withdraw()
+        
+        # driver.quit() 可能较慢，在后台线程中等工作线程退出后再退出所有预热的浏览器，不阻塞界面
+        def close_browsers():
+            if self.thread is not None:
+                self.thread.join(CLOSE_WAIT_SECONDS)
+            self.driver_pool.close()
+            self.root.after(0, self.root.destroy)
+        threading.Thread(target=close_browsers, name="close-browsers", daemon=True).start()
     
     def update_ui(self):
-        # 定时更新UI
-        if hasattr(self, 'redirector'):
-            self.redirector.flush()
+        # 定时批量显示队列中的日志和进度事件
+        self.log_view.drain()
+        status = self.progress_grid.drain()
+        if status and (self.is_running or self.progress_grid.finished) and not self.cancel_token.cancelled:
+            self.status_var.set(status)
         
         # 每100毫秒更新一次UI
-        self.root.after(100, self.update_ui)
+        self.root.after(REFRESH_MS, self.update_ui)
 
 # 主程序
 def main():
@@ -1153,12 +1544,12 @@ def main():
             # 运行源代码
             os.chdir(os.path.dirname(os.path.abspath(__file__)))
         
+        configure_logging(LOG_LEVEL, LOG_FILE, console=LOG_CONSOLE)
         root = tk.Tk()
         app = VidnozApp(root)
         root.mainloop()
     except Exception as e:
-        print(f"程序错误: {e}")
-        traceback.print_exc()
+        LOG.warning("程序错误: %s", e, exc_info=True)
         
         # 如果GUI初始化失败，尝试显示错误对话框
         try:
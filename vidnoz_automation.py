@@ -1,319 +1,195 @@
 # -*- coding: utf-8 -*-
-from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException
 import time
 import sys
 import json
 import os
-import traceback
 import argparse
-import random
+import threading
+import queue
+import asyncio
+from vidnoz_driver_pool import DriverPool
+from vidnoz_session_cache import SessionCache
+from vidnoz_capabilities import CapabilityCache
+from vidnoz_plan import PlanStep, load_plan, build_plan, count_actions
+from vidnoz_waits import (RECORDER as WAIT_RECORDER, wait_until, load_page, document_ready, login_form_ready,
+                          login_finished, panel_ready, dialog_closed, overlays_cleared)
+from vidnoz_http_engine import (HttpConnectionPool, load_endpoints, missing_endpoints, process_site_http,
+                                required_actions)
+import vidnoz_scripts as scripts
+from vidnoz_locators import locate, button_with_text, LOGIN_BUTTON, CONFIRM_BUTTON
+from vidnoz_cdp import automate_vidnoz_async
+from vidnoz_rate_limit import LIMITER as RATE_LIMITER, load_rate_limits
+from vidnoz_trace import TRACER
+from vidnoz_telemetry import TELEMETRY
+from vidnoz_log import (LOG, LOG_FILE as DEFAULT_LOG_FILE, configure_logging, current_context, debug_enabled,
+                        log_context)
+from vidnoz_progress import PROGRESS
+from vidnoz_journal import JOURNAL, journal_path, latest_run, new_run_id
+from vidnoz_changes import (CHANGES, DEFAULT_FINGERPRINT_FILE, FINGERPRINT_SELECTOR, FINGERPRINT_MAX_PAGES,
+                            FINGERPRINT_PAGE_TIMEOUT, fingerprint)
+from vidnoz_load_profile import DEFAULT_LOAD_PROFILE, LOAD_PROFILES, apply_to_options, apply_to_driver
+from vidnoz_cancel import CancelToken, Cancelled, activate as activate_cancel_token
+from vidnoz_fixtures import DEFAULT_FIXTURE_FILE, start_replay_server, replay_sites, record_session
 
 DEFAULT_SITES = []
 
 # Control variable to determine if multi-page button click sequence should be executed
 EXECUTE_MULTI_PAGE_UPDATE = False
+UPDATE_PLAN_FILE = "update_plan.json"  # Optional pages/buttons of the multi-page update, see vidnoz_plan.py
+PAGE_CONCURRENCY = 1  # Pages of one site processed in parallel browsers in multi-page mode
 
 # Configuration variables
 LOGIN_WAIT_TIME = 15  # Seconds to wait for login completion (increased from 5)
-SITE_INTERVAL_TIME = 20  # Seconds to wait between sites (increased from 5)
 LOGIN_RETRY_COUNT = 3  # Maximum number of login retry attempts
 DEPLOYMENT_WAIT_TIME = 45  # Seconds to wait for deployment status (increased from 30)
+CONFIRM_DIALOG_WAIT_TIME = 6  # Seconds to wait for the confirmation dialog after clicking a button
+CONCURRENCY = 1  # Number of sites processed in parallel, each in its own browser
+ENGINE = "browser"  # "browser" drives Chrome, "http" calls the admin panel's backend endpoints directly,
+                   # "cdp" drives Chrome asynchronously over the DevTools protocol
+HTTP_ENDPOINTS_FILE = "http_endpoints.json"  # Backend endpoints of the panel, required by the http engine
+HTTP_VERIFY_CERTIFICATES = True  # False lets the http engine accept self-signed or invalid certificates
+LOGIN_USERNAME = "lixiaohui@qq.com"  # Admin panel account
+LOGIN_PASSWORD = "123456"
+USE_SESSION_CACHE = True  # Reuse logged-in sessions stored on disk to skip the login flow
+SESSION_CACHE_FILE = "session_cache.json"  # File storing cached sessions, keyed by site id
+SESSION_CACHE_MAX_AGE = 12 * 3600  # Seconds after which a cached session is not used anymore
+USE_CAPABILITY_CACHE = True  # Remember working locators and existing pages per site
+CAPABILITY_CACHE_FILE = "site_capabilities.json"  # File storing site capabilities, keyed by site id
+CAPABILITY_MAX_AGE = 7 * 24 * 3600  # Seconds after which a page is probed again
+TRACE_ENABLED = True  # Write the phases of every site to RUNS_DIR/<run id>/trace.json
+RUNS_DIR = "runs"  # Directory holding one sub-directory per run
+COMMAND_TELEMETRY = False  # Count every WebDriver command by type and call site (adds a little overhead)
+TELEMETRY_TOP_N = 15  # Rows of the WebDriver command tables
+DRY_RUN_FIXTURE = DEFAULT_FIXTURE_FILE  # Recorded session replayed by --dry-run, see vidnoz_fixtures.py
+REPLAY_SPEED = 1.0  # Replay speed of the dry run, 2 is twice as fast as recorded, 0 without delays
+LOG_LEVEL = "INFO"  # DEBUG also logs (and fetches) verbose details such as the confirmation dialog text
+LOG_FILE = DEFAULT_LOG_FILE  # Rotated JSON lines log of every run, None to disable
+LOG_CONSOLE = True  # Write log records to stdout, GUIs that collect them through their own handler turn it off
+CRASH_RECOVERY_ATTEMPTS = 2  # Times a site continues in a new browser when its browser dies mid-site
+ONLY_CHANGED = False  # Skip the deploys whose list page did not change since their last successful deploy
+FINGERPRINT_FILE = DEFAULT_FINGERPRINT_FILE  # Fingerprints of the last successful deploys, see vidnoz_changes.py
+LOAD_PROFILE = DEFAULT_LOAD_PROFILE  # Page loading "full", "lean" or "minimal", see vidnoz_load_profile.py
 
 def take_screenshot(driver, name):
     """Empty function, does not take screenshots"""
     # Screenshot functionality disabled
     return None
 
-def wait_and_click(driver, selector, by=By.CSS_SELECTOR, timeout=10, description="element"):
-    """Wait for element to appear and click it with retries and detailed logs"""
+def probe_logged_in(driver, timeout=10):
+    """Wait until the login form or the admin panel is rendered, returns True if logged in"""
+    state = wait_until(driver, lambda d: d.execute_script(scripts.LOGIN_STATE), timeout, "session_probe",
+                       poll_frequency=0.25)
+    return state == "panel"
+
+@TRACER.traced("confirm_dialog")
+def handle_confirmation_dialog(driver, profile=None):
+    """Handle confirmation dialog, click 'Sure' button
+
+    A single injected script waits for the visible confirmation dialog, clicks
+    its confirm button (sure/yes/ok/确认/confirm) and reports what it clicked.
+    """
+    LOG.debug("Waiting up to %s seconds for the confirmation dialog...", CONFIRM_DIALOG_WAIT_TIME)
+    strategies = profile.order("confirm", CONFIRM_BUTTON) if profile is not None else CONFIRM_BUTTON
+    start_time = time.time()
     try:
-        element = WebDriverWait(driver, timeout).until(
-            EC.element_to_be_clickable((by, selector))
-        )
-        print(f"Found {description}, attempting to click...")
-        
-        try:
-            # Try using JavaScript to click
-            driver.execute_script("arguments[0].click();", element)
-            print(f"Successfully clicked {description} using JavaScript")
-            return True
-        except Exception as js_error:
-            print(f"JavaScript click failed: {js_error}")
-            try:
-                # Try regular click
-                element.click()
-                print(f"Successfully clicked {description} using regular method")
-                return True
-            except Exception as click_error:
-                print(f"Regular click failed: {click_error}")
-                return False
-    except TimeoutException:
-        print(f"Timeout waiting for {description}")
-        return False
+        outcome = scripts.run_async_script(driver, scripts.CONFIRM_DIALOG, CONFIRM_DIALOG_WAIT_TIME * 1000, strategies,
+                                           debug_enabled(), timeout=CONFIRM_DIALOG_WAIT_TIME + 10)
     except Exception as e:
-        print(f"Error waiting/clicking {description}: {e}")
-        return False
-
-def handle_confirmation_dialog(driver):
-    """Handle confirmation dialog, click 'Sure' button"""
-    confirmation_clicked = False
-    
-    # Try three times
-    for attempt in range(3):
+        LOG.warning("Error handling confirmation dialog: %s", e)
+        outcome = None
+    outcome = outcome if isinstance(outcome, dict) else {}
+    confirmation_clicked = bool(outcome.get("clicked"))
+    WAIT_RECORDER.record("confirm_dialog_open", CONFIRM_DIALOG_WAIT_TIME, time.time() - start_time,
+                         confirmation_clicked)
+    if profile is not None:
+        profile.record_locator("confirm", outcome.get("strategy") if confirmation_clicked else None)
         if confirmation_clicked:
-            break
-            
-        print(f"Trying to find and click confirmation button (attempt {attempt+1}/3)...")
-        
-        try:
-            # Get HTML of all dialogs on the page for debugging
-            page_html = driver.page_source
-            dialog_html = ""
-            
-            dialogs = driver.find_elements(By.CSS_SELECTOR, ".el-message-box, .el-dialog, .modal, .dialog, [role='dialog']")
-            print(f"Found {len(dialogs)} possible dialogs")
-            
-            for i, dialog in enumerate(dialogs):
-                try:
-                    dialog_html += f"\nDialog {i+1} HTML: {dialog.get_attribute('outerHTML')}"
-                    
-                    # Check if dialog is visible
-                    if not dialog.is_displayed():
-                        print(f"Dialog {i+1} not visible, skipping")
-                        continue
-                        
-                    print(f"Analyzing dialog {i+1}, text: {dialog.text}")
-                    
-                    # If dialog contains "confirm update" text
-                    if "确认更新" in dialog.text or "确认" in dialog.text:
-                        print(f"Dialog {i+1} contains confirmation text")
-                        
-                        # Find all buttons
-                        buttons = dialog.find_elements(By.TAG_NAME, "button")
-                        print(f"Found {len(buttons)} buttons in dialog")
-                        
-                        # Go through all buttons
-                        for j, button in enumerate(buttons):
-                            try:
-                                button_text = button.text.strip().lower()
-                                print(f"Button {j+1} text: '{button_text}'")
-                                
-                                if any(text in button_text for text in ['sure', 'yes', 'ok', '确认', 'confirm']):
-                                    print(f"Found confirmation button: '{button_text}'")
-                                    
-                                    try:
-                                        # Use JavaScript to click
-                                        driver.execute_script("arguments[0].click();", button)
-                                        print("Clicked confirmation button using JavaScript")
-                                        confirmation_clicked = True
-                                        time.sleep(1)
-                                        break
-                                    except Exception as js_error:
-                                        print(f"JavaScript click failed: {js_error}")
-                                        try:
-                                            # Try regular click
-                                            button.click()
-                                            print("Clicked confirmation button using regular method")
-                                            confirmation_clicked = True
-                                            time.sleep(1)
-                                            break
-                                        except Exception as click_error:
-                                            print(f"Regular click on confirmation button failed: {click_error}")
-                            except Exception as button_error:
-                                print(f"Error processing button {j+1}: {button_error}")
-                        
-                        # If click successful, break out of dialog loop
-                        if confirmation_clicked:
-                            break
-                except Exception as dialog_error:
-                    print(f"Error processing dialog {i+1}: {dialog_error}")
-            
-            # If no button found through dialogs, try direct button search
-            if not confirmation_clicked:
-                print("No confirmation button found via dialogs, trying direct search...")
-                
-                # Try multiple selectors
-                selectors = [
-                    "//button[contains(., 'Sure')]",
-                    "//button[contains(., 'sure')]",
-                    "//button[contains(., '确认')]",
-                    "//button[contains(., 'Yes')]",
-                    "//button[contains(., 'OK')]",
-                    "//button[contains(., 'Confirm')]",
-                    ".el-button--primary",  # Element UI primary button
-                    ".btn-primary",          # Bootstrap primary button
-                    ".confirm-btn"           # Common confirmation button class
-                ]
-                
-                for selector in selectors:
-                    try:
-                        selector_type = By.XPATH if selector.startswith("//") else By.CSS_SELECTOR
-                        buttons = driver.find_elements(selector_type, selector)
-                        
-                        print(f"Selector '{selector}' found {len(buttons)} buttons")
-                        
-                        for j, button in enumerate(buttons):
-                            if button.is_displayed() and button.is_enabled():
-                                try:
-                                    print(f"Trying to click button: {button.text}")
-                                    driver.execute_script("arguments[0].click();", button)
-                                    print(f"Clicked button using JavaScript")
-                                    confirmation_clicked = True
-                                    time.sleep(1)
-                                    break
-                                except Exception as js_error:
-                                    print(f"JavaScript click failed: {js_error}")
-                                    try:
-                                        button.click()
-                                        print(f"Clicked button using regular method")
-                                        confirmation_clicked = True
-                                        time.sleep(1)
-                                        break
-                                    except Exception as click_error:
-                                        print(f"Regular click failed: {click_error}")
-                        
-                        if confirmation_clicked:
-                            break
-                    except Exception as selector_error:
-                        print(f"Error using selector '{selector}': {selector_error}")
-            
-            # Save debug info for current attempt
-            if not confirmation_clicked:
-                print("Current attempt did not find confirmation button")
-                print(f"Page dialog HTML: {dialog_html}")
-        
-        except Exception as attempt_error:
-            print(f"Error in attempt {attempt+1} to find confirmation button: {attempt_error}")
-            traceback.print_exc()
-        
-        # If not clicked and more attempts left, wait and try again
-        if not confirmation_clicked and attempt < 2:
-            print(f"Waiting 2 seconds before next attempt...")
-            time.sleep(2)
+            profile.record_dialog(outcome)
+    
+    if not confirmation_clicked:
+        LOG.warning("No confirmation button found")
+        return False
     
-    return confirmation_clicked
+    if outcome.get("strategy") == "dialog-text":
+        LOG.debug("Clicked confirmation button '%s' in dialog: %s", outcome.get('button'), outcome.get('dialog'))
+    else:
+        LOG.debug("Clicked primary button '%s' (no dialog with confirmation text found)", outcome.get('button'))
+    wait_until(driver, dialog_closed(), 1, "confirm_dialog_close")
+    return True
 
+@TRACER.traced("deployment_status")
 def check_deployment_status(driver, site_url):
-    """Check deployment status, returns True (success), False (failure) or None (unknown)"""
-    # Wait longer for deployment status indicators
-    max_wait_time = DEPLOYMENT_WAIT_TIME  # Increased from 30 to 45 seconds
+    """Check deployment status, returns True (success), False (failure) or None (unknown)
+
+    An observer injected into the page resolves as soon as a success toast or the
+    logout indicator appears, so the whole wait is a single WebDriver call.
+    """
+    LOG.debug("Waiting up to %s seconds for deployment status...", DEPLOYMENT_WAIT_TIME)
     start_time = time.time()
-    deployment_status_found = False
+    try:
+        # The previous button's toast may still be visible, only a new indicator counts
+        status = scripts.run_async_script(driver, scripts.DEPLOYMENT_STATUS, DEPLOYMENT_WAIT_TIME * 1000, True,
+                                          timeout=DEPLOYMENT_WAIT_TIME + 10)
+    except Exception as e:
+        LOG.warning("Error checking deployment status: %s", e)
+        status = None
+    status = status if isinstance(status, dict) else {}
+    WAIT_RECORDER.record("deployment_status", DEPLOYMENT_WAIT_TIME, time.time() - start_time,
+                         status.get("status") is not None)
     
-    while time.time() - start_time < max_wait_time and not deployment_status_found:
-        try:
-            # Check for deployment failure (.blog-login element)
-            login_elements = driver.find_elements(By.CSS_SELECTOR, ".blog-login")
-            if login_elements and any(element.is_displayed() for element in login_elements):
-                print("\n===================================")
-                print(f"[X] Site {site_url} deployment failed! System may have logged out.")
-                print("===================================\n")
-                deployment_status_found = True
-                return False
-            
-            # Check for deployment success (.el-message--success element)
-            success_elements = driver.find_elements(By.CSS_SELECTOR, ".el-message--success")
-            if success_elements and any(element.is_displayed() for element in success_elements):
-                print("\n===================================")
-                print(f"[+] Site {site_url} deployed successfully! Styles updated.")
-                print("===================================\n")
-                deployment_status_found = True
-                return True
-            
-            # Extended check: look for any elements that might indicate success
-            success_indicators = driver.find_elements(By.CSS_SELECTOR, ".success, .alert-success, .text-success")
-            if success_indicators and any(element.is_displayed() for element in success_indicators):
-                print("\n===================================")
-                print(f"[+] Site {site_url} appears to have deployed successfully! Found success indicator.")
-                print("===================================\n")
-                deployment_status_found = True
-                return True
-                
-            # Wait a bit before checking again
-            time.sleep(1)
-            print(f"Waiting for deployment status... Waited {int(time.time() - start_time)} seconds", end="\r")
-        except Exception as e:
-            print(f"Error checking deployment status: {e}")
-            time.sleep(1)
+    if status.get("status") == "failure":
+        # The caller reports the failure to the rate limiter, error toasts included
+        if status.get("indicator") == "error":
+            LOG.error("[X] Site %s deployment rejected: %s", site_url, status.get('detail') or '')
+        else:
+            LOG.error("[X] Site %s deployment failed! System may have logged out.", site_url)
+        return False
     
-    if not deployment_status_found:
-        print("\n===================================")
-        print(f"[!] Site {site_url} deployment status unknown! Timeout, please check manually.")
-        print("===================================\n")
-        return None
+    if status.get("status") == "success":
+        if status.get("indicator") == "toast":
+            LOG.info("[+] Site %s deployed successfully! Styles updated.", site_url)
+        else:
+            LOG.info("[+] Site %s appears to have deployed successfully! Found success indicator.", site_url)
+        LOG.info("Status shown after %.1f seconds: %s", status.get('waited', 0) / 1000, status.get('detail') or '')
+        return True
     
+    LOG.warning("[!] Site %s deployment status unknown! Timeout, please check manually.", site_url)
     return None
 
-def click_button_with_confirmation(driver, button_text, site_url):
+@TRACER.traced("deploy {button_text}")
+def click_button_with_confirmation(driver, button_text, site_url, profile=None, page=None):
     """Click a button with specified text, handle confirmation dialog, and check deployment status"""
     try:
-        print(f"\n----- Attempting to click button: '{button_text}' -----")
-        
-        # Try to find the button
-        button_found = False
+        LOG.info("----- Attempting to click button: '%s' -----", button_text)
         
-        # Method 1: Find button by XPath containing text
-        try:
-            button_xpath = f"//button[contains(., '{button_text}')]"
-            button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, button_xpath))
-            )
-            button_found = True
-            print(f"Found button: '{button_text}' (XPath)")
-        except:
-            print(f"Button not found via XPath: '{button_text}'")
-        
-        # Method 2: Iterate through all buttons
-        if not button_found:
-            print("Trying to iterate through all buttons...")
-            buttons = driver.find_elements(By.TAG_NAME, "button")
-            for btn in buttons:
-                try:
-                    if button_text in btn.text and btn.is_displayed():
-                        button = btn
-                        button_found = True
-                        print(f"Found button: '{button_text}' (iteration)")
-                        break
-                except:
-                    continue
-        
-        if not button_found:
-            print(f"Button not found: '{button_text}'")
+        # Deploy clicks are paced per backend instead of with fixed delays
+        RATE_LIMITER.acquire(site_url, "rate_limit_deploy", WAIT_RECORDER)
+        # All locator strategies race in one polling loop, the first match is clicked
+        match = locate(driver, button_with_text(button_text), 10, "button_locate", click=True,
+                       profile=profile, key=button_text)
+        if not match:
+            LOG.warning("Button not found: '%s'", button_text)
             return False
-        
-        # Click the button
-        try:
-            driver.execute_script("arguments[0].click();", button)
-            print(f"Clicked button using JavaScript: '{button_text}'")
-        except:
-            try:
-                button.click()
-                print(f"Clicked button using regular method: '{button_text}'")
-            except Exception as click_error:
-                print(f"Failed to click button '{button_text}': {click_error}")
-                return False
-        
-        # Wait for confirmation dialog to appear
-        print("Waiting for confirmation dialog...")
-        time.sleep(2)
+        LOG.info("Clicked button: '%s' (strategy: %s)", button_text, match.strategy)
         
         # Handle confirmation dialog
-        confirmation_clicked = handle_confirmation_dialog(driver)
+        confirmation_clicked = handle_confirmation_dialog(driver, profile)
         
         if not confirmation_clicked:
-            print(f"\n===================================")
-            print(f"[!] Unable to click confirmation button, '{button_text}' may not have executed.")
-            print("===================================\n")
+            LOG.warning("[!] Unable to click confirmation button, '%s' may not have executed.", button_text)
             return False
         
         # Check deployment status
-        print(f"Checking '{button_text}' deployment status...")
+        LOG.debug("Checking '%s' deployment status...", button_text)
         deployment_result = check_deployment_status(driver, site_url)
+        PROGRESS.emit("deploy", action=button_text, page=page, result=deployment_result)
+        if deployment_result is not None:
+            # Failed deploys slow the backend's rate down, successful ones speed it up again
+            RATE_LIMITER.report(site_url, deployment_result)
         
         if deployment_result is False:
             # Deployment failed, return failure
@@ -323,317 +199,433 @@ def click_button_with_confirmation(driver, button_text, site_url):
         return True
         
     except Exception as e:
-        print(f"Error during button click process '{button_text}': {e}")
-        traceback.print_exc()
+        LOG.warning("Error during button click process '%s': %s", button_text, e, exc_info=True)
         return False
 
-def perform_multi_page_updates(driver, base_url):
-    """Perform multi-page button click update operations"""
+def page_fingerprint(driver):
+    """Fingerprint of the list on the current page over all its pages, None when there is none"""
+    try:
+        return fingerprint(scripts.run_async_script(
+            driver, scripts.LIST_CONTENT, FINGERPRINT_SELECTOR, FINGERPRINT_MAX_PAGES,
+            FINGERPRINT_PAGE_TIMEOUT * 1000, timeout=FINGERPRINT_MAX_PAGES * FINGERPRINT_PAGE_TIMEOUT + 5))
+    except Exception:
+        return None
+
+@TRACER.traced("page {step.page}")
+def update_page(driver, base_url, step, buttons, profile=None, progress=""):
+    """Visit one page of the update plan and click its buttons in sequence
+    
+    Returns True when all buttons were deployed, False when one failed and None
+    when the optional page does not exist (nothing was clicked).
+    """
+    page_url = f"{base_url}/frontend/page/{step.page}"
+    
+    if step.optional and profile is not None and profile.page_exists(step.page) is False:
+        LOG.info("%sPage %s is known not to exist on this site, skipping", progress, step.page)
+        return None
+    
+    LOG.info("%sVisiting page: %s", progress, page_url)
+    try:
+        load_page(driver, page_url, "list_page_navigate")
+        wait_until(driver, panel_ready(), 3, "list_page_load")
+    except Exception as e:
+        if not step.optional:
+            raise
+        LOG.warning("Error visiting page %s: %s", step.page, e)
+        LOG.info("Skipping page %s", step.page)
+        return None
+    
+    if step.optional:
+        # Optional pages may not exist, check that the expected button is rendered
+        if not wait_until(driver, panel_ready(buttons[0]), 5, "optional_page_probe"):
+            LOG.info("Page %s doesn't exist or expected button not found, skipping this page", step.page)
+            if profile is not None:
+                profile.record_page(step.page, False)
+            return None
+        LOG.debug("Page %s exists, continuing execution", step.page)
+        if profile is not None:
+            profile.record_page(step.page, True)
+    
+    # Actions whose list did not change since their last successful deploy are skipped,
+    # the list is only read (all of its pages) when --only-changed asks for it
+    if CHANGES.only_changed:
+        CHANGES.observe(step.page, page_fingerprint(driver))
+        unchanged = [btn_text for btn_text in buttons if CHANGES.unchanged(step.page, btn_text)]
+        if unchanged:
+            LOG.info("%sUnchanged since the last deploy on %s, skipping: %s", progress, step.page, ", ".join(unchanged))
+            buttons = [btn_text for btn_text in buttons if btn_text not in unchanged]
+    
+    # Click buttons in sequence
+    for btn_text in buttons:
+        if not click_button_with_confirmation(driver, btn_text, page_url, profile, step.page):
+            LOG.error("[X] Failed to click '%s' on %s, aborting operation", btn_text, step.page)
+            return False
+        wait_until(driver, overlays_cleared(), 2, "between_buttons")  # Wait until dialog and toast are gone
+    return True
+
+def run_plan_sequentially(driver, base_url, steps, profile=None):
+    """Process the pages of the plan one after another in a single browser
+    
+    Site-wide actions planned on an optional page that turns out not to exist
+    are carried over to the next page.
+    """
+    carried = []
+    for index, step in enumerate(steps, 1):
+        buttons = carried + step.buttons
+        carried = []
+        result = update_page(driver, base_url, step, buttons, profile, f"[{index}/{len(steps)}] ")
+        if result is False:
+            return False
+        if result is None:
+            carried = [button for button in buttons if button not in step.buttons or button in step.site_wide]
+    return True
+
+def perform_multi_page_updates(driver, base_url, profile=None, steps=None, driver_pool=None):
+    """Perform multi-page button click update operations following the update plan
+    
+    steps is the site's list of PlanStep (see vidnoz_plan.build_plan). With
+    PAGE_CONCURRENCY > 1 and a driver pool, the pages are processed in parallel
+    browsers sharing the logged-in session.
+    """
     if not EXECUTE_MULTI_PAGE_UPDATE:
-        print("\nMulti-page update feature is disabled. To enable, set EXECUTE_MULTI_PAGE_UPDATE = False\n")
+        LOG.info("Multi-page update feature is disabled. To enable, set EXECUTE_MULTI_PAGE_UPDATE = False")
         return True
     
-    print("\n===== Beginning multi-page update operations =====\n")
+    if steps is None:
+        steps = build_plan(load_plan(UPDATE_PLAN_FILE))
+    
+    LOG.info("===== Beginning multi-page update operations =====")
+    LOG.info("Update plan: %s actions on %s pages", count_actions(steps), len(steps))
     
     try:
-        # 1. Article list page - aritcle-list
-        article_page = f"{base_url}/frontend/page/aritcle-list"
-        print(f"\n[1/3] Visiting article list page: {article_page}")
-        driver.get(article_page)
-        time.sleep(3)
-        
-        # Click buttons in sequence
-        article_buttons = ["更新公共样式", "更新blog全部列表", "更新blog全部详情"]
-        for btn_text in article_buttons:
-            if not click_button_with_confirmation(driver, btn_text, article_page):
-                print(f"\n[X] Failed to click '{btn_text}' on article page, aborting operation")
-                return False
-            time.sleep(2)  # Wait between buttons
-        
-        # 2. FAQ list page - faq-list
-        faq_page = f"{base_url}/frontend/page/faq-list"
-        print(f"\n[2/3] Visiting FAQ list page: {faq_page}")
-        driver.get(faq_page)
-        time.sleep(3)
-        
-        # Click buttons in sequence
-        faq_buttons = ["更新公共样式", "更新faq全部列表", "更新faq全部详情"]
-        for btn_text in faq_buttons:
-            if not click_button_with_confirmation(driver, btn_text, faq_page):
-                print(f"\n[X] Failed to click '{btn_text}' on FAQ page, aborting operation")
-                return False
-            time.sleep(2)  # Wait between buttons
-        
-        # 3. News page - pressroom-list (may not exist)
-        pressroom_page = f"{base_url}/frontend/page/pressroom-list"
-        print(f"\n[3/3] Attempting to visit news page: {pressroom_page}")
-        
-        # Check if page exists
-        try:
-            driver.get(pressroom_page)
-            time.sleep(3)
-            
-            # Check if page loaded expected content
-            try:
-                # Try to find at least one button to confirm page is correctly loaded
-                WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.XPATH, "//button[contains(., '更新公共样式')]"))
-                )
-                print("News page exists, continuing execution")
-                
-                # Click buttons in sequence
-                pressroom_buttons = ["更新公共样式", "更新pressroom全部列表", "更新pressroom全部详情"]
-                for btn_text in pressroom_buttons:
-                    if not click_button_with_confirmation(driver, btn_text, pressroom_page):
-                        print(f"\n[X] Failed to click '{btn_text}' on news page, aborting operation")
-                        return False
-                    time.sleep(2)  # Wait between buttons
-                
-            except (TimeoutException, NoSuchElementException):
-                print("News page doesn't exist or expected button not found, skipping this page")
-        
-        except Exception as e:
-            print(f"Error visiting news page: {e}")
-            print("Skipping news page update")
-        
-        print("\n[+] Multi-page update operations completed!")
-        return True
+        # Site-wide actions on an optional page may have to move to the next page, keep those plans sequential
+        parallel = (PAGE_CONCURRENCY > 1 and driver_pool is not None and len(steps) > 1
+                    and not any(step.optional and step.site_wide for step in steps))
+        if parallel:
+            result = perform_page_groups_concurrently(driver, base_url, profile, steps, driver_pool)
+        else:
+            result = run_plan_sequentially(driver, base_url, steps, profile)
+        if result:
+            LOG.info("[+] Multi-page update operations completed!")
+        return result
         
     except Exception as e:
-        print(f"\n[X] Error during multi-page update process: {e}")
-        traceback.print_exc()
+        LOG.error("[X] Error during multi-page update process: %s", e, exc_info=True)
         return False
 
-def process_site(driver, site_url, site_label=None):
-    """Process a single site's login and update operations"""
+def perform_page_groups_concurrently(driver, base_url, profile, steps, driver_pool):
+    """Run the site-wide actions, then process the pages of the plan in parallel browsers
+    
+    Helper browsers are leased from the driver pool and receive the cookies and
+    localStorage of the logged-in driver, which processes pages as well.
+    Returns False if any page failed.
+    """
+    # Site-wide actions go first, in the logged-in browser, on their planned page
+    host = next((step for step in steps if step.site_wide), None)
+    if host is not None:
+        site_wide_step = PlanStep(host.page, host.site_wide, host.optional)
+        if update_page(driver, base_url, site_wide_step, site_wide_step.buttons, profile, "[site-wide] ") is False:
+            return False
+    
+    groups = [PlanStep(step.page, [b for b in step.buttons if b not in step.site_wide], step.optional)
+              for step in steps]
+    groups = [group for group in groups if group.buttons]
+    worker_count = min(PAGE_CONCURRENCY, len(groups))
+    LOG.info("Processing %s pages in %s parallel browsers...", len(groups), worker_count)
+    
+    session = SessionCache.capture(driver)
+    group_queue = queue.Queue()
+    for index, group in enumerate(groups, 1):
+        group_queue.put((index, group))
+    results = []
+    results_lock = threading.Lock()
+    
+    def page_worker(worker_driver):
+        while True:
+            try:
+                index, group = group_queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = update_page(worker_driver, base_url, group, group.buttons, profile,
+                                     f"[{index}/{len(groups)}] ")
+            except Exception as e:
+                LOG.error("[X] Error updating page %s: %s", group.page, e)
+                result = False
+            if result is False and not DriverPool.is_alive(worker_driver):
+                # The browser died: the other browsers continue with the page's undeployed buttons
+                LOG.warning("[!] Browser stopped responding on page %s, handing the page over", group.page)
+                remaining = JOURNAL.remaining_steps(current_context().get("site"), [group])
+                if remaining:
+                    group_queue.put((index, remaining[0]))
+                return
+            with results_lock:
+                results.append(result)
+    
+    # Helper browsers get their own track next to the site's
+    site_track = TRACER.current_track()
+    
+    def helper_worker():
+        with TRACER.track(f"{site_track} / {threading.current_thread().name}"), \
+                log_context(site=site_track, worker=threading.current_thread().name):
+            helper = None
+            try:
+                helper = driver_pool.acquire()
+                driver_pool.track_origin(helper, base_url)
+                if COMMAND_TELEMETRY:
+                    TELEMETRY.instrument(helper)
+                # Cookies can only be set on the site's origin
+                load_page(helper, base_url, "helper_navigate")
+                SessionCache.inject(helper, session)
+                page_worker(helper)
+            except Cancelled:
+                # The site's own thread reports the cancelled run
+                pass
+            except Exception as e:
+                # The remaining pages are picked up by the other browsers
+                LOG.warning("[!] Error in parallel browser: %s", e)
+            finally:
+                if helper is not None:
+                    driver_pool.release(helper)
+    
+    helpers = []
+    for worker_index in range(worker_count - 1):
+        helper = threading.Thread(target=helper_worker, name=f"page-worker-{worker_index+1}", daemon=True)
+        helper.start()
+        helpers.append(helper)
+    page_worker(driver)
+    for helper in helpers:
+        helper.join()
+    
+    if not group_queue.empty():
+        LOG.error("[X] %s pages were left when the browsers processing them died", group_queue.qsize())
+        return False
+    
+    if any(result is False for result in results):
+        LOG.error("[X] Parallel multi-page update failed on at least one page")
+        return False
+    return True
+
+def process_site(driver, site_url, site_label=None, session_cache=None, capabilities=None, update_plan=None,
+                 driver_pool=None, cancel_token=None):
+    """Process a single site's login and update operations
+    
+    When a SessionCache is given, a stored session for site_label is restored
+    first and the login form is only filled in when that session has expired.
+    """
     try:
         label_info = f" [{site_label}]" if site_label else ""
-        print(f"\n===== Processing site{label_info}: {site_url} =====")
+        LOG.info("===== Processing site%s: %s =====", label_info, site_url)
         
         # Extract base URL from URL
         base_url = '/'.join(site_url.split('/')[:3])  # Get http(s)://domain.com part
         
-        print("Navigating to website...")
+        # Locators and pages learned about this site in earlier runs
+        profile = capabilities.for_site(site_label) if capabilities and site_label else None
+        
+        TRACER.phase("navigate")
+        LOG.debug("Navigating to website...")
         try:
-            driver.get(site_url)
+            RATE_LIMITER.acquire(site_url, "rate_limit_navigate", WAIT_RECORDER)
+            load_page(driver, site_url, "site_navigate")
         except Exception as e:
-            print(f"Error navigating to site: {e}")
+            LOG.warning("Error navigating to site: %s", e)
             take_screenshot(driver, "navigation_error")
             # If navigation error, try refreshing
             try:
-                print("Trying to refresh the page...")
-                driver.refresh()
-                time.sleep(2)
-            except:
+                LOG.info("Trying to refresh the page...")
+                load_page(driver, name="nav_error_reload")
+                wait_until(driver, document_ready(), 2, "refresh_after_nav_error")
+            except Exception:
                 pass
         
-        # Add random delay to avoid rate limiting
-        rand_delay = random.uniform(1, 3)
-        time.sleep(rand_delay)
+        TRACER.phase("session_restore")
+        # Restore a cached session first, the full login only runs when it has expired
+        session_restored = False
+        cached_session = session_cache.get(site_label, site_url) if session_cache and site_label else None
+        if cached_session:
+            LOG.info("Restoring cached login session...")
+            SessionCache.inject(driver, cached_session)
+            load_page(driver, name="session_reload")
+            if probe_logged_in(driver):
+                LOG.info("Cached session is still valid, skipping login")
+                session_restored = True
+            else:
+                LOG.info("Cached session has expired, performing full login")
+                session_cache.invalidate(site_label)
+        
+        TRACER.phase("login")
+        # With the eager and none load strategies the app may still be rendering, wait for the form or the panel
+        if not session_restored:
+            probe_logged_in(driver)
         
         # Login with retries
         login_success = False
         for login_attempt in range(LOGIN_RETRY_COUNT):
+            if cancel_token is not None:
+                cancel_token.check()
             # Check if login needed (if username input exists)
             login_fields = driver.find_elements(By.CSS_SELECTOR, "input[placeholder='User Name']")
             if not login_fields or not any(field.is_displayed() for field in login_fields):
-                print("Already logged in, no need to login again")
+                LOG.info("Already logged in, no need to login again")
                 login_success = True
                 break
                 
             if login_attempt > 0:
-                print(f"\n----- Login Retry Attempt {login_attempt+1}/{LOGIN_RETRY_COUNT} -----")
+                LOG.info("----- Login Retry Attempt %s/%s -----", login_attempt+1, LOGIN_RETRY_COUNT)
                 # Refresh page before retry
                 try:
-                    print("Refreshing page before retry...")
-                    driver.refresh()
-                    time.sleep(3)
-                except:
+                    LOG.info("Refreshing page before retry...")
+                    load_page(driver, name="login_retry_reload")
+                    wait_until(driver, document_ready(), 3, "login_retry_refresh")
+                except Exception:
                     pass
             
-            print("Login page detected, performing login...")
+            LOG.info("Login page detected, performing login...")
             try:
-                # Wait a bit longer for login page to be fully loaded
-                time.sleep(3)
+                # Wait until the login form is fully rendered
+                wait_until(driver, login_form_ready(), 3, "login_form")
                 
-                username_field = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "input[placeholder='User Name']"))
-                )
+                username_field = wait_until(driver, EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, "input[placeholder='User Name']")), 10, "login_username_field")
+                if username_field is None:
+                    raise TimeoutException("User Name field not found")
                 
-                print("Entering username...")
+                LOG.debug("Entering username...")
                 username_field.clear()  # Clear field first
-                username_field.send_keys("lixiaohui@qq.com")
+                username_field.send_keys(LOGIN_USERNAME)
                 
-                print("Entering password...")
+                LOG.debug("Entering password...")
                 password_field = driver.find_element(By.CSS_SELECTOR, "input[placeholder='Password']")
                 password_field.clear()  # Clear field first
-                password_field.send_keys("123456")
+                password_field.send_keys(LOGIN_PASSWORD)
                 
-                print("Clicking login button...")
-                login_button_clicked = False
-                
-                # Try clicking login button with standard method first
-                login_success = wait_and_click(driver, "//button[contains(., 'login')]", By.XPATH, 10, "login button")
-                if not login_success:
-                    # Try other ways to find submit button
-                    print("Trying other ways to find login button...")
-                    login_buttons = driver.find_elements(By.TAG_NAME, "button")
-                    for button in login_buttons:
-                        if button.is_displayed() and button.is_enabled():
-                            try:
-                                driver.execute_script("arguments[0].click();", button)
-                                print("Clicked possible login button using JavaScript")
-                                login_button_clicked = True
-                                break
-                            except:
-                                try:
-                                    button.click()
-                                    print("Clicked possible login button")
-                                    login_button_clicked = True
-                                    break
-                                except:
-                                    continue
+                LOG.debug("Clicking login button...")
+                RATE_LIMITER.acquire(site_url, "rate_limit_login", WAIT_RECORDER)
+                match = locate(driver, LOGIN_BUTTON, 10, "login_button_locate", click=True,
+                               profile=profile, key="login")
+                if match:
+                    LOG.info("Clicked login button (strategy: %s)", match.strategy)
                 else:
-                    login_button_clicked = True
-                
-                if not login_button_clicked:
-                    print("Could not find or click any login button")
+                    LOG.warning("Could not find or click any login button")
                     continue
                 
-                print(f"Waiting {LOGIN_WAIT_TIME} seconds for login to complete...")
-                time.sleep(LOGIN_WAIT_TIME)  # Increased wait time
+                LOG.debug("Waiting up to %s seconds for login to complete...", LOGIN_WAIT_TIME)
+                wait_until(driver, login_finished(), LOGIN_WAIT_TIME, "login_complete")
                 
                 # Try clearing cookies and cache if this is a retry
                 if login_attempt > 0:
-                    print("Clearing cookies for this domain...")
+                    LOG.debug("Clearing cookies for this domain...")
                     driver.delete_all_cookies()
-                    time.sleep(2)
                 
                 # Check if still on login page
                 login_fields_after = driver.find_elements(By.CSS_SELECTOR, "input[placeholder='User Name']")
                 if login_fields_after and any(field.is_displayed() for field in login_fields_after):
-                    print("Login appears to have failed, still on login page")
+                    LOG.warning("Login appears to have failed, still on login page")
                     
                     # Check for any error messages
                     error_messages = driver.find_elements(By.CSS_SELECTOR, ".el-message--error, .error-message, .alert-danger")
                     if error_messages and any(msg.is_displayed() for msg in error_messages):
                         for msg in error_messages:
                             if msg.is_displayed():
-                                print(f"Error message found: {msg.text}")
+                                LOG.warning("Error message found: %s", msg.text)
+                    # A rejected login slows the backend's rate down too
+                    RATE_LIMITER.report(site_url, False)
                     
                     # Continue to next retry attempt
                     continue
                 else:
-                    print("Login successful!")
+                    LOG.info("Login successful!")
+                    RATE_LIMITER.report(site_url, True)
                     login_success = True
                     break
                 
             except Exception as e:
-                print(f"Error during login process: {e}")
+                LOG.warning("Error during login process: %s", e)
                 take_screenshot(driver, "login_error")
-                traceback.print_exc()
+                LOG.debug("Traceback", exc_info=True)
                 # Continue to next retry attempt
                 continue
         
         # If all login attempts failed, skip this site
         if not login_success:
-            print(f"\n[X] Site{label_info} login failed after {LOGIN_RETRY_COUNT} attempts, skipping this site")
+            LOG.error("[X] Site%s login failed after %s attempts, skipping this site", label_info, LOGIN_RETRY_COUNT)
             return False
         
+        TRACER.phase("session_save")
+        # Store the fresh session so the next run can skip the login flow
+        if session_cache and site_label and not session_restored:
+            try:
+                session_cache.save(site_label, driver)
+                LOG.info("Login session cached")
+            except Exception as e:
+                LOG.warning("Error caching login session: %s", e)
+        
+        TRACER.phase("panel_navigate")
         # Re-navigate to target page after successful login
-        print("Re-navigating to target page...")
-        driver.get(site_url)
-        time.sleep(5)  # Wait for page to load
+        LOG.info("Re-navigating to target page...")
+        load_page(driver, site_url, "panel_navigate_load")
+        wait_until(driver, panel_ready(), 5, "panel_after_login")  # Wait for page to load
         
+        TRACER.phase("update")
         # Check if multi-page update should be executed
         if EXECUTE_MULTI_PAGE_UPDATE:
             # Perform multi-page update operations
-            multi_page_result = perform_multi_page_updates(driver, base_url)
+            steps = build_plan(update_plan or load_plan(UPDATE_PLAN_FILE), site_label)
+            # Deploys that succeeded before a resumed run are left out
+            steps = JOURNAL.remaining_steps(site_label, steps)
+            multi_page_result = perform_multi_page_updates(driver, base_url, profile, steps, driver_pool)
             if not multi_page_result:
-                print(f"\n[X] Site{label_info} multi-page update operations failed")
+                LOG.error("[X] Site%s multi-page update operations failed", label_info)
+                # A dead browser says nothing about the session, keep it for the recovery
+                if session_cache and site_label and DriverPool.is_alive(driver):
+                    session_cache.invalidate(site_label)
                 return False
-            print(f"\n[+] Site{label_info} multi-page update operations completed successfully")
+            LOG.info("[+] Site%s multi-page update operations completed successfully", label_info)
             return True
             
         # If not doing multi-page update, perform single button update
         # Find and click "更新公共样式" button
-        print("Looking for update button...")
+        LOG.debug("Looking for update button...")
         try:
-            # Try multiple ways to find the update button
-            update_button_found = False
-            
-            # Method 1: XPath
-            try:
-                update_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//button[contains(., '更新公共样式')]"))
-                )
-                print("Found update button (XPath)")
-                update_button_found = True
-            except:
-                print("Update button not found via XPath")
-            
-            # Method 2: Find all buttons
-            if not update_button_found:
-                print("Trying to find all buttons...")
-                buttons = driver.find_elements(By.TAG_NAME, "button")
-                for button in buttons:
-                    try:
-                        if "更新公共样式" in button.text and button.is_displayed():
-                            update_button = button
-                            update_button_found = True
-                            print("Found update button (by iterating buttons)")
-                            break
-                    except:
-                        continue
-            
-            if not update_button_found:
-                print("Update button not found, trying to screenshot current page...")
+            RATE_LIMITER.acquire(site_url, "rate_limit_deploy", WAIT_RECORDER)
+            match = locate(driver, button_with_text("更新公共样式"), 10, "update_button_locate", click=True,
+                           profile=profile, key="更新公共样式")
+            if not match:
+                LOG.warning("Update button not found, trying to screenshot current page...")
                 take_screenshot(driver, "no_update_button")
                 return False
-            
-            print("Clicking update button...")
-            try:
-                driver.execute_script("arguments[0].click();", update_button)
-                print("Clicked update button using JavaScript")
-            except:
-                try:
-                    update_button.click()
-                    print("Clicked update button using regular method")
-                except Exception as click_error:
-                    print(f"Failed to click update button: {click_error}")
-                    take_screenshot(driver, "update_button_click_error")
-                    return False
+            LOG.info("Clicked update button (strategy: %s)", match.strategy)
             
             # Handle confirmation dialog
-            print("Waiting for confirmation dialog...")
-            time.sleep(2)
-            take_screenshot(driver, "after_update_click")
-            
-            # Handle confirmation dialog
-            confirmation_clicked = handle_confirmation_dialog(driver)
+            confirmation_clicked = handle_confirmation_dialog(driver, profile)
             
             # Check deployment status
             if confirmation_clicked:
-                print("Confirmation button clicked, checking deployment status...")
+                LOG.info("Confirmation button clicked, checking deployment status...")
                 deployment_result = check_deployment_status(driver, site_url)
+                PROGRESS.emit("deploy", action="更新公共样式", result=deployment_result)
+                if deployment_result is not None:
+                    RATE_LIMITER.report(site_url, deployment_result)
+                if deployment_result is False and session_cache and site_label:
+                    # The panel may have logged us out, do not reuse this session
+                    session_cache.invalidate(site_label)
                 return deployment_result
             else:
-                print("\n===================================")
-                print(f"[!] Site{label_info} unable to click confirmation button, deployment may not have started.")
-                print("===================================\n")
+                LOG.warning("[!] Site%s unable to click confirmation button, deployment may not have started.", label_info)
                 take_screenshot(driver, "no_confirmation_button")
                 return False
                 
         except Exception as e:
-            print(f"\n[X] Site{label_info} update process error: {e}")
+            LOG.error("[X] Site%s update process error: %s", label_info, e)
             take_screenshot(driver, "update_process_error")
-            traceback.print_exc()
+            LOG.debug("Traceback", exc_info=True)
             return False
             
     except Exception as e:
-        print(f"\n[X] Site{label_info} processing error: {e}")
+        LOG.error("[X] Site%s processing error: %s", label_info, e)
         take_screenshot(driver, "process_site_error")
-        traceback.print_exc()
+        LOG.debug("Traceback", exc_info=True)
         return False
     
     return None  # Default return unknown status
@@ -651,7 +643,7 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
     """
     try:
         if not os.path.exists(file_path):
-            print(f"File does not exist: {file_path}")
+            LOG.error("File does not exist: %s", file_path)
             return None
             
         # Determine how to load based on file extension
@@ -665,7 +657,7 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
                 # Handle new format: urls is a dictionary
                 if isinstance(data, dict) and 'urls' in data and isinstance(data['urls'], dict):
                     sites_dict = data['urls']
-                    print(f"Loaded {len(sites_dict)} sites from JSON file")
+                    LOG.info("Loaded %s sites from JSON file", len(sites_dict))
                 
                 # Handle old format: urls is a list
                 elif isinstance(data, dict) and 'urls' in data and isinstance(data['urls'], list):
@@ -673,17 +665,17 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
                     # Use index as key
                     for i, url in enumerate(urls_list):
                         sites_dict[f"site{i+1}"] = url
-                    print(f"Loaded {len(sites_dict)} sites from JSON file (converted old format)")
+                    LOG.info("Loaded %s sites from JSON file (converted old format)", len(sites_dict))
                 
                 # Handle direct list
                 elif isinstance(data, list):
                     # Use index as key
                     for i, url in enumerate(data):
                         sites_dict[f"site{i+1}"] = url
-                    print(f"Loaded {len(sites_dict)} sites from JSON file (list format)")
+                    LOG.info("Loaded %s sites from JSON file (list format)", len(sites_dict))
                 
                 else:
-                    print("Invalid JSON format, should be URL dictionary, URL list, or object with 'urls' key")
+                    LOG.error("Invalid JSON format, should be URL dictionary, URL list, or object with 'urls' key")
                     return None
                 
         elif ext == '.txt':
@@ -692,9 +684,9 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
                 lines = [line.strip() for line in f if line.strip()]
                 for i, url in enumerate(lines):
                     sites_dict[f"site{i+1}"] = url
-                print(f"Loaded {len(sites_dict)} sites from text file")
+                LOG.info("Loaded %s sites from text file", len(sites_dict))
         else:
-            print(f"Unsupported file type: {ext}")
+            LOG.error("Unsupported file type: %s", ext)
             return None
             
         # Apply include and exclude filters
@@ -703,17 +695,17 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
         if include_sites:
             # Only include specified sites
             include_list = include_sites.split(',')
-            print(f"Only including these sites: {include_list}")
+            LOG.info("Only including these sites: %s", include_list)
             for site_id in include_list:
                 if site_id in sites_dict:
                     filtered_dict[site_id] = sites_dict[site_id]
                 else:
-                    print(f"Warning: Specified include site '{site_id}' does not exist")
+                    LOG.warning("Specified include site '%s' does not exist", site_id)
         
         elif exclude_sites:
             # Exclude specified sites
             exclude_list = exclude_sites.split(',')
-            print(f"Excluding these sites: {exclude_list}")
+            LOG.info("Excluding these sites: %s", exclude_list)
             for site_id, url in sites_dict.items():
                 if site_id not in exclude_list:
                     filtered_dict[site_id] = url
@@ -722,40 +714,16 @@ def load_sites_from_file(file_path, include_sites=None, exclude_sites=None):
             # No filtering, use all sites
             filtered_dict = sites_dict
         
-        print(f"Retained {len(filtered_dict)} sites after filtering")
+        LOG.info("Retained %s sites after filtering", len(filtered_dict))
         
         return filtered_dict
         
     except Exception as e:
-        print(f"Error loading sites file: {e}")
-        traceback.print_exc()
+        LOG.error("Error loading sites file: %s", e, exc_info=True)
         return None
 
-def automate_vidnoz(sites_dict=None):
-    """Main function to process multiple sites in batch"""
-    if sites_dict is None or not sites_dict:
-        print("No valid site list provided")
-        return {}
-    
-    # Display sites to process
-    print(f"Preparing to process {len(sites_dict)} sites:")
-    for i, (site_id, url) in enumerate(sites_dict.items(), 1):
-        print(f"{i}. [{site_id}] {url}")
-    print("\n")
-    
-    # Display multi-page update setting status
-    if EXECUTE_MULTI_PAGE_UPDATE:
-        print("[!] Multi-page update feature is enabled, will execute multi-page button click sequence")
-    else:
-        print("[i] Multi-page update feature is disabled, only performing regular public style update")
-    
-    # Display timing configuration
-    print(f"[i] Login wait time: {LOGIN_WAIT_TIME} seconds")
-    print(f"[i] Site interval time: {SITE_INTERVAL_TIME} seconds")
-    print(f"[i] Login retry attempts: {LOGIN_RETRY_COUNT}")
-    print(f"[i] Deployment wait time: {DEPLOYMENT_WAIT_TIME} seconds")
-    
-    # Chrome options setup
+def create_chrome_options():
+    """Build the Chrome options shared by every browser instance"""
     chrome_options = Options()
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
@@ -771,67 +739,432 @@ def automate_vidnoz(sites_dict=None):
     chrome_options.add_argument("--disable-extensions")
     # Set window size to ensure elements are visible (important in headless mode)
     chrome_options.add_argument("--window-size=1920,1080")
+    # Page load strategy of the load profile, images are also switched off in the renderer
+    apply_to_options(chrome_options, LOAD_PROFILE)
     
     # Add experimental options
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
     chrome_options.add_experimental_option("useAutomationExtension", False)
-    
-    # Add specific site processing
+    return chrome_options
+
+def setup_driver(driver):
+    """Block the resources of the load profile in a new browser, called by the DriverPool"""
+    try:
+        apply_to_driver(driver, LOAD_PROFILE)
+    except Exception as e:
+        # The pages still work, they just load everything
+        LOG.warning("Error blocking resources of load profile %s: %s", LOAD_PROFILE, e)
+
+def run_site_with_pooled_browser(site_id, site_url, driver_pool, session_cache=None, capabilities=None,
+                                 update_plan=None, cancel_token=None):
+    """Process one site in a warm browser leased from the driver pool and return its result"""
+    site_driver = None
+    try:
+        with TRACER.span("driver_acquire"):
+            site_driver = driver_pool.acquire()
+        driver_pool.track_origin(site_driver, site_url)
+        if COMMAND_TELEMETRY:
+            TELEMETRY.instrument(site_driver)
+        
+        # Process this individual site
+        result = process_site(site_driver, site_url, site_id, session_cache=session_cache,
+                              capabilities=capabilities, update_plan=update_plan, driver_pool=driver_pool,
+                              cancel_token=cancel_token)
+        for attempt in range(1, CRASH_RECOVERY_ATTEMPTS + 1):
+            if result is not False or DriverPool.is_alive(site_driver):
+                break
+            if cancel_token is not None:
+                cancel_token.check()
+            # The browser crashed or hung mid-site: a new browser restores the login and
+            # continues with the plan steps the run journal does not record as deployed
+            LOG.warning("[!] Browser of site [%s] stopped responding, continuing in a new browser (%s/%s)",
+                        site_id, attempt, CRASH_RECOVERY_ATTEMPTS)
+            with TRACER.span("driver_replace"):
+                site_driver = driver_pool.replace(site_driver)
+            driver_pool.track_origin(site_driver, site_url)
+            if COMMAND_TELEMETRY:
+                TELEMETRY.instrument(site_driver)
+            result = process_site(site_driver, site_url, site_id, session_cache=session_cache,
+                                  capabilities=capabilities, update_plan=update_plan, driver_pool=driver_pool,
+                                  cancel_token=cancel_token)
+        return result
+    except Cancelled:
+        LOG.warning("[!] Site [%s] cancelled", site_id)
+        raise
+    except Exception as e:
+        LOG.error("[X] Error processing site [%s]: %s", site_id, e, exc_info=True)
+        return False
+    finally:
+        # Return the browser to the pool, its session is cleared for the next site
+        if site_driver is not None:
+            TRACER.end_phase()
+            LOG.debug("Releasing browser for site [%s]...", site_id)
+            with TRACER.span("driver_release"):
+                driver_pool.release(site_driver)
+
+def run_site_over_http(site_id, site_url, http_pool, endpoints, update_plan=None):
+    """Process one site through the backend endpoints without a browser and return its result"""
+    try:
+        return process_site_http(http_pool, site_url, site_id, LOGIN_USERNAME, LOGIN_PASSWORD,
+                                 multi_page=EXECUTE_MULTI_PAGE_UPDATE, endpoints=endpoints,
+                                 steps=JOURNAL.remaining_steps(site_id, build_plan(update_plan, site_id)))
+    except Cancelled:
+        LOG.warning("[!] Site [%s] cancelled", site_id)
+        raise
+    except Exception as e:
+        LOG.error("[X] Error processing site [%s]: %s", site_id, e, exc_info=True)
+        return False
+
+def run_sites_in_workers(sites_dict, concurrency, run_site, cancel_token=None):
+    """Process sites on `concurrency` worker threads, returns {site_id: {'url', 'result', 'cancelled'}}
+
+    Sites stopped by cancel_token have result None and cancelled True, sites
+    not started before the cancellation are left out.
+    """
+    # Results are written by several workers, guard them with a lock
     results = {}
+    results_lock = threading.Lock()
     
-    # Process each site with a fresh browser instance to avoid session conflicts
+    site_queue = queue.Queue()
     for i, (site_id, site_url) in enumerate(sites_dict.items(), 1):
-        print(f"\n[{i}/{len(sites_dict)}] Processing site [{site_id}]: {site_url}")
-        
-        # Create a new browser instance for each site
-        print(f"Starting new Chrome instance for site [{site_id}]...")
-        site_driver = webdriver.Chrome(options=chrome_options)
-        site_driver.set_window_size(1920, 1080)
-        
-        try:
-            # Process this individual site
-            result = process_site(site_driver, site_url, site_id)
-            results[site_id] = {
-                'url': site_url,
-                'result': result
-            }
-        except Exception as e:
-            print(f"\n[X] Error processing site [{site_id}]: {e}")
-            traceback.print_exc()
-            results[site_id] = {
-                'url': site_url,
-                'result': False
-            }
-        finally:
-            # Close this browser instance
-            print(f"Closing browser for site [{site_id}]...")
+        site_queue.put((i, site_id, site_url))
+    
+    def site_worker():
+        # Each worker processes sites one after another
+        while True:
+            if cancel_token is not None and cancel_token.cancelled:
+                return
             try:
-                site_driver.quit()
-            except:
-                pass
+                i, site_id, site_url = site_queue.get_nowait()
+            except queue.Empty:
+                return
             
-            # Pause between sites
-            if i < len(sites_dict):
-                print(f"Waiting {SITE_INTERVAL_TIME} seconds before next site...")
-                time.sleep(SITE_INTERVAL_TIME)
+            LOG.info("[%s/%s] Processing site [%s]: %s", i, len(sites_dict), site_id, site_url)
+            # The phases of every site are recorded on a track named after it
+            with TRACER.track(site_id, "site", url=site_url) as span, log_context(site=site_id):
+                started = time.time()
+                PROGRESS.emit("site_started", url=site_url)
+                try:
+                    result = run_site(site_id, site_url)
+                    # A site that did not succeed once the run was cancelled was stopped by it (its browser quit)
+                    cancelled = cancel_token is not None and cancel_token.cancelled and result is not True
+                except Cancelled:
+                    cancelled = True
+                except Exception as e:
+                    # An unexpected error fails this site only, the worker goes on with the next one
+                    LOG.error("[X] Site [%s] processing error: %s", site_id, e, exc_info=True)
+                    result, cancelled = False, False
+                if cancelled:
+                    result = None
+                span["result"] = "cancelled" if cancelled else result
+                PROGRESS.emit("site_finished", result=result, cancelled=cancelled, duration=time.time() - started)
+            with results_lock:
+                results[site_id] = {
+                    'url': site_url,
+                    'result': result,
+                    'cancelled': cancelled
+                }
+    
+    # Process sites on a bounded pool of independent workers
+    workers = []
+    for worker_index in range(concurrency):
+        worker = threading.Thread(target=site_worker, name=f"site-worker-{worker_index+1}", daemon=True)
+        worker.start()
+        workers.append(worker)
+    for worker in workers:
+        worker.join()
+    return results
+
+def automate_vidnoz(sites_dict=None, concurrency=None, driver_pool=None, engine=None, rate_limits=None,
+                    dry_run=None, cancel_token=None, resume=None, retry_failed=False):
+    """Main function to process multiple sites in batch
+    
+    Args:
+        sites_dict: Dictionary with site identifiers and URLs
+        concurrency: Number of sites processed in parallel, defaults to CONCURRENCY
+        driver_pool: DriverPool kept by the caller so browsers stay warm between runs,
+            a temporary pool is created and closed when omitted
+        engine: "browser", "http" or "cdp", defaults to ENGINE
+        rate_limits: "rate_limits" section of sites.json, see vidnoz_rate_limit.py
+        dry_run: Fixture file recorded with --record; the sites are then served by a local
+            replay server instead of the real admin panels
+        cancel_token: CancelToken stopping the run, interrupts the waits and kills the browsers in use
+        resume: Id of an earlier run (a directory in RUNS_DIR) to continue from its journal,
+            the sites and deploys that already succeeded are skipped
+        retry_failed: Only rerun the sites whose last result was False or None, in the run
+            given by resume or the most recent journaled run
+    """
+    configure_logging(LOG_LEVEL, LOG_FILE, console=LOG_CONSOLE)
+    
+    # The run's cancel token, also picked up by the wait primitives
+    cancel_token = activate_cancel_token(cancel_token or CancelToken())
+    
+    if sites_dict is None or not sites_dict:
+        LOG.warning("No valid site list provided")
+        return {}
+    
+    if engine is None:
+        engine = ENGINE
+    # The http engine only calls the endpoints configured for this deployment, check them before anything runs
+    endpoints = None
+    if engine == "http":
+        endpoints = load_endpoints(HTTP_ENDPOINTS_FILE)
+        missing = missing_endpoints(endpoints, required_actions(EXECUTE_MULTI_PAGE_UPDATE,
+                                                                load_plan(UPDATE_PLAN_FILE), sites_dict))
+        if missing:
+            LOG.error("[X] %s does not define the backend endpoint of: %s (see README)", HTTP_ENDPOINTS_FILE,
+                      ", ".join(missing))
+            return {}
+    
+    # Every run is journaled; a resumed run continues the journal of the earlier run
+    if retry_failed and not resume:
+        resume = latest_run(RUNS_DIR)
+        if resume is None:
+            LOG.error("No run journal found in %s to retry", RUNS_DIR)
+            return {}
+    if resume and not os.path.exists(journal_path(RUNS_DIR, resume)):
+        LOG.error("No journal for run %s in %s", resume, RUNS_DIR)
+        return {}
+    run_id = resume or new_run_id(dry_run=bool(dry_run))
+    try:
+        JOURNAL.open(journal_path(RUNS_DIR, run_id), replay=bool(resume))
+    except OSError as e:
+        LOG.warning("Error opening run journal: %s", e)
+    requested_sites = sites_dict
+    skipped = {}
+    if resume:
+        sites_dict = JOURNAL.sites_to_run(requested_sites, retry_failed)
+        skipped = {site_id: {'url': site_url, 'result': True} for site_id, site_url in requested_sites.items()
+                   if site_id not in sites_dict and JOURNAL.result(site_id) is True}
+        LOG.info("[i] %s run %s: %s sites to run, %s already succeeded", 'Retrying failed sites of' if retry_failed
+                 else 'Resuming', run_id, len(sites_dict), len(skipped))
+        if not sites_dict:
+            LOG.info("Nothing left to do in run %s", run_id)
+            JOURNAL.close()
+            return skipped
+    
+    if concurrency is None:
+        concurrency = CONCURRENCY
+    concurrency = max(1, min(int(concurrency), len(sites_dict)))
+    if ONLY_CHANGED and engine == "http":
+        # The http engine never opens the list pages, so there is nothing to fingerprint
+        LOG.warning("[!] Change detection needs the list pages, the http engine deploys every action")
+    
+    # A dry run replays a recorded session locally, nothing reaches the real admin panels
+    replay_server = None
+    if dry_run:
+        try:
+            replay_server = start_replay_server(dry_run, speed=REPLAY_SPEED)
+        except (OSError, ValueError, KeyError) as e:
+            LOG.error("Error loading fixture %s: %s", dry_run, e)
+            return {}
+        sites_dict = replay_sites(sites_dict, replay_server.server_port)
+        LOG.info("[i] Dry run: replaying %s at %sx speed on port %s", dry_run, REPLAY_SPEED, replay_server.server_port)
+    
+    # Display sites to process
+    LOG.info("Preparing to process %s sites:", len(sites_dict))
+    for i, (site_id, url) in enumerate(sites_dict.items(), 1):
+        LOG.info("%s. [%s] %s", i, site_id, url)
+    
+    # Display multi-page update setting status
+    if EXECUTE_MULTI_PAGE_UPDATE:
+        LOG.info("[!] Multi-page update feature is enabled, will execute multi-page button click sequence")
+    else:
+        LOG.info("[i] Multi-page update feature is disabled, only performing regular public style update")
+    
+    # Display timing configuration
+    LOG.info("[i] Login wait time: %s seconds", LOGIN_WAIT_TIME)
+    LOG.info("[i] Rate limits: %s (adaptive token bucket per backend)", 'sites.json' if rate_limits else 'defaults')
+    LOG.info("[i] Login retry attempts: %s", LOGIN_RETRY_COUNT)
+    LOG.info("[i] Deployment wait time: %s seconds", DEPLOYMENT_WAIT_TIME)
+    LOG.info("[i] Engine: %s", engine)
+    LOG.info("[i] Concurrent sites: %s", concurrency)
+    LOG.info("[i] Parallel pages per site: %s", PAGE_CONCURRENCY)
+    LOG.info("[i] Session cache: %s", SESSION_CACHE_FILE if USE_SESSION_CACHE else 'disabled')
+    LOG.info("[i] Capability cache: %s", CAPABILITY_CACHE_FILE if USE_CAPABILITY_CACHE else 'disabled')
+    LOG.info("[i] Change detection: %s", 'only changed lists are deployed' if ONLY_CHANGED else 'off')
+    LOG.info("[i] Load profile: %s (page load strategy %s)", LOAD_PROFILE,
+             LOAD_PROFILES[LOAD_PROFILE]['page_load_strategy'])
+    LOG.info("[i] Phase trace: %s", RUNS_DIR if TRACE_ENABLED else 'disabled')
+    LOG.info("[i] WebDriver command telemetry: %s", 'enabled' if COMMAND_TELEMETRY else 'disabled')
+    
+    # Logged-in sessions are cached on disk between runs (not for the replayed sites of a dry run)
+    use_caches = replay_server is None
+    session_cache = (SessionCache(SESSION_CACHE_FILE, SESSION_CACHE_MAX_AGE)
+                     if USE_SESSION_CACHE and use_caches else None)
+    
+    # Winning locators, existing pages and dialog shapes are remembered per site
+    capabilities = (CapabilityCache(CAPABILITY_CACHE_FILE, CAPABILITY_MAX_AGE)
+                    if USE_CAPABILITY_CACHE and use_caches else None)
+    
+    # Pages and buttons of the multi-page update, planned per site with duplicates removed
+    update_plan = load_plan(UPDATE_PLAN_FILE)
+    
+    # Fingerprints of the deployed lists are stored per site and action (not for a dry run)
+    CHANGES.open(FINGERPRINT_FILE if use_caches else None, only_changed=ONLY_CHANGED,
+                 site_wide=update_plan.get("site_wide_actions", []))
+    
+    # Durations of condition-driven waits are reported at the end of the run
+    WAIT_RECORDER.reset()
+    
+    # Phases of the run are traced and written to a trace-event file at the end
+    TRACER.reset()
+    TRACER.enabled = TRACE_ENABLED
+    
+    # Optionally count every WebDriver command with its latency and payload size
+    TELEMETRY.reset()
+    TELEMETRY.enabled = COMMAND_TELEMETRY
+    
+    # Every run starts from the configured rates of each backend
+    RATE_LIMITER.configure(rate_limits)
+    
+    if engine == "http":
+        # Keep-alive connections are shared by all sites of the run
+        http_pool = HttpConnectionPool(verify_certificates=HTTP_VERIFY_CERTIFICATES)
+        owns_pool = False
+        run_site = lambda site_id, site_url: run_site_over_http(site_id, site_url, http_pool, endpoints, update_plan)
+        remove_cancel_callback = lambda: None
+    elif engine == "cdp":
+        http_pool = None
+        owns_pool = False
+        run_site = None
+        remove_cancel_callback = lambda: None
+    else:
+        # Browsers are started once and reused across sites
+        http_pool = None
+        owns_pool = driver_pool is None
+        if owns_pool:
+            driver_pool = DriverPool(create_chrome_options, setup=setup_driver)
+        # Parallel page groups need helper browsers on top of one browser per site
+        warm_count = concurrency * PAGE_CONCURRENCY if EXECUTE_MULTI_PAGE_UPDATE else concurrency
+        LOG.info("Warming up %s Chrome instance(s)...", warm_count)
+        try:
+            with TRACER.span("driver_warm_up", count=warm_count):
+                driver_pool.warm_up(warm_count)
+        except Exception as e:
+            LOG.warning("Error starting Chrome: %s", e)
+        run_site = lambda site_id, site_url: run_site_with_pooled_browser(site_id, site_url, driver_pool,
+                                                                          session_cache, capabilities, update_plan,
+                                                                          cancel_token)
+        # Cancelling kills the browsers in use, so blocked WebDriver calls return at once
+        remove_cancel_callback = cancel_token.on_cancel(driver_pool.kill_leased)
+    
+    # Subscribers such as the GUI learn the sites of the run before the first one starts
+    run_started = time.time()
+    PROGRESS.emit("run_started", sites=list(sites_dict), concurrency=concurrency, engine=engine)
+    
+    with TRACER.span("run", sites=len(sites_dict), engine=engine):
+        if engine == "cdp":
+            # All sites run on one event loop and one Chrome, each in its own browser context
+            results = asyncio.run(automate_vidnoz_async(
+                sites_dict, concurrency, LOGIN_USERNAME, LOGIN_PASSWORD,
+                multi_page=EXECUTE_MULTI_PAGE_UPDATE, update_plan=update_plan, login_wait_time=LOGIN_WAIT_TIME,
+                login_retry_count=LOGIN_RETRY_COUNT, deployment_wait_time=DEPLOYMENT_WAIT_TIME,
+                confirm_wait_time=CONFIRM_DIALOG_WAIT_TIME,
+                page_concurrency=PAGE_CONCURRENCY, cancel_token=cancel_token, load_profile=LOAD_PROFILE))
+        else:
+            results = run_sites_in_workers(sites_dict, concurrency, run_site, cancel_token)
+    remove_cancel_callback()
+    
+    if cancel_token.cancelled:
+        LOG.warning("[!] Run cancelled, %s sites were stopped mid-run, %s were not started",
+                    sum(1 for site in results.values() if site.get('cancelled')), len(sites_dict) - len(results))
+    
+    if owns_pool:
+        LOG.info("Closing browsers...")
+        driver_pool.close()
+    if http_pool is not None:
+        http_pool.close()
+    if replay_server is not None:
+        replay_server.shutdown()
+    JOURNAL.close()
+    CHANGES.close()
+    
+    # Sites that succeeded before a resumed run are part of the summary, in the original site order
+    results = {**skipped, **results}
+    results = {site_id: results[site_id] for site_id in requested_sites if site_id in results}
     
     # Display summary results
-    print("\n===== Batch Processing Results Summary =====")
+    LOG.info("===== Batch Processing Results Summary =====")
     successful = sum(1 for site in results.values() if site['result'] is True)
     failed = sum(1 for site in results.values() if site['result'] is False)
-    unknown = sum(1 for site in results.values() if site['result'] is None)
+    cancelled_sites = [site_id for site_id, site_info in results.items() if site_info.get('cancelled')]
+    unknown = sum(1 for site in results.values() if site['result'] is None and not site.get('cancelled'))
+    PROGRESS.emit("run_finished", successful=successful, failed=failed, unknown=unknown,
+                  cancelled=len(cancelled_sites), duration=time.time() - run_started)
     
-    print(f"Total sites: {len(results)}")
-    print(f"Successful: {successful}")
-    print(f"Failed: {failed}")
-    print(f"Unknown status: {unknown}")
+    LOG.info("Total sites: %s", len(results))
+    LOG.info("Successful: %s", successful)
+    LOG.info("Failed: %s", failed)
+    LOG.info("Unknown status: %s", unknown)
+    if cancelled_sites:
+        LOG.info("Cancelled (not processed): %s", len(cancelled_sites))
     
-    print("\nDetailed results:")
+    LOG.info("Detailed results:")
     for site_id, site_info in results.items():
-        status = "[+] Success" if site_info['result'] is True else "[X] Failed" if site_info['result'] is False else "[!] Unknown"
-        print(f"{status}: [{site_id}] {site_info['url']}")
+        if site_info.get('cancelled'):
+            status = "[-] Cancelled"
+        else:
+            status = "[+] Success" if site_info['result'] is True else "[X] Failed" if site_info['result'] is False else "[!] Unknown"
+        LOG.info("%s: [%s] %s", status, site_id, site_info['url'])
+    
+    rates = RATE_LIMITER.summary()
+    if rates:
+        LOG.info("Backend rates (actions/second):")
+        for key, rate in rates.items():
+            LOG.info("  %s: %.2f", key, rate)
+    
+    if ONLY_CHANGED:
+        LOG.info("Unchanged deploys skipped: %s", CHANGES.skipped)
     
-    print("\nProgram execution completed.")
+    wait_lines = WAIT_RECORDER.format_summary()
+    if wait_lines:
+        LOG.info("Wait statistics:")
+        for line in wait_lines:
+            LOG.info("%s", line)
+    
+    if COMMAND_TELEMETRY:
+        command_lines = TELEMETRY.format_summary(TELEMETRY_TOP_N)
+        if command_lines:
+            LOG.info("WebDriver commands:")
+            for line in command_lines:
+                LOG.info("%s", line)
+    
+    # The run report sits next to the trace and collects the results and statistics
+    report = {
+        "run_id": run_id,
+        "engine": engine,
+        "concurrency": concurrency,
+        "dry_run": dry_run,
+        "cancelled": cancel_token.cancelled,
+        "cancelled_sites": cancelled_sites,
+        "skipped": list(skipped),
+        "skipped_unchanged": CHANGES.skipped,
+        "load_profile": LOAD_PROFILE,
+        "results": {site_id: site_info['result'] for site_id, site_info in results.items()},
+        "waits": WAIT_RECORDER.summary(),
+        "rates": rates,
+    }
+    if COMMAND_TELEMETRY:
+        report["webdriver_commands"] = TELEMETRY.report(TELEMETRY_TOP_N)
+    report_path = os.path.join(RUNS_DIR, run_id, "report.json")
+    try:
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        LOG.info("Run report written to %s", report_path)
+    except OSError as e:
+        LOG.warning("Error writing run report: %s", e)
+    
+    if TRACE_ENABLED:
+        trace_path = os.path.join(RUNS_DIR, run_id, "trace.json")
+        try:
+            span_count = TRACER.export(trace_path)
+            LOG.info("Trace of %s spans written to %s (open it in https://ui.perfetto.dev)", span_count, trace_path)
+        except OSError as e:
+            LOG.warning("Error writing trace: %s", e)
+    
+    LOG.info("Program execution completed.")
     
     return results
 
@@ -841,18 +1174,93 @@ def parse_args():
     parser.add_argument('file', nargs='?', help='Site list file path (.json or .txt)')
     parser.add_argument('--include', help='Only include specified sites, comma separated, e.g. tw,en')
     parser.add_argument('--exclude', help='Exclude specified sites, comma separated, e.g. en')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY,
+                        help=f'Number of sites processed in parallel, each in its own browser (default: {CONCURRENCY})')
+    parser.add_argument('--page-concurrency', type=int, default=PAGE_CONCURRENCY,
+                        help='In multi-page mode, number of pages of one site processed in parallel browsers '
+                             f'sharing the login (default: {PAGE_CONCURRENCY})')
+    parser.add_argument('--engine', choices=['browser', 'http', 'cdp'], default=ENGINE,
+                        help='browser drives Chrome, http calls the backend endpoints directly, '
+                             'cdp runs all sites on one event loop over DevTools (default: %(default)s)')
+    parser.add_argument('--no-session-cache', action='store_true',
+                        help='Always perform the full login instead of reusing cached sessions')
+    parser.add_argument('--no-capability-cache', action='store_true',
+                        help='Rediscover locators and optional pages instead of using site_capabilities.json')
+    parser.add_argument('--no-trace', action='store_true',
+                        help='Do not write the per-phase trace file of the run')
+    parser.add_argument('--telemetry', action='store_true',
+                        help='Count WebDriver commands by type and call site and add them to the run report')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default=LOG_LEVEL,
+                        help='Lowest level written to the console and the log file (default: %(default)s)')
+    parser.add_argument('--log-file', default=LOG_FILE,
+                        help='Rotated JSON lines log file, empty to disable (default: %(default)s)')
+    parser.add_argument('--record', metavar='FIXTURE',
+                        help='Process the first selected site over DevTools and record its traffic to FIXTURE')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Run against a local replay of the fixture instead of the real admin panels')
+    parser.add_argument('--fixture', default=DRY_RUN_FIXTURE,
+                        help='Fixture replayed by --dry-run (default: %(default)s)')
+    parser.add_argument('--replay-speed', type=float, default=REPLAY_SPEED,
+                        help='Replay speed of --dry-run, 0 replays without delays (default: %(default)s)')
+    parser.add_argument('--resume', metavar='RUN_ID',
+                        help=f'Continue run RUN_ID from its journal in {RUNS_DIR}/, skipping the sites and deploys '
+                             'that already succeeded')
+    parser.add_argument('--only-changed', action='store_true',
+                        help='Skip the deploys whose list page did not change since their last successful deploy')
+    parser.add_argument('--load-profile', choices=list(LOAD_PROFILES), default=LOAD_PROFILE,
+                        help='Page loading: full loads everything, lean skips images, media, fonts and trackers and '
+                             'stops at DOMContentLoaded, minimal does not wait for page loads (default: %(default)s)')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='Only rerun the sites that ended failed or unknown in the run given by --resume, '
+                             'or in the most recent run')
     
     return parser.parse_args()
 
 if __name__ == "__main__":
     args = parse_args()
+    LOG_LEVEL = args.log_level
+    LOG_FILE = args.log_file or None
+    configure_logging(LOG_LEVEL, LOG_FILE)
     
     if args.file:
-        print(f"Loading site list from file: {args.file}")
+        LOG.info("Loading site list from file: %s", args.file)
         
         if args.include and args.exclude:
-            print("Error: --include and --exclude options cannot be used together")
+            LOG.error("--include and --exclude options cannot be used together")
+            sys.exit(1)
+        
+        if args.concurrency < 1:
+            LOG.error("--concurrency must be at least 1")
+            sys.exit(1)
+        
+        if args.page_concurrency < 1:
+            LOG.error("--page-concurrency must be at least 1")
+            sys.exit(1)
+        PAGE_CONCURRENCY = args.page_concurrency
+        
+        if args.no_session_cache:
+            USE_SESSION_CACHE = False
+        
+        if args.no_capability_cache:
+            USE_CAPABILITY_CACHE = False
+        
+        if args.no_trace:
+            TRACE_ENABLED = False
+        
+        if args.telemetry:
+            COMMAND_TELEMETRY = True
+        
+        if args.only_changed:
+            if args.engine == "http":
+                LOG.error("--only-changed cannot be used with --engine=http, which does not open the list pages")
+                sys.exit(1)
+            ONLY_CHANGED = True
+        LOAD_PROFILE = args.load_profile
+        
+        if args.record and args.dry_run:
+            LOG.error("--record and --dry-run options cannot be used together")
             sys.exit(1)
+        REPLAY_SPEED = args.replay_speed
         
         sites = load_sites_from_file(
             args.file,
@@ -860,10 +1268,22 @@ if __name__ == "__main__":
             exclude_sites=args.exclude
         )
         
-        if sites:
-            automate_vidnoz(sites)
+        if sites and args.record:
+            # Recording performs the real login and deploys of one site
+            site_id, site_url = next(iter(sites.items()))
+            LOG.info("Recording site [%s] to %s", site_id, args.record)
+            asyncio.run(record_session(
+                site_url, site_id, args.record, LOGIN_USERNAME, LOGIN_PASSWORD,
+                multi_page=EXECUTE_MULTI_PAGE_UPDATE, update_plan=load_plan(UPDATE_PLAN_FILE),
+                login_wait_time=LOGIN_WAIT_TIME, login_retry_count=LOGIN_RETRY_COUNT,
+                deployment_wait_time=DEPLOYMENT_WAIT_TIME, confirm_wait_time=CONFIRM_DIALOG_WAIT_TIME))
+        elif sites:
+            automate_vidnoz(sites, concurrency=args.concurrency, engine=args.engine,
+                            rate_limits=load_rate_limits(args.file),
+                            dry_run=args.fixture if args.dry_run else None,
+                            resume=args.resume, retry_failed=args.retry_failed)
         else:
-            print("Unable to load sites from file or no sites after filtering")
+            LOG.error("Unable to load sites from file or no sites after filtering")
     else:
-        print("No site list file provided, please specify a .json or .txt file")
+        LOG.error("No site list file provided, please specify a .json or .txt file")
         sys.exit(1) 
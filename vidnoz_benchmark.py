@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of a full run against the local mock admin panel
+
+Starts vidnoz_mock_server in-process, runs N synthetic sites
+(http://site1.localhost:<port>/frontend/login, ...) through
+vidnoz_automation.automate_vidnoz and reports the wall time of every site and
+of the whole run, the WebDriver command counts and the peak memory. Results
+are saved under benchmarks/ and can be compared with a saved baseline; the
+comparison exits with status 1 when a metric regressed.
+
+Usage:
+    python vidnoz_benchmark.py --sites 8 --concurrency 4 --save-baseline
+    python vidnoz_benchmark.py --sites 8 --concurrency 4 --compare
+    python vidnoz_benchmark.py --asset-latency 0.5 --load-profile full
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from vidnoz_mock_server import MOCK_ENDPOINTS, MockConfig, start_mock_server
+from vidnoz_trace import TRACER
+from vidnoz_telemetry import TELEMETRY
+import vidnoz_automation as automation
+
+try:
+    import psutil
+except ImportError:
+    psutil = None  # Without psutil only the Python heap of the runner is measured
+
+BENCHMARK_DIR = "benchmarks"  # Saved results, one file per benchmark run
+BASELINE_FILE = "baseline.json"  # Result the --compare option compares against
+REGRESSION_TOLERANCE = 0.10  # Relative increase of a metric reported as a regression
+
+# Metrics compared with the baseline, lower is better for all of them
+COMPARED_METRICS = ["total_wall", "site_wall_mean", "site_wall_max", "webdriver_commands",
+                    "peak_rss", "python_peak"]
+
+class MemorySampler:
+    """Samples the resident memory of this process and its children (chromedriver, Chrome)"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        process = psutil.Process()
+        while True:
+            try:
+                total = process.memory_info().rss
+                for child in process.children(recursive=True):
+                    try:
+                        total += child.memory_info().rss
+                    except psutil.Error:
+                        pass
+                self.peak = max(self.peak or 0, total)
+            except psutil.Error:
+                pass
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        if psutil is not None:
+            self._thread = threading.Thread(target=self._sample, name="memory-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop sampling, returns the peak in bytes or None without psutil"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.peak
+
+def synthetic_sites(count, port):
+    """{site id: login URL} of `count` sites served by the mock panel on port"""
+    return {f"site{i}": f"http://site{i}.localhost:{port}/frontend/login" for i in range(1, count + 1)}
+
+def run_benchmark(sites=4, concurrency=2, engine="browser", multi_page=False, page_concurrency=1,
+                  mock_config=None, rate=100.0, load_profile=None):
+    """Run the synthetic sites through automate_vidnoz and return the measured metrics"""
+    mock_config = mock_config or MockConfig()
+    work_dir = tempfile.mkdtemp(prefix="vidnoz-benchmark-")
+    # Caches, plan and endpoint files of the real setup must not influence or be touched by the benchmark
+    overrides = {
+        "EXECUTE_MULTI_PAGE_UPDATE": multi_page,
+        "PAGE_CONCURRENCY": page_concurrency,
+        "UPDATE_PLAN_FILE": None,
+        "HTTP_ENDPOINTS_FILE": os.path.join(work_dir, "http_endpoints.json"),
+        "LOGIN_USERNAME": mock_config.username,
+        "LOGIN_PASSWORD": mock_config.password,
+        "SESSION_CACHE_FILE": os.path.join(work_dir, "session_cache.json"),
+        "CAPABILITY_CACHE_FILE": os.path.join(work_dir, "site_capabilities.json"),
+        "FINGERPRINT_FILE": os.path.join(work_dir, "deploy_fingerprints.json"),
+        "RUNS_DIR": os.path.join(work_dir, "runs"),
+        "LOG_FILE": os.path.join(work_dir, "vidnoz.jsonl"),
+        "TRACE_ENABLED": True,
+        "COMMAND_TELEMETRY": engine == "browser",
+        "LOAD_PROFILE": load_profile or automation.LOAD_PROFILE,
+    }
+    # The http engine calls the mock panel's endpoints
+    with open(overrides["HTTP_ENDPOINTS_FILE"], 'w', encoding='utf-8') as f:
+        json.dump(MOCK_ENDPOINTS, f, ensure_ascii=False, indent=2)
+    saved = {name: getattr(automation, name) for name in overrides}
+    server = start_mock_server(0, config=mock_config)
+    sampler = MemorySampler()
+    try:
+        for name, value in overrides.items():
+            setattr(automation, name, value)
+        sites_dict = synthetic_sites(sites, server.server_port)
+        sampler.start()
+        tracemalloc.start()
+        start = time.perf_counter()
+        results = automation.automate_vidnoz(sites_dict, concurrency=concurrency, engine=engine,
+                                             rate_limits={"default": {"rate": rate, "burst": max(1, int(rate))}})
+        total_wall = time.perf_counter() - start
+        python_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        peak_rss = sampler.stop()
+        server.shutdown()
+        for name, value in saved.items():
+            setattr(automation, name, value)
+
+    site_walls = {span["track"]: span["duration"] for span in TRACER.spans("site")}
+    phases = {}
+    for span in TRACER.spans():
+        if span["name"] in ("site", "run"):
+            continue
+        phase = phases.setdefault(span["name"], {"count": 0, "total": 0.0})
+        phase["count"] += 1
+        phase["total"] += span["duration"]
+    commands = TELEMETRY.report() if engine == "browser" else None
+    deploys = server.mock_state.deploys
+    # Requests for the logo, favicon and icon font that reached the mock, 0 when the profile blocks them
+    asset_requests = sum(count for key, count in server.mock_state.requests.items() if key.startswith("GET /static/"))
+
+    return {
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "config": {
+            "sites": sites, "concurrency": concurrency, "engine": engine, "multi_page": multi_page,
+            "page_concurrency": page_concurrency, "rate": rate, "latency": mock_config.latency,
+            "deploy_latency": mock_config.deploy_latency, "failure_rate": mock_config.failure_rate,
+            "render_delay": mock_config.render_delay, "dialog_delay": mock_config.dialog_delay,
+            "asset_latency": mock_config.asset_latency, "load_profile": overrides["LOAD_PROFILE"],
+        },
+        "results": {site_id: info["result"] for site_id, info in results.items()},
+        "site_walls": site_walls,
+        "phases": phases,
+        "deploys": {"total": len(deploys), "succeeded": sum(1 for deploy in deploys if deploy[2])},
+        "asset_requests": asset_requests,
+        "commands_by_type": {stat["command"]: stat["count"] for stat in commands["by_command"]} if commands else {},
+        "metrics": {
+            "total_wall": total_wall,
+            "site_wall_mean": sum(site_walls.values()) / len(site_walls) if site_walls else None,
+            "site_wall_max": max(site_walls.values()) if site_walls else None,
+            "webdriver_commands": commands["total_commands"] if commands else None,
+            "peak_rss": peak_rss,
+            "python_peak": python_peak,
+        },
+    }
+
+def _format_metric(name, value):
+    if value is None:
+        return "-"
+    if name in ("peak_rss", "python_peak"):
+        return f"{value / 1024 / 1024:.1f} MB"
+    if name == "webdriver_commands":
+        return str(value)
+    return f"{value:.2f}s"
+
+def format_result(result):
+    """Return the per-site and total figures of a benchmark result as printable lines"""
+    lines = [f"{'site':<12} {'wall':>9} {'result':>8}"]
+    for site_id, wall in sorted(result["site_walls"].items(), key=lambda item: -item[1]):
+        lines.append(f"{site_id:<12} {wall:>8.2f}s {str(result['results'].get(site_id)):>8}")
+    lines.append("")
+    for name in COMPARED_METRICS:
+        lines.append(f"{name:<20} {_format_metric(name, result['metrics'].get(name)):>12}")
+    lines.append(f"{'deploys':<20} {result['deploys']['succeeded']:>5}/{result['deploys']['total']} succeeded")
+    if "asset_requests" in result:
+        lines.append(f"{'static assets':<20} {result['asset_requests']:>5} requests with the "
+                     f"{result['config']['load_profile']} load profile")
+    if result["commands_by_type"]:
+        lines.append("")
+        lines.append("WebDriver commands by type:")
+        for command, count in sorted(result["commands_by_type"].items(), key=lambda item: -item[1]):
+            lines.append(f"  {command:<36} {count:>6}")
+    return lines
+
+def compare(result, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Compare two results, returns (printable lines, names of the regressed metrics)"""
+    lines = []
+    if result["config"] != baseline["config"]:
+        lines.append("[!] The baseline was recorded with a different configuration:")
+        lines.append(f"    baseline: {json.dumps(baseline['config'], sort_keys=True)}")
+        lines.append(f"    current:  {json.dumps(result['config'], sort_keys=True)}")
+    lines.append(f"{'metric':<20} {'baseline':>12} {'current':>12} {'change':>8}")
+    regressions = []
+    for name in COMPARED_METRICS:
+        old = baseline["metrics"].get(name)
+        new = result["metrics"].get(name)
+        change = ""
+        if old and new is not None:
+            ratio = (new - old) / old
+            change = f"{ratio:+.1%}"
+            if ratio > tolerance:
+                regressions.append(name)
+                change += " !"
+        lines.append(f"{name:<20} {_format_metric(name, old):>12} {_format_metric(name, new):>12} {change:>8}")
+    return lines, regressions
+
+def save_result(result, directory=BENCHMARK_DIR, baseline=False):
+    """Write the result to directory (and as the baseline when asked), returns the result's path"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    targets = [path] + ([os.path.join(directory, BASELINE_FILE)] if baseline else [])
+    for target in targets:
+        with open(target, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return path
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Benchmark a run against the local mock admin panel')
+    parser.add_argument('--sites', type=int, default=4, help='Number of synthetic sites (default: %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=2, help='Sites processed in parallel (default: %(default)s)')
+    parser.add_argument('--engine', choices=['browser', 'http', 'cdp'], default='browser',
+                        help='Engine to benchmark (default: %(default)s)')
+    parser.add_argument('--multi-page', action='store_true', help='Run the multi-page update plan')
+    parser.add_argument('--page-concurrency', type=int, default=1, help='Pages of one site processed in parallel')
+    parser.add_argument('--rate', type=float, default=100.0,
+                        help='Actions per second allowed per site, the default keeps the rate limiter out of the way')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds the mock adds to every response')
+    parser.add_argument('--deploy-latency', type=float, default=0.0, help='Extra seconds a mock deploy takes')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Probability that a mock deploy fails')
+    parser.add_argument('--render-delay', type=float, default=0.0,
+                        help='Seconds before a mock page renders its form or buttons')
+    parser.add_argument('--dialog-delay', type=float, default=0.0,
+                        help='Seconds between a button click and the mock confirm box')
+    parser.add_argument('--asset-latency', type=float, default=0.0,
+                        help='Extra seconds every mock static asset (logo, favicon, icon font) takes')
+    parser.add_argument('--load-profile', choices=list(automation.LOAD_PROFILES), default=automation.LOAD_PROFILE,
+                        help='Page loading profile of the browsers (default: %(default)s)')
+    parser.add_argument('--no-pressroom', action='store_true', help='Synthetic sites have no pressroom-list page')
+    parser.add_argument('--output', default=BENCHMARK_DIR, help='Directory of saved results (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true', help='Also save this result as the baseline')
+    parser.add_argument('--compare', action='store_true',
+                        help='Compare with the saved baseline, exit with status 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help='Relative increase reported as a regression (default: %(default)s)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    mock_config = MockConfig(latency=args.latency, deploy_latency=args.deploy_latency,
+                             failure_rate=args.failure_rate, has_pressroom=not args.no_pressroom,
+                             render_delay=args.render_delay, dialog_delay=args.dialog_delay,
+                             asset_latency=args.asset_latency)
+    result = run_benchmark(args.sites, args.concurrency, args.engine, args.multi_page, args.page_concurrency,
+                           mock_config, args.rate, args.load_profile)
+
+    print("\n===== Benchmark Results =====")
+    for line in format_result(result):
+        print(line)
+    result_path = save_result(result, args.output, baseline=args.save_baseline)
+    print(f"\nResult saved to {result_path}" + (" (also saved as baseline)" if args.save_baseline else ""))
+
+    if args.compare:
+        baseline_path = os.path.join(args.output, BASELINE_FILE)
+        if not os.path.exists(baseline_path):
+            print(f"No baseline found at {baseline_path}, run with --save-baseline first")
+            sys.exit(1)
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        lines, regressions = compare(result, baseline, args.tolerance)
+        print("\n===== Comparison with Baseline =====")
+        for line in lines:
+            print(line)
+        if regressions:
+            print(f"\n[X] Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n[+] No regression against the baseline")
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Cooperative cancellation of a run
+
+automate_vidnoz() activates a CancelToken for the run; every wait primitive
+(vidnoz_waits.wait_until, the rate limiter) sleeps on the token
+instead of time.sleep, so cancel() interrupts them immediately and the next
+check raises Cancelled. Callbacks registered with on_cancel() run on the
+cancelling thread, e.g. to kill the browsers blocked in a long WebDriver call;
+they must return quickly, the thread may be the GUI thread.
+
+Cancelled derives from BaseException like KeyboardInterrupt, so the broad
+`except Exception` blocks that turn errors into a failed site let it through.
+"""
+import threading
+
+class Cancelled(BaseException):
+    """The run's CancelToken was cancelled"""
+
+class CancelToken:
+    """Thread-safe cancellation flag with interruptible sleeps and cancel callbacks"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        """Cancel the run and run the registered callbacks once"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def check(self):
+        """Raise Cancelled if the run was cancelled"""
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    def sleep(self, seconds):
+        """time.sleep that returns early, raising Cancelled, when the run is cancelled"""
+        if self._event.wait(max(0.0, seconds)):
+            raise Cancelled(self.reason)
+
+    def on_cancel(self, callback):
+        """Call callback when the run is cancelled (right away if it already is)
+
+        Returns a function removing the callback again.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+# Token of the current run, used by the wait primitives when no token is passed explicitly
+_active = CancelToken()
+
+def activate(token):
+    """Make token the current run's token, returns it"""
+    global _active
+    _active = token
+    return token
+
+def current_token():
+    return _active
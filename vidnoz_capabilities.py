@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""On-disk index of what was learned about each site's admin panel, keyed by site id
+
+For every site it remembers which locator strategy found each element, which
+optional list pages exist and what the confirmation dialog looked like, so
+later runs try the known locator first and skip probing pages that are known
+to be missing. A recorded locator that stops matching is replaced or dropped
+automatically, and page knowledge older than `max_age` seconds is probed again.
+"""
+import json
+import os
+import threading
+import time
+
+class CapabilityCache:
+    """Thread-safe store of SiteProfile data, written atomically after every change"""
+
+    def __init__(self, path="site_capabilities.json", max_age=7 * 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load_entries(self):
+        if self._entries is None:
+            self._entries = {}
+            try:
+                if os.path.exists(self.path):
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if isinstance(data, dict):
+                        self._entries = data
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _write_entries(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _get(self, site_id, section, key):
+        with self._lock:
+            return self._load_entries().get(site_id, {}).get(section, {}).get(key)
+
+    def _set(self, site_id, section, key, value):
+        with self._lock:
+            entry = self._load_entries().setdefault(site_id, {})
+            values = entry.setdefault(section, {})
+            if value is None:
+                if values.pop(key, None) is None:
+                    return
+            elif values.get(key) == value:
+                return
+            else:
+                values[key] = value
+            entry["updated_at"] = time.time()
+            self._write_entries()
+
+    def for_site(self, site_id):
+        """Return the view of one site's capabilities"""
+        return SiteProfile(self, site_id)
+
+    def forget(self, site_id):
+        """Drop everything learned about a site"""
+        with self._lock:
+            if self._load_entries().pop(site_id, None) is not None:
+                self._write_entries()
+
+class SiteProfile:
+    """Capabilities of one site, see CapabilityCache"""
+
+    def __init__(self, cache, site_id):
+        self.cache = cache
+        self.site_id = site_id
+
+    def locator(self, key):
+        """Name of the strategy that last found element `key`, or None"""
+        return self.cache._get(self.site_id, "locators", key)
+
+    def order(self, key, strategies):
+        """Return strategies with the last winning one for `key` moved to the front, fallbacks stay last"""
+        winner = self.locator(key)
+        if not winner:
+            return strategies
+        return sorted(strategies, key=lambda s: (bool(s.get("fallback")), s["name"] != winner))
+
+    def record_locator(self, key, strategy_name):
+        """Remember the winning strategy for `key`, None forgets it after a miss"""
+        self.cache._set(self.site_id, "locators", key, strategy_name)
+
+    def page_exists(self, page):
+        """True/False when known and still fresh, None when the page has to be probed"""
+        entry = self.cache._get(self.site_id, "pages", page)
+        if not entry or time.time() - entry.get("checked_at", 0) > self.cache.max_age:
+            return None
+        return entry.get("exists")
+
+    def record_page(self, page, exists):
+        self.cache._set(self.site_id, "pages", page, {"exists": bool(exists), "checked_at": time.time()})
+
+    def dialog(self):
+        """Shape of the confirmation dialog seen last time, or None"""
+        return self.cache._get(self.site_id, "dialog", "confirm")
+
+    def record_dialog(self, outcome):
+        """Store the dialog shape reported by the CONFIRM_DIALOG script"""
+        shape = {
+            "strategy": outcome.get("strategy"),
+            "dialog_class": outcome.get("dialog_class"),
+            "button": outcome.get("button"),
+        }
+        self.cache._set(self.site_id, "dialog", "confirm", shape)
@@ -0,0 +1,640 @@
+# -*- coding: utf-8 -*-
+"""asyncio engine driving Chrome over the DevTools Protocol
+
+All sites run on one event loop against a single Chrome process; every site
+gets its own isolated browser context, so dozens of sessions can run
+concurrently without a thread or a chromedriver per browser. The page logic
+mirrors process_site and uses the same injected scripts (vidnoz_scripts).
+
+automate_vidnoz_async() is a drop-in for automate_vidnoz's processing loop
+and returns the same {site_id: {'url': ..., 'result': ...}} dictionary.
+"""
+import asyncio
+import base64
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+import vidnoz_scripts as scripts
+from vidnoz_plan import PlanStep, build_plan
+from vidnoz_locators import button_with_text, LOGIN_BUTTON, CONFIRM_BUTTON
+from vidnoz_rate_limit import LIMITER
+from vidnoz_trace import TRACER
+from vidnoz_log import LOG, debug_enabled, log_context
+from vidnoz_progress import PROGRESS
+from vidnoz_journal import JOURNAL
+from vidnoz_changes import (CHANGES, FINGERPRINT_SELECTOR, FINGERPRINT_MAX_PAGES, FINGERPRINT_PAGE_TIMEOUT,
+                            fingerprint)
+from vidnoz_load_profile import get_profile, chrome_arguments, apply_to_page
+
+CHROME_PATH = None  # Path to the Chrome executable, searched in the usual locations when None
+NAVIGATION_TIMEOUT = 30  # Seconds to wait for a page load event
+COMMAND_TIMEOUT = 30  # Seconds to wait for a DevTools command response
+STARTUP_TIMEOUT = 30  # Seconds to wait for Chrome to open its DevTools port
+
+# Event a navigation waits for under each page load strategy, see vidnoz_load_profile.py
+LOAD_EVENTS = {"normal": "Page.loadEventFired", "eager": "Page.domContentEventFired", "none": None}
+
+class CDPError(Exception):
+    """A DevTools command failed or the connection was lost"""
+
+def find_chrome():
+    """Return the path of a Chrome/Chromium executable"""
+    if CHROME_PATH:
+        return CHROME_PATH
+    for name in ("google-chrome", "google-chrome-stable", "chrome", "chromium", "chromium-browser"):
+        path = shutil.which(name)
+        if path:
+            return path
+    candidates = []
+    if sys.platform == "win32":
+        for env in ("PROGRAMFILES", "PROGRAMFILES(X86)", "LOCALAPPDATA"):
+            root = os.environ.get(env)
+            if root:
+                candidates.append(os.path.join(root, "Google", "Chrome", "Application", "chrome.exe"))
+    elif sys.platform == "darwin":
+        candidates.append("/Applications/Google Chrome.app/Contents/MacOS/Google Chrome")
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    raise CDPError("Chrome executable not found, set vidnoz_cdp.CHROME_PATH")
+
+def _mask(data, mask):
+    if not data:
+        return data
+    length = len(data)
+    key = int.from_bytes((mask * (length // 4 + 1))[:length], "big")
+    return (int.from_bytes(data, "big") ^ key).to_bytes(length, "big")
+
+class WebSocket:
+    """Minimal RFC 6455 client, enough for the DevTools endpoint (text frames, ping/pong, close)"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, url):
+        parts = urlsplit(url)
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80, limit=2 ** 24)
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (f"GET {parts.path} HTTP/1.1\r\n"
+                   f"Host: {parts.netloc}\r\n"
+                   "Upgrade: websocket\r\n"
+                   "Connection: Upgrade\r\n"
+                   f"Sec-WebSocket-Key: {key}\r\n"
+                   "Sec-WebSocket-Version: 13\r\n\r\n")
+        writer.write(request.encode())
+        await writer.drain()
+        response = await reader.readuntil(b"\r\n\r\n")
+        status_line = response.split(b"\r\n", 1)[0]
+        if b" 101 " not in status_line + b" ":
+            writer.close()
+            raise CDPError(f"WebSocket handshake failed: {status_line.decode(errors='replace')}")
+        return cls(reader, writer)
+
+    async def _send_frame(self, opcode, payload):
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 2 ** 16:
+            header += bytes([0x80 | 126]) + struct.pack(">H", length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack(">Q", length)
+        mask = os.urandom(4)
+        self.writer.write(header + mask + _mask(payload, mask))
+        await self.writer.drain()
+
+    async def send(self, text):
+        await self._send_frame(0x1, text.encode("utf-8"))
+
+    async def recv(self):
+        """Return the next text message, or None once the connection is closed"""
+        message = b""
+        while True:
+            try:
+                head = await self.reader.readexactly(2)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return None
+            fin = head[0] & 0x80
+            opcode = head[0] & 0x0F
+            length = head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack(">H", await self.reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack(">Q", await self.reader.readexactly(8))[0]
+            mask = await self.reader.readexactly(4) if head[1] & 0x80 else None
+            payload = await self.reader.readexactly(length)
+            if mask:
+                payload = _mask(payload, mask)
+            if opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                await self._send_frame(0xA, payload)
+                continue
+            if opcode == 0xA:
+                continue
+            message += payload
+            if fin:
+                return message.decode("utf-8")
+
+    async def close(self):
+        try:
+            await self._send_frame(0x8, b"")
+        except Exception:
+            pass
+        self.writer.close()
+
+class CDPConnection:
+    """Multiplexes commands and events of all sessions over the browser WebSocket"""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self._next_id = 0
+        self._pending = {}
+        self._listeners = {}
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+
+    async def _read_loop(self):
+        while True:
+            message = await self.websocket.recv()
+            if message is None:
+                break
+            data = json.loads(message)
+            if "id" in data:
+                future = self._pending.pop(data["id"], None)
+                if future and not future.done():
+                    if "error" in data:
+                        future.set_exception(CDPError(data["error"].get("message", str(data["error"]))))
+                    else:
+                        future.set_result(data.get("result", {}))
+                continue
+            key = (data.get("sessionId"), data.get("method"))
+            for callback in list(self._listeners.get(key, ())):
+                callback(data.get("params", {}))
+        # Connection lost, fail everything still waiting
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(CDPError("DevTools connection closed"))
+        self._pending = {}
+
+    async def send(self, method, params=None, session_id=None, timeout=COMMAND_TIMEOUT):
+        self._next_id += 1
+        message = {"id": self._next_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        await self.websocket.send(json.dumps(message))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._pending.pop(message["id"], None)
+            raise CDPError(f"{method} timed out after {timeout}s")
+
+    def on(self, method, session_id, callback):
+        self._listeners.setdefault((session_id, method), []).append(callback)
+
+    def off(self, method, session_id, callback):
+        listeners = self._listeners.get((session_id, method), [])
+        if callback in listeners:
+            listeners.remove(callback)
+
+    def expect(self, method, session_id):
+        """Return a future resolved by the next `method` event of the session"""
+        future = asyncio.get_running_loop().create_future()
+
+        def callback(params):
+            self.off(method, session_id, callback)
+            if not future.done():
+                future.set_result(params)
+        self.on(method, session_id, callback)
+        return future
+
+    async def close(self):
+        await self.websocket.close()
+        self._reader_task.cancel()
+
+class ChromeBrowser:
+    """One Chrome process controlled over its DevTools WebSocket"""
+
+    def __init__(self, process, user_data_dir, connection):
+        self.process = process
+        self.user_data_dir = user_data_dir
+        self.connection = connection
+        # Coroutine functions awaited with every new page, e.g. vidnoz_fixtures.FixtureRecorder.attach
+        self.page_hooks = []
+
+    @classmethod
+    async def launch(cls, headless=True, extra_args=None):
+        user_data_dir = tempfile.mkdtemp(prefix="vidnoz-cdp-")
+        args = [
+            find_chrome(),
+            "--remote-debugging-port=0",
+            f"--user-data-dir={user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--disable-extensions",
+            "--ignore-certificate-errors",
+            "--window-size=1920,1080",
+        ]
+        if headless:
+            args.append("--headless=new")
+        args.extend(extra_args or [])
+        args.append("about:blank")
+        process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # Chrome writes the chosen port and the browser endpoint path to DevToolsActivePort
+        port_file = os.path.join(user_data_dir, "DevToolsActivePort")
+        deadline = time.time() + STARTUP_TIMEOUT
+        while True:
+            if os.path.exists(port_file):
+                with open(port_file, 'r', encoding='utf-8') as f:
+                    lines = f.read().split()
+                if len(lines) >= 2:
+                    break
+            if process.poll() is not None or time.time() > deadline:
+                process.kill()
+                shutil.rmtree(user_data_dir, ignore_errors=True)
+                raise CDPError("Chrome did not open its DevTools port")
+            await asyncio.sleep(0.05)
+
+        websocket = await WebSocket.connect(f"ws://127.0.0.1:{lines[0]}{lines[1]}")
+        return cls(process, user_data_dir, CDPConnection(websocket))
+
+    async def new_page(self, context_id=None):
+        """Open a tab in a fresh, isolated browser context, or in context_id to share its session"""
+        owns_context = context_id is None
+        if owns_context:
+            context = await self.connection.send("Target.createBrowserContext", {"disposeOnDetach": True})
+            context_id = context["browserContextId"]
+        target = await self.connection.send("Target.createTarget",
+                                            {"url": "about:blank", "browserContextId": context_id})
+        attached = await self.connection.send("Target.attachToTarget",
+                                              {"targetId": target["targetId"], "flatten": True})
+        page = CDPPage(self.connection, attached["sessionId"], target["targetId"], context_id, owns_context)
+        await page.enable()
+        for hook in self.page_hooks:
+            await hook(page)
+        return page
+
+    async def close(self):
+        try:
+            await self.connection.send("Browser.close", timeout=5)
+        except Exception:
+            pass
+        try:
+            await self.connection.close()
+        except Exception:
+            pass
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+class CDPPage:
+    """Awaitable navigation, script evaluation and input for one tab"""
+
+    def __init__(self, connection, session_id, target_id, context_id, owns_context=True):
+        self.connection = connection
+        self.session_id = session_id
+        self.target_id = target_id
+        self.context_id = context_id
+        self.owns_context = owns_context
+        self.load_event = LOAD_EVENTS["normal"]
+
+    async def send(self, method, params=None, timeout=COMMAND_TIMEOUT):
+        return await self.connection.send(method, params, self.session_id, timeout)
+
+    async def enable(self):
+        await self.send("Page.enable")
+        # Native alert/confirm dialogs are accepted, the panel's own dialogs are handled in the DOM
+        self.connection.on("Page.javascriptDialogOpening", self.session_id,
+                           lambda params: asyncio.ensure_future(
+                               self.send("Page.handleJavaScriptDialog", {"accept": True})))
+
+    async def _wait_loaded(self, loaded, timeout):
+        if loaded is None:
+            return
+        try:
+            await asyncio.wait_for(loaded, timeout)
+        except asyncio.TimeoutError:
+            # The DOM may still be usable, callers wait for their own conditions
+            pass
+
+    async def navigate(self, url, timeout=NAVIGATION_TIMEOUT):
+        loaded = self.connection.expect(self.load_event, self.session_id) if self.load_event else None
+        result = await self.send("Page.navigate", {"url": url})
+        if result.get("errorText"):
+            if loaded is not None:
+                loaded.cancel()
+            raise CDPError(f"Navigation to {url} failed: {result['errorText']}")
+        await self._wait_loaded(loaded, timeout)
+
+    async def reload(self, timeout=NAVIGATION_TIMEOUT):
+        loaded = self.connection.expect(self.load_event, self.session_id) if self.load_event else None
+        await self.send("Page.reload")
+        await self._wait_loaded(loaded, timeout)
+
+    async def evaluate(self, body, *args, await_promise=False, timeout=COMMAND_TIMEOUT):
+        """Run a vidnoz_scripts snippet and return its value"""
+        result = await self.send("Runtime.evaluate", {
+            "expression": scripts.as_expression(body, *args),
+            "returnByValue": True,
+            "awaitPromise": await_promise,
+        }, timeout=timeout)
+        if result.get("exceptionDetails"):
+            raise CDPError(result["exceptionDetails"].get("text", "Script error"))
+        return result.get("result", {}).get("value")
+
+    async def wait_for(self, body, *args, timeout=10, poll=0.2):
+        """Poll a snippet until it returns a truthy value, returns None on timeout"""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                value = await self.evaluate(body, *args)
+            except CDPError:
+                value = None
+            if value:
+                return value
+            if time.time() >= deadline:
+                return None
+            await asyncio.sleep(poll)
+
+    async def fill(self, selector, text):
+        """Focus an input, clear it and type text like a user would"""
+        if not await self.evaluate(scripts.FOCUS_AND_CLEAR, selector):
+            return False
+        await self.send("Input.insertText", {"text": text})
+        return True
+
+    async def close(self):
+        try:
+            await self.connection.send("Target.closeTarget", {"targetId": self.target_id})
+            if self.owns_context:
+                await self.connection.send("Target.disposeBrowserContext", {"browserContextId": self.context_id})
+        except CDPError:
+            pass
+
+@TRACER.traced("deploy {button_text}")
+async def deploy_button(page, button_text, site_url, deployment_wait_time, page_name=None, confirm_wait_time=6):
+    """Click a button, confirm its dialog and wait for the deployment status
+
+    Returns True (success), False (failure) or None (unknown), like check_deployment_status.
+    """
+    LOG.info("----- Attempting to click button: '%s' -----", button_text)
+    await LIMITER.acquire_async(site_url)
+    match = await page.wait_for(scripts.LOCATE, button_with_text(button_text), True, timeout=10)
+    if not match:
+        LOG.warning("Button not found: '%s'", button_text)
+        return False
+    LOG.info("Clicked button: '%s' (strategy: %s)", button_text, match.get('strategy'))
+
+    confirmation = await page.evaluate(scripts.CONFIRM_DIALOG, confirm_wait_time * 1000, CONFIRM_BUTTON, debug_enabled(),
+                                       await_promise=True, timeout=confirm_wait_time + 10)
+    if not confirmation or not confirmation.get("clicked"):
+        LOG.warning("[!] Unable to click confirmation button, '%s' may not have executed.", button_text)
+        return False
+    LOG.debug("Clicked confirmation button '%s' after %s ms", confirmation.get('button'), confirmation.get('waited'))
+
+    # The toast of the previous button may still be visible, only a new indicator counts
+    status = await page.evaluate(scripts.DEPLOYMENT_STATUS, deployment_wait_time * 1000, True,
+                                 await_promise=True, timeout=deployment_wait_time + 10)
+    status = status or {}
+    indicator, detail, status = status.get("indicator"), status.get("detail"), status.get("status")
+    PROGRESS.emit("deploy", action=button_text, page=page_name, result={"failure": False, "success": True}.get(status))
+    if status == "failure":
+        if indicator == "error":
+            LOG.error("[X] Site %s deployment rejected: %s", site_url, detail or '')
+        else:
+            LOG.error("[X] Site %s deployment failed! System may have logged out.", site_url)
+        LIMITER.report(site_url, False)
+        return False
+    if status == "success":
+        LOG.info("[+] Site %s deployed successfully! Styles updated.", site_url)
+        LIMITER.report(site_url, True)
+        return True
+    LOG.warning("[!] Site %s deployment status unknown! Timeout, please check manually.", site_url)
+    return None
+
+@TRACER.traced("login")
+async def login(page, site_url, username, password, login_wait_time, login_retry_count):
+    """Log into the panel if the login form is shown, returns True when logged in"""
+    for login_attempt in range(login_retry_count):
+        state = await page.wait_for(scripts.LOGIN_STATE, timeout=10)
+        if state == "panel":
+            return True
+        if login_attempt > 0:
+            LOG.info("----- Login Retry Attempt %s/%s -----", login_attempt+1, login_retry_count)
+            await page.reload()
+        LOG.info("Login page detected, performing login...")
+        if not await page.wait_for(scripts.LOGIN_FORM_READY, timeout=10):
+            LOG.warning("Login form not found")
+            continue
+        await page.fill("input[placeholder='User Name']", username)
+        await page.fill("input[placeholder='Password']", password)
+        await LIMITER.acquire_async(site_url)
+        if not await page.wait_for(scripts.LOCATE, LOGIN_BUTTON, True, timeout=10):
+            LOG.warning("Could not find or click any login button")
+            continue
+        finished = await page.wait_for(scripts.LOGIN_FINISHED, timeout=login_wait_time)
+        if finished == "done":
+            LOG.info("Login successful!")
+            LIMITER.report(site_url, True)
+            return True
+        LOG.warning("Login appears to have failed, still on login page")
+        LIMITER.report(site_url, False)
+    return False
+
+async def page_fingerprint(page):
+    """Fingerprint of the list on the current page over all its pages, None when there is none"""
+    try:
+        return fingerprint(await page.evaluate(
+            scripts.LIST_CONTENT, FINGERPRINT_SELECTOR, FINGERPRINT_MAX_PAGES, FINGERPRINT_PAGE_TIMEOUT * 1000,
+            await_promise=True, timeout=FINGERPRINT_MAX_PAGES * FINGERPRINT_PAGE_TIMEOUT + 5))
+    except Exception:
+        return None
+
+@TRACER.traced("page {step.page}")
+async def update_page_cdp(page, base_url, step, buttons, deployment_wait_time, confirm_wait_time=6):
+    """Visit one page of the plan and deploy its buttons, returns True, False or None (page skipped)"""
+    page_url = f"{base_url}/frontend/page/{step.page}"
+    LOG.info("Visiting page: %s", page_url)
+    await page.navigate(page_url)
+    if not await page.wait_for(scripts.PANEL_READY, buttons[0], timeout=5 if step.optional else 10):
+        if step.optional:
+            LOG.info("Page %s doesn't exist or expected button not found, skipping this page", step.page)
+            return None
+    # Actions whose list did not change since their last successful deploy are skipped,
+    # the list is only read (all of its pages) when --only-changed asks for it
+    if CHANGES.only_changed:
+        CHANGES.observe(step.page, await page_fingerprint(page))
+        unchanged = [button_text for button_text in buttons if CHANGES.unchanged(step.page, button_text)]
+        if unchanged:
+            LOG.info("Unchanged since the last deploy on %s, skipping: %s", step.page, ", ".join(unchanged))
+            buttons = [button_text for button_text in buttons if button_text not in unchanged]
+    for button_text in buttons:
+        if await deploy_button(page, button_text, page_url, deployment_wait_time, step.page,
+                               confirm_wait_time) is False:
+            LOG.error("[X] Failed to click '%s' on %s, aborting operation", button_text, step.page)
+            return False
+        await page.wait_for(scripts.NONE_VISIBLE,
+                            f"{scripts.DIALOG_SELECTOR}, {scripts.TOAST_SELECTOR}", timeout=2)
+    return True
+
+async def run_plan_cdp(browser, page, base_url, steps, deployment_wait_time, page_concurrency=1,
+                       confirm_wait_time=6):
+    """Run the multi-page plan of one site, pages in parallel tabs of the site's context when asked"""
+    parallel = (page_concurrency > 1 and len(steps) > 1
+                and not any(step.optional and step.site_wide for step in steps))
+    if not parallel:
+        carried = []
+        for step in steps:
+            buttons = carried + step.buttons
+            carried = []
+            result = await update_page_cdp(page, base_url, step, buttons, deployment_wait_time, confirm_wait_time)
+            if result is False:
+                return False
+            if result is None:
+                carried = [b for b in buttons if b not in step.buttons or b in step.site_wide]
+        return True
+
+    # Site-wide actions first, then every page in its own tab sharing the login of the context
+    host = next((step for step in steps if step.site_wide), None)
+    if host is not None:
+        site_wide_step = PlanStep(host.page, host.site_wide, host.optional)
+        if await update_page_cdp(page, base_url, site_wide_step, site_wide_step.buttons,
+                                 deployment_wait_time, confirm_wait_time) is False:
+            return False
+    groups = [PlanStep(step.page, [b for b in step.buttons if b not in step.site_wide], step.optional)
+              for step in steps]
+    semaphore = asyncio.Semaphore(page_concurrency)
+    site_track = TRACER.current_track()
+
+    async def run_group(group):
+        # Every tab gets its own track next to the site's
+        async with semaphore:
+            with TRACER.track(f"{site_track} / {group.page}"), log_context(page=group.page):
+                tab = await browser.new_page(page.context_id)
+                try:
+                    return await update_page_cdp(tab, base_url, group, group.buttons, deployment_wait_time,
+                                                 confirm_wait_time)
+                except Exception as e:
+                    LOG.error("[X] Error updating page %s: %s", group.page, e)
+                    return False
+                finally:
+                    await tab.close()
+
+    results = await asyncio.gather(*(run_group(group) for group in groups if group.buttons))
+    return not any(result is False for result in results)
+
+async def process_site_cdp(browser, site_url, site_label=None, username=None, password=None,
+                           multi_page=False, update_plan=None, login_wait_time=15, login_retry_count=3,
+                           deployment_wait_time=45, page_concurrency=1, confirm_wait_time=6):
+    """Process a single site in its own browser context, same result contract as process_site"""
+    label_info = f" [{site_label}]" if site_label else ""
+    base_url = '/'.join(site_url.split('/')[:3])
+    LOG.info("===== Processing site%s over DevTools: %s =====", label_info, site_url)
+    with TRACER.span("new_context"):
+        page = await browser.new_page()
+    try:
+        TRACER.phase("navigate")
+        await LIMITER.acquire_async(site_url)
+        await page.navigate(site_url)
+        TRACER.phase("login")
+        if not await login(page, site_url, username, password, login_wait_time, login_retry_count):
+            LOG.error("[X] Site%s login failed after %s attempts, skipping this site", label_info, login_retry_count)
+            return False
+
+        TRACER.phase("update")
+        if not multi_page:
+            await page.navigate(site_url)
+            await page.wait_for(scripts.PANEL_READY, "更新", timeout=5)
+            return await deploy_button(page, "更新公共样式", site_url, deployment_wait_time,
+                                       confirm_wait_time=confirm_wait_time)
+
+        steps = JOURNAL.remaining_steps(site_label, build_plan(update_plan, site_label))
+        if not await run_plan_cdp(browser, page, base_url, steps, deployment_wait_time, page_concurrency,
+                                  confirm_wait_time):
+            return False
+        LOG.info("[+] Site%s multi-page update operations completed successfully", label_info)
+        return True
+    except Exception as e:
+        LOG.error("[X] Site%s processing error: %s", label_info, e, exc_info=True)
+        return False
+    finally:
+        TRACER.end_phase()
+        await page.close()
+
+async def automate_vidnoz_async(sites_dict, concurrency=None, username=None, password=None,
+                                multi_page=False, update_plan=None, headless=True, cancel_token=None,
+                                load_profile=None, **timing):
+    """Process all sites on one event loop and one Chrome, at most `concurrency` at a time
+
+    Returns {site_id: {'url': url, 'result': True/False/None, 'cancelled': bool}} in the order of
+    sites_dict. Cancelling cancel_token cancels the pending site tasks; the sites in progress
+    come back cancelled, the ones not started yet are left out.
+    load_profile names a vidnoz_load_profile profile, every tab loads pages with it.
+    """
+    concurrency = max(1, concurrency or len(sites_dict))
+    semaphore = asyncio.Semaphore(concurrency)
+    load_event = LOAD_EVENTS[get_profile(load_profile)["page_load_strategy"]]
+    with TRACER.span("chrome_launch"):
+        browser = await ChromeBrowser.launch(headless=headless, extra_args=chrome_arguments(load_profile))
+
+    async def apply_load_profile(page):
+        page.load_event = load_event
+        await apply_to_page(page, load_profile)
+
+    browser.page_hooks.append(apply_load_profile)
+    results = {}
+
+    async def run_one(index, site_id, site_url):
+        async with semaphore:
+            LOG.info("[%s/%s] Processing site [%s]: %s", index, len(sites_dict), site_id, site_url)
+            # Each task runs in its own context, so every site keeps its own track
+            with TRACER.track(site_id, "site", url=site_url) as span, log_context(site=site_id):
+                started = time.time()
+                PROGRESS.emit("site_started", url=site_url)
+                try:
+                    result = await process_site_cdp(browser, site_url, site_id, username, password,
+                                                    multi_page, update_plan, **timing)
+                except asyncio.CancelledError:
+                    # Stopped by the cancelled run, reported as cancelled instead of unknown
+                    LOG.warning("[!] Site [%s] cancelled", site_id)
+                    span["result"] = "cancelled"
+                    PROGRESS.emit("site_finished", result=None, cancelled=True, duration=time.time() - started)
+                    results[site_id] = {'url': site_url, 'result': None, 'cancelled': True}
+                    raise
+                except Exception as e:
+                    LOG.error("[X] Error processing site [%s]: %s", site_id, e)
+                    result = False
+                span["result"] = result
+                PROGRESS.emit("site_finished", result=result, cancelled=False, duration=time.time() - started)
+            results[site_id] = {'url': site_url, 'result': result, 'cancelled': False}
+
+    loop = asyncio.get_running_loop()
+    run = asyncio.ensure_future(asyncio.gather(*(run_one(i, site_id, site_url)
+                                                 for i, (site_id, site_url) in enumerate(sites_dict.items(), 1))))
+    # The token is cancelled from another thread, the tasks are cancelled on the loop
+    remove_cancel_callback = (cancel_token.on_cancel(lambda: loop.call_soon_threadsafe(run.cancel))
+                              if cancel_token is not None else lambda: None)
+    try:
+        await run
+    except asyncio.CancelledError:
+        if cancel_token is None or not cancel_token.cancelled:
+            raise
+        LOG.warning("[!] Run cancelled")
+    finally:
+        remove_cancel_callback()
+        await browser.close()
+    return {site_id: results[site_id] for site_id in sites_dict if site_id in results}
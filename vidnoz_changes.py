@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Change detection for the deploy actions, skips deploys whose inputs did not change
+
+In an only_changed run, when a list page of the plan is opened, the engines
+take a fingerprint of the list it shows: the item total and the rows with
+their update times on every page of the list (scripts.LIST_CONTENT over
+FINGERPRINT_SELECTOR walks the pagination, up to FINGERPRINT_MAX_PAGES
+pages). Every successful deploy on the page stores that fingerprint for its
+action, so the file deploy_fingerprints.json holds the input state of each
+action's last successful deploy in such a run:
+
+    {"tw": {"faq-list": {"更新faq全部详情": {"fingerprint": "3f2a...", "deployed_at": 1718000000.0}}}}
+
+With only_changed, an action is skipped when the page's current fingerprint
+equals the stored one. Site-wide actions (更新公共样式) depend on more than
+the list of one page and always run, as does every action on a page
+without a fingerprint (no list, or more pages than FINGERPRINT_MAX_PAGES).
+"""
+import hashlib
+import json
+import os
+import threading
+
+from vidnoz_log import current_context
+from vidnoz_progress import PROGRESS
+
+DEFAULT_FINGERPRINT_FILE = "deploy_fingerprints.json"
+
+# Elements of an Element UI list page whose text is fingerprinted
+FINGERPRINT_SELECTOR = ".el-pagination__total, .el-table__body"
+FINGERPRINT_MAX_PAGES = 20  # Longer lists get no fingerprint and are always deployed, without walking them
+FINGERPRINT_PAGE_TIMEOUT = 3  # Seconds to wait for a page of a list to load, keeps the walk far below COMMAND_TIMEOUT
+
+def fingerprint(text):
+    """Short hash of a page's list content, None when there is no content"""
+    if not text:
+        return None
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+class DeployFingerprints:
+    """Fingerprints of the last successful deploys, fed by PROGRESS while open"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.path = None
+        self.only_changed = False
+        self.site_wide = set()
+        self.skipped = 0
+        self._entries = {}
+        self._observed = {}
+
+    def open(self, path=DEFAULT_FINGERPRINT_FILE, only_changed=False, site_wide=()):
+        """Load the stored fingerprints from path (kept in memory only when path is None)"""
+        self.close()
+        self.path = path
+        self.only_changed = only_changed
+        self.site_wide = set(site_wide)
+        self.skipped = 0
+        self._entries = {}
+        self._observed = {}
+        try:
+            if path and os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self._entries = data
+        except (OSError, ValueError):
+            self._entries = {}
+        PROGRESS.subscribe(self.on_progress)
+        return self
+
+    def close(self):
+        PROGRESS.unsubscribe(self.on_progress)
+
+    def _write_entries(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def observe(self, page, value, site=None):
+        """Remember the current fingerprint of page, taken when it was opened"""
+        site = site or current_context().get("site")
+        with self._lock:
+            self._observed[(site, page)] = value
+
+    def unchanged(self, page, action, site=None):
+        """True when only_changed is set and action's inputs on page did not change since its last deploy"""
+        if not self.only_changed or action in self.site_wide:
+            return False
+        site = site or current_context().get("site")
+        with self._lock:
+            current = self._observed.get((site, page))
+            stored = self._entries.get(site, {}).get(page, {}).get(action)
+            if current is None or not stored or stored.get("fingerprint") != current:
+                return False
+            self.skipped += 1
+            return True
+
+    def on_progress(self, event):
+        if event["event"] != "deploy" or event.get("result") is not True or event.get("action") in self.site_wide:
+            return
+        site, page = event.get("site"), event.get("page")
+        with self._lock:
+            current = self._observed.get((site, page))
+            if current is None:
+                return
+            actions = self._entries.setdefault(site, {}).setdefault(page, {})
+            actions[event["action"]] = {"fingerprint": current, "deployed_at": event["time"]}
+            try:
+                self._write_entries()
+            except OSError:
+                pass
+
+# Deploy fingerprints of the current run, opened by automate_vidnoz()
+CHANGES = DeployFingerprints()
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""Pool of warm Chrome WebDriver instances shared between sites and runs"""
+from selenium import webdriver
+import os
+import signal
+import subprocess
+import threading
+import time
+
+from vidnoz_log import LOG
+
+try:
+    import psutil
+except ImportError:
+    psutil = None  # Without psutil the process tree is found with taskkill /T or pgrep
+
+# Storage cleared between sites; the HTTP cache is kept so static assets stay warm
+RESET_STORAGE_TYPES = "cookies,local_storage,session_storage,indexeddb,websql,service_workers,cache_storage"
+
+# Seconds a single WebDriver command may run before its browser counts as hung; longer
+# than the slowest legitimate command (the deployment status script, DEPLOYMENT_WAIT_TIME)
+COMMAND_TIMEOUT = 120
+WATCHDOG_INTERVAL = 1.0  # Seconds between two checks of the watchdog
+
+def _child_pids(pid):
+    try:
+        output = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True, timeout=5).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+    return [int(child) for child in output.split()]
+
+def kill_process_tree(pid):
+    """Kill a process and all its descendants, e.g. chromedriver with its Chrome processes
+
+    The tree is collected before anything is killed, orphaned children could
+    not be found anymore.
+    """
+    if psutil is not None:
+        try:
+            parent = psutil.Process(pid)
+            processes = parent.children(recursive=True) + [parent]
+        except psutil.Error:
+            return
+        for process in processes:
+            try:
+                process.kill()
+            except psutil.Error:
+                pass
+        return
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/PID", str(pid), "/T", "/F"],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        pending.extend(_child_pids(current))
+    for current in pids:
+        try:
+            os.kill(current, signal.SIGKILL)
+        except OSError:
+            pass
+
+class DriverPool:
+    """Starts browsers once and hands them out to site workers
+
+    A released driver is reset (cookies and storage cleared, extra windows closed)
+    instead of being quit, so the next site reuses the running Chrome and
+    chromedriver processes. Drivers that no longer respond are replaced.
+
+    A watchdog thread kills the chromedriver of a leased driver whose current
+    command has run longer than command_timeout, so a hung session fails
+    like a crashed one instead of blocking its site forever.
+
+    setup, when given, is called with every new driver, e.g. to apply the
+    resource blocking of a load profile to its session.
+    """
+
+    def __init__(self, options_factory, window_size=(1920, 1080), command_timeout=COMMAND_TIMEOUT, setup=None):
+        self.options_factory = options_factory
+        self.setup = setup
+        self.window_size = window_size
+        self.command_timeout = command_timeout
+        self._idle = []
+        self._leased = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._watchdog = None
+
+    def _create_driver(self):
+        driver = webdriver.Chrome(options=self.options_factory())
+        try:
+            self._watch(driver)
+            if self.window_size:
+                driver.set_window_size(*self.window_size)
+            if self.setup is not None:
+                self.setup(driver)
+        except BaseException:
+            # A browser that failed its setup is never handed out, it must not keep running
+            self._quit(driver)
+            raise
+        # Remember which origins this driver visited so they can be cleared later
+        driver._vidnoz_origins = set()
+        return driver
+
+    def _watch(self, driver):
+        """Note when the running command of driver started, for the watchdog"""
+        if not self.command_timeout:
+            return
+        execute = driver.execute
+        driver._vidnoz_command_started = None
+
+        def watched_execute(driver_command, params=None):
+            driver._vidnoz_command_started = time.monotonic()
+            try:
+                return execute(driver_command, params)
+            finally:
+                driver._vidnoz_command_started = None
+
+        driver.execute = watched_execute
+        with self._lock:
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watchdog_loop, name="driver-watchdog", daemon=True)
+                self._watchdog.start()
+
+    def _watchdog_loop(self):
+        while not self._closed:
+            time.sleep(WATCHDOG_INTERVAL)
+            now = time.monotonic()
+            with self._lock:
+                drivers = list(self._leased)
+            for driver in drivers:
+                started = getattr(driver, "_vidnoz_command_started", None)
+                if started is not None and now - started > self.command_timeout:
+                    LOG.warning("[!] WebDriver command running for %.0f seconds, stopping the hung browser",
+                                now - started)
+                    self._kill(driver)
+
+    @staticmethod
+    def _kill(driver):
+        """Kill chromedriver and the Chrome it started; pending and later commands fail at once"""
+        driver._vidnoz_command_started = None
+        try:
+            kill_process_tree(driver.service.process.pid)
+        except Exception:
+            pass
+
+    def warm_up(self, count):
+        """Start browsers in parallel until at least `count` drivers exist"""
+        with self._lock:
+            missing = count - len(self._idle) - len(self._leased)
+        if missing <= 0:
+            return 0
+
+        created = []
+        errors = []
+
+        def start_one():
+            try:
+                created.append(self._create_driver())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=start_one, daemon=True) for _ in range(missing)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with self._lock:
+            self._idle.extend(created)
+        if errors and not created:
+            raise errors[0]
+        return len(created)
+
+    def acquire(self):
+        """Return a healthy driver, reusing an idle one when possible"""
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                driver = self._idle.pop() if self._idle else None
+            if driver is None:
+                driver = self._create_driver()
+            elif not self.is_alive(driver):
+                self._quit(driver)
+                continue
+            with self._lock:
+                self._leased.add(driver)
+            return driver
+
+    def release(self, driver):
+        """Reset the driver's session and return it to the pool"""
+        with self._lock:
+            self._leased.discard(driver)
+            closed = self._closed
+        if closed or not self.reset_session(driver):
+            self._quit(driver)
+            return
+        with self._lock:
+            self._idle.append(driver)
+
+    def discard(self, driver):
+        """Quit a driver instead of returning it to the pool"""
+        with self._lock:
+            self._leased.discard(driver)
+        self._quit(driver)
+
+    def replace(self, driver):
+        """Quit a dead driver and lease a fresh one in its place"""
+        self.discard(driver)
+        return self.acquire()
+
+    def track_origin(self, driver, url):
+        """Record an origin whose storage must be cleared when the driver is released"""
+        origin = '/'.join(url.split('/')[:3])
+        if origin.startswith("http"):
+            getattr(driver, "_vidnoz_origins", set()).add(origin)
+
+    @staticmethod
+    def is_alive(driver):
+        """Cheap health check, a single WebDriver round-trip"""
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def reset_session(self, driver):
+        """Isolate the next site by clearing cookies and storage, returns False if the driver is unusable"""
+        try:
+            # Close any extra tabs the previous site opened
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+
+            try:
+                self.track_origin(driver, driver.current_url)
+            except Exception:
+                pass
+            for origin in getattr(driver, "_vidnoz_origins", ()):
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin",
+                                       {"origin": origin, "storageTypes": RESET_STORAGE_TYPES})
+            driver._vidnoz_origins = set()
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.get("about:blank")
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def kill_leased(self):
+        """Kill the browsers currently in use, e.g. when the run is cancelled
+
+        driver.quit() would queue behind the command in flight (a deployment
+        status wait takes up to a minute), so the processes are killed instead:
+        blocked WebDriver calls on them fail right away and the caller, such as
+        the GUI thread, is not held up. The drivers are dropped from the pool
+        when their holders release them. Idle drivers stay warm.
+        """
+        with self._lock:
+            drivers = list(self._leased)
+        for driver in drivers:
+            self._kill(driver)
+
+    def size(self):
+        with self._lock:
+            return len(self._idle) + len(self._leased)
+
+    def close(self):
+        """Quit every driver owned by the pool"""
+        with self._lock:
+            self._closed = True
+            drivers = self._idle + list(self._leased)
+            self._idle = []
+            self._leased = set()
+        for driver in drivers:
+            self._quit(driver)
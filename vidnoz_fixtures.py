@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""Record-and-replay fixtures of real admin panel sessions
+
+record_session() runs one site through the DevTools engine and captures the
+traffic of the site's own origin: documents, scripts, XHR/fetch calls with
+their bodies and timings, plus a DOM snapshot of every loaded page. The
+fixture is a HAR-like JSON file; passwords, tokens and cookie values are
+masked before it is written.
+
+start_replay_server() serves a fixture locally, at the recorded speed or
+scaled by `speed`. Every Host header is treated as its own site (like
+vidnoz_mock_server), and each site replays the recorded responses of a
+request in their recorded order, so login state changes (401 before the
+login, 200 after it) are reproduced. This is what --dry-run of
+vidnoz_automation points the sites at, so no production deploy is triggered.
+
+Usage:
+    python vidnoz_fixtures.py replay fixtures/session.har.json --port 8766 --speed 2
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import asyncio
+import base64
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+from vidnoz_log import LOG
+
+DEFAULT_FIXTURE_FILE = "fixtures/session.har.json"
+SNAPSHOT_DELAY = 1.0  # Seconds after the load event before the DOM snapshot, lets the panel render
+MASKED = "***"
+
+# JSON keys and headers whose values are never written to a fixture
+SECRET_KEYS = ("password", "token", "access_token", "refresh_token", "secret")
+SECRET_HEADERS = ("cookie", "authorization")
+
+# Content types whose bodies may contain the recorded origin, rewritten on replay
+TEXT_TYPES = ("text/", "application/json", "application/javascript", "application/x-javascript")
+
+def _mask_json(value):
+    if isinstance(value, dict):
+        return {key: MASKED if key.lower() in SECRET_KEYS else _mask_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_mask_json(item) for item in value]
+    return value
+
+def _mask_text(text):
+    """Mask secrets of a JSON body, other bodies are returned unchanged"""
+    if not text:
+        return text
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return text
+    return json.dumps(_mask_json(data), ensure_ascii=False)
+
+def _mask_headers(headers):
+    masked = []
+    for name, value in (headers or {}).items():
+        if name.lower() in SECRET_HEADERS:
+            value = MASKED
+        elif name.lower() == "set-cookie":
+            # Keep the cookie names so the replay sets the same cookies, never their values
+            value = "\n".join(re.sub(r"^([^=]+)=[^;]*", r"\1=replay", cookie) for cookie in value.split("\n"))
+        masked.append({"name": name, "value": value})
+    return masked
+
+class FixtureRecorder:
+    """Captures the traffic and DOM snapshots of the pages of one site origin"""
+
+    def __init__(self, site_url):
+        parts = urlsplit(site_url)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.started = time.time()
+        self.entries = []
+        self.pages = []
+        self._requests = {}
+        self._tasks = []
+
+    async def attach(self, page):
+        """Page hook for ChromeBrowser.page_hooks, starts capturing the page's traffic"""
+        connection, session_id = page.connection, page.session_id
+        connection.on("Network.requestWillBeSent", session_id, self._on_request)
+        connection.on("Network.responseReceived", session_id, self._on_response)
+        connection.on("Network.loadingFinished", session_id,
+                      lambda params: self._tasks.append(asyncio.ensure_future(self._on_finished(page, params))))
+        connection.on("Network.loadingFailed", session_id, lambda params: self._requests.pop(params["requestId"], None))
+        connection.on("Page.loadEventFired", session_id,
+                      lambda params: self._tasks.append(asyncio.ensure_future(self._snapshot(page))))
+        await page.send("Network.enable")
+
+    def _on_request(self, params):
+        request = params["request"]
+        if not request["url"].startswith(self.origin):
+            return
+        if params.get("redirectResponse") and params["requestId"] in self._requests:
+            # The previous hop of a redirect ends here, without a body
+            pending = self._requests.pop(params["requestId"])
+            pending["response"] = params["redirectResponse"]
+            self._add_entry(pending, params["timestamp"], "")
+        self._requests[params["requestId"]] = {
+            "request": request,
+            "type": params.get("type"),
+            "wall_time": params.get("wallTime", time.time()),
+            "timestamp": params["timestamp"],
+            "response": None,
+        }
+
+    def _on_response(self, params):
+        pending = self._requests.get(params["requestId"])
+        if pending is not None:
+            pending["response"] = params["response"]
+
+    async def _on_finished(self, page, params):
+        pending = self._requests.pop(params["requestId"], None)
+        if pending is None or pending["response"] is None:
+            return
+        body, encoding = "", None
+        try:
+            result = await page.send("Network.getResponseBody", {"requestId": params["requestId"]})
+            body = result.get("body", "")
+            encoding = "base64" if result.get("base64Encoded") else None
+        except Exception:
+            pass
+        self._add_entry(pending, params["timestamp"], body, encoding)
+
+    def _add_entry(self, pending, finished, body, encoding=None):
+        request, response = pending["request"], pending["response"]
+        mime_type = response.get("mimeType", "")
+        if encoding is None and mime_type.startswith(("application/json", "text/")):
+            body = _mask_text(body)
+        entry = {
+            "startedDateTime": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(pending["wall_time"])),
+            "time": round(max(0.0, finished - pending["timestamp"]) * 1000, 1),
+            "request": {
+                "method": request["method"],
+                "url": request["url"],
+                "headers": _mask_headers(request.get("headers")),
+            },
+            "response": {
+                "status": response.get("status", 200),
+                "statusText": response.get("statusText", ""),
+                "headers": _mask_headers(response.get("headers")),
+                "content": {"mimeType": mime_type, "text": body},
+            },
+            "_resourceType": pending["type"],
+            "_offset": round(pending["wall_time"] - self.started, 3),
+        }
+        if request.get("postData") is not None:
+            entry["request"]["postData"] = {"mimeType": request.get("headers", {}).get("Content-Type", ""),
+                                            "text": _mask_text(request["postData"])}
+        if encoding:
+            entry["response"]["content"]["encoding"] = encoding
+        self.entries.append(entry)
+
+    async def _snapshot(self, page):
+        await asyncio.sleep(SNAPSHOT_DELAY)
+        try:
+            snapshot = await page.evaluate("return {url: location.href, html: document.documentElement.outerHTML};")
+        except Exception:
+            return
+        if snapshot and snapshot["url"].startswith(self.origin):
+            self.pages.append({
+                "id": f"page_{len(self.pages) + 1}",
+                "title": snapshot["url"],
+                "_offset": round(time.time() - self.started, 3),
+                "_html": snapshot["html"],
+            })
+
+    async def finish(self):
+        """Wait for the response bodies and snapshots still being fetched"""
+        while self._tasks:
+            tasks, self._tasks = self._tasks, []
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def save(self, path):
+        """Write the fixture, entries in the order their requests started"""
+        self.entries.sort(key=lambda entry: entry["_offset"])
+        fixture = {"log": {
+            "version": "1.2",
+            "creator": {"name": "vidnoz_fixtures", "version": "1.0"},
+            "_origin": self.origin,
+            "pages": self.pages,
+            "entries": self.entries,
+        }}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=1)
+        return len(self.entries)
+
+async def record_session(site_url, site_label, output, username, password, multi_page=False, update_plan=None,
+                         headless=True, **timing):
+    """Process one real site over DevTools while recording its traffic, returns the site's result
+
+    This performs the real login and deploys once; the fixture then replays them offline.
+    """
+    from vidnoz_cdp import ChromeBrowser, process_site_cdp
+    recorder = FixtureRecorder(site_url)
+    browser = await ChromeBrowser.launch(headless=headless)
+    browser.page_hooks.append(recorder.attach)
+    try:
+        result = await process_site_cdp(browser, site_url, site_label, username, password,
+                                        multi_page, update_plan, **timing)
+        await recorder.finish()
+    finally:
+        await browser.close()
+    count = recorder.save(output)
+    LOG.info("Recorded %s requests and %s page snapshots to %s", count, len(recorder.pages), output)
+    return result
+
+def load_fixture(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)["log"]
+
+def _request_key(method, url):
+    parts = urlsplit(url)
+    return f"{method} {parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+class ReplayState:
+    """Recorded responses by request, and the replay position of every site"""
+
+    def __init__(self, fixture, speed=1.0):
+        self.origin = fixture.get("_origin", "")
+        self.speed = speed
+        self.responses = {}
+        for entry in fixture.get("entries", []):
+            key = _request_key(entry["request"]["method"], entry["request"]["url"])
+            self.responses.setdefault(key, []).append(entry)
+        self.lock = threading.Lock()
+        self.positions = {}
+        self.misses = {}
+
+    def next_entry(self, site, key):
+        """The next recorded response of key for site, the last one is repeated once exhausted"""
+        entries = self.responses.get(key)
+        with self.lock:
+            if not entries:
+                self.misses[key] = self.misses.get(key, 0) + 1
+                return None
+            position = self.positions.get((site, key), 0)
+            self.positions[(site, key)] = position + 1
+        return entries[min(position, len(entries) - 1)]
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "VidnozReplay/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _replay(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        state = self.server.replay_state
+        host = self.headers.get("Host") or ""
+        entry = state.next_entry(host.split(":")[0], _request_key(self.command, self.path))
+        if entry is None:
+            self._send(404, [], b"Not recorded")
+            return
+        if state.speed:
+            time.sleep(entry["time"] / 1000 / state.speed)
+        content = entry["response"]["content"]
+        if content.get("encoding") == "base64":
+            body = base64.b64decode(content.get("text") or "")
+        else:
+            text = content.get("text") or ""
+            if content.get("mimeType", "").startswith(TEXT_TYPES) and state.origin:
+                text = text.replace(state.origin, f"http://{host}")
+            body = text.encode("utf-8")
+        self._send(entry["response"]["status"], entry["response"]["headers"], body)
+
+    def _send(self, status, headers, body):
+        self.send_response(status)
+        for header in headers:
+            name = header["name"]
+            if name.lower() in ("content-length", "content-encoding", "transfer-encoding", "connection"):
+                continue
+            for value in header["value"].split("\n"):
+                if name.lower() == "set-cookie":
+                    # Recorded cookies belong to the real domain and may be Secure, make them stick locally
+                    value = re.sub(r";\s*(domain=[^;]*|secure)", "", value, flags=re.I)
+                elif name.lower() == "location":
+                    value = value.replace(self.server.replay_state.origin, f"http://{self.headers.get('Host')}")
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _replay
+    do_POST = _replay
+    do_PUT = _replay
+    do_DELETE = _replay
+
+def start_replay_server(fixture_path, port=0, host="127.0.0.1", speed=1.0):
+    """Serve a fixture in a background thread, returns the server (server.server_port is the bound port)
+
+    speed scales the recorded response times: 2.0 replays twice as fast, 0 without any delay.
+    """
+    server = ThreadingHTTPServer((host, port), ReplayHandler)
+    server.daemon_threads = True
+    server.replay_state = ReplayState(load_fixture(fixture_path), speed)
+    thread = threading.Thread(target=server.serve_forever, name="vidnoz-replay-server", daemon=True)
+    thread.start()
+    return server
+
+def replay_sites(sites_dict, port):
+    """Point every site at the replay server, keeping the path of its URL"""
+    replayed = {}
+    for site_id, site_url in sites_dict.items():
+        parts = urlsplit(site_url)
+        label = re.sub(r"[^a-z0-9-]", "-", str(site_id).lower()) or "site"
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        replayed[site_id] = f"http://{label}.localhost:{port}{path}"
+    return replayed
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Serve a recorded admin panel session')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    replay = subparsers.add_parser('replay', help='Serve a fixture locally')
+    replay.add_argument('fixture', nargs='?', default=DEFAULT_FIXTURE_FILE, help='Fixture file (default: %(default)s)')
+    replay.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    replay.add_argument('--port', type=int, default=8766, help='Port to listen on')
+    replay.add_argument('--speed', type=float, default=1.0,
+                        help='Replay speed, 2 is twice as fast as recorded, 0 without delays (default: %(default)s)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    replay_server = start_replay_server(args.fixture, args.port, args.host, args.speed)
+    print(f"Replaying {args.fixture} on http://{args.host}:{replay_server.server_port} at {args.speed}x speed")
+    print(f"Sites can be addressed as http://<site>.localhost:{replay_server.server_port}/frontend/login")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        replay_server.shutdown()
@@ -3,10 +3,17 @@ import os
 import json
 import threading
 import time
+import logging
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox
 import importlib.util
 from pathlib import Path
+from vidnoz_log import add_handler, remove_handler
+from vidnoz_log_view import LogSink, LogView, LEVELS, REFRESH_MS
+from vidnoz_progress_view import ProgressGrid
+
+# 关闭窗口时最多等待运行线程退出的秒数，之后照常关闭浏览器池
+CLOSE_WAIT_SECONDS = 30
 
 # 导入主自动化脚本作为模块
 def import_vidnoz_automation():
@@ -42,31 +49,12 @@ def load_sites_config():
         print(f"加载站点配置出错: {e}")
     return {}
 
-# 重定向控制台输出到GUI
-class ConsoleRedirector:
-    def __init__(self, text_widget):
-        self.text_widget = text_widget
-        self.buffer = ""
-        
-    def write(self, string):
-        self.buffer += string
-        if '\n' in self.buffer or len(self.buffer) > 80:
-            self.flush()
-    
-    def flush(self):
-        if self.buffer:
-            self.text_widget.configure(state="normal")
-            self.text_widget.insert(tk.END, self.buffer)
-            self.text_widget.see(tk.END)
-            self.text_widget.configure(state="disabled")
-            self.buffer = ""
-
 # 主应用
 class VidnozApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Vidnoz 自动化工具")
-        self.root.geometry("800x600")
+        self.root.geometry("800x760")
         self.root.minsize(800, 600)
         
         # 设置图标（如果有的话）
@@ -89,12 +77,23 @@ class VidnozApp:
             root.destroy()
             return
         
+        # 日志由界面的日志区域显示：工作线程的日志先进入队列，由界面线程定时批量显示
+        self.vidnoz_automation.LOG_CONSOLE = False
+        self.log_sink = LogSink()
+        add_handler(self.log_sink.handler)
+        
         # 创建界面
         self.create_widgets()
         
         # 任务运行状态
         self.is_running = False
         self.thread = None
+        self.cancel_token = self.vidnoz_automation.CancelToken()
+        
+        # 浏览器池在多次运行之间保持预热，窗口关闭时释放
+        self.driver_pool = self.vidnoz_automation.DriverPool(self.vidnoz_automation.create_chrome_options,
+                                                             setup=self.vidnoz_automation.setup_driver)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # 定时器更新UI
         self.update_ui()
@@ -154,6 +153,18 @@ class VidnozApp:
         ttk.Checkbutton(options_frame, text="多页面更新（更新所有页面和样式）", 
                       variable=self.update_mode).grid(row=0, column=1, sticky=tk.W, padx=5)
         
+        # 只部署列表有变化的内容
+        self.only_changed = tk.BooleanVar(value=getattr(self.vidnoz_automation, "ONLY_CHANGED", False))
+        ttk.Checkbutton(options_frame, text="仅部署有变化的列表",
+                        variable=self.only_changed).grid(row=0, column=2, sticky=tk.W, padx=5)
+        
+        # 并发数
+        ttk.Label(options_frame, text="并发数:").grid(row=1, column=0, sticky=tk.W, padx=5)
+        
+        self.concurrency = tk.IntVar(value=getattr(self.vidnoz_automation, "CONCURRENCY", 1))
+        ttk.Spinbox(options_frame, from_=1, to=max(1, len(self.sites)), width=5,
+                    textvariable=self.concurrency).grid(row=1, column=1, sticky=tk.W, padx=5)
+        
         # 控制按钮
         buttons_frame = ttk.Frame(control_frame)
         buttons_frame.pack(fill=tk.X, padx=5, pady=10)
@@ -164,12 +175,27 @@ class VidnozApp:
         self.stop_button = ttk.Button(buttons_frame, text="停止", state=tk.DISABLED, command=self.stop_automation)
         self.stop_button.pack(side=tk.LEFT, padx=5)
         
+        # 日志级别筛选
+        self.log_level = tk.StringVar(value="信息")
+        log_level_box = ttk.Combobox(buttons_frame, textvariable=self.log_level, values=list(LEVELS),
+                                     width=6, state="readonly")
+        log_level_box.pack(side=tk.RIGHT, padx=5)
+        log_level_box.bind("<<ComboboxSelected>>", lambda event: self.log_view.set_level(LEVELS[self.log_level.get()]))
+        ttk.Label(buttons_frame, text="日志级别:").pack(side=tk.RIGHT)
+        
+        # 站点进度：每个站点一行，显示当前阶段、耗时和结果
+        progress_frame = ttk.LabelFrame(main_frame, text="站点进度", padding=10)
+        progress_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.progress_grid = ProgressGrid(progress_frame, height=min(8, max(3, len(self.sites))))
+        self.progress_grid.pack(fill=tk.X, expand=True)
+        
         # 日志区域
         log_frame = ttk.LabelFrame(main_frame, text="执行日志", padding=10)
         log_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
-        self.log_text = scrolledtext.ScrolledText(log_frame, width=80, height=20, wrap=tk.WORD, state=tk.DISABLED)
-        self.log_text.pack(fill=tk.BOTH, expand=True)
+        self.log_view = LogView(log_frame, self.log_sink, width=80, height=20, wrap=tk.WORD)
+        self.log_view.pack(fill=tk.BOTH, expand=True)
         
         # 状态栏
         self.status_var = tk.StringVar(value="就绪")
@@ -227,19 +253,23 @@ class VidnozApp:
         # 设置多页面更新模式
         multi_page_mode = self.update_mode.get()
         
+        # 获取并发数
+        try:
+            concurrency = max(1, int(self.concurrency.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showwarning("警告", "并发数必须是正整数")
+            return
+        
         # 清空日志
-        self.log_text.configure(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.configure(state=tk.DISABLED)
+        self.log_view.clear()
         
         # 禁用开始按钮
         self.start_button.configure(state=tk.DISABLED)
         self.stop_button.configure(state=tk.NORMAL)
         
-        # 重定向控制台输出
+        # 未经过日志的输出（print、异常堆栈）同样进入日志队列
         self.original_stdout = sys.stdout
-        self.redirector = ConsoleRedirector(self.log_text)
-        sys.stdout = self.redirector
+        sys.stdout = self.log_sink
         
         # 更新状态
         self.is_running = True
@@ -247,57 +277,85 @@ class VidnozApp:
         
         # 设置多页面更新模式
         self.vidnoz_automation.EXECUTE_MULTI_PAGE_UPDATE = multi_page_mode
+        self.vidnoz_automation.ONLY_CHANGED = self.only_changed.get()
+        
+        # 选择“调试”时才记录（并获取）调试信息
+        self.vidnoz_automation.LOG_LEVEL = "DEBUG" if self.log_view.level <= logging.DEBUG else "INFO"
+        
+        # 停止按钮通过取消令牌中断等待并结束正在使用的浏览器
+        self.cancel_token = self.vidnoz_automation.CancelToken()
         
         # 创建新线程执行自动化任务
-        self.thread = threading.Thread(target=self.run_automation, args=(sites_to_process,))
+        self.thread = threading.Thread(target=self.run_automation, args=(sites_to_process, concurrency))
         self.thread.daemon = True
         self.thread.start()
     
-    def run_automation(self, sites):
+    def run_automation(self, sites, concurrency=1):
         try:
             # 执行自动化任务
-            self.vidnoz_automation.automate_vidnoz(sites)
+            sites_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sites.json")
+            rate_limits = self.vidnoz_automation.load_rate_limits(sites_path)
+            self.vidnoz_automation.automate_vidnoz(sites, concurrency=concurrency, driver_pool=self.driver_pool,
+                                                   rate_limits=rate_limits, cancel_token=self.cancel_token)
         except Exception as e:
             print(f"\n[X] 执行过程中发生错误: {e}")
             import traceback
             traceback.print_exc()
         finally:
             # 恢复控制台输出
+            self.log_sink.flush()
             sys.stdout = self.original_stdout
             
-            # 更新UI状态
-            if self.is_running:
-                self.is_running = False
-                # 使用after方法确保在主线程中更新UI
-                self.root.after(0, self.update_after_completion)
+            # 更新UI状态（停止后同样需要恢复按钮）
+            self.is_running = False
+            # 使用after方法确保在主线程中更新UI
+            self.root.after(0, self.update_after_completion)
     
     def update_after_completion(self):
         self.start_button.configure(state=tk.NORMAL)
         self.stop_button.configure(state=tk.DISABLED)
-        self.status_var.set("执行完成")
+        self.status_var.set("已停止" if self.cancel_token.cancelled else "执行完成")
         
         # 刷新最后的日志
-        if hasattr(self, 'redirector'):
-            self.redirector.flush()
+        self.log_view.drain()
     
     def stop_automation(self):
         if not self.is_running:
             return
         
-        self.is_running = False
+        self.stop_button.configure(state=tk.DISABLED)
         self.status_var.set("正在停止...")
         
-        # 注意：简单地将is_running设为False只能在主代码中检查时起作用
-        # Selenium无法直接中断，但下一个站点不会开始
-        print("\n用户请求停止处理，将在当前站点完成后退出...")
+        # 正在进行的等待立即中断，使用中的浏览器被结束，后续站点不再开始
+        self.vidnoz_automation.LOG.warning("用户请求停止处理，正在中断当前站点...")
+        self.cancel_token.cancel("用户停止")
+    
+    def on_close(self):
+        # 运行中关闭窗口时先取消运行，并结束正在使用的浏览器，工作线程随即退出
+        if self.is_running:
+            self.cancel_token.cancel("窗口关闭")
+            self.driver_pool.kill_leased()
+        remove_handler(self.log_sink.handler)
+        self.progress_grid.close()
+        self.root.withdraw()
+        
+        # driver.quit() 可能较慢，在后台线程中等工作线程退出后再退出所有预热的浏览器，不阻塞界面
+        def close_browsers():
+            if self.thread is not None:
+                self.thread.join(CLOSE_WAIT_SECONDS)
+            self.driver_pool.close()
+            self.root.after(0, self.root.destroy)
+        threading.Thread(target=close_browsers, name="close-browsers", daemon=True).start()
     
     def update_ui(self):
-        # 定时更新UI
-        if hasattr(self, 'redirector'):
-            self.redirector.flush()
+        # 定时批量显示队列中的日志和进度事件
+        self.log_view.drain()
+        status = self.progress_grid.drain()
+        if status and (self.is_running or self.progress_grid.finished) and not self.cancel_token.cancelled:
+            self.status_var.set(status)
         
         # 每100毫秒更新一次UI
-        self.root.after(100, self.update_ui)
+        self.root.after(REFRESH_MS, self.update_ui)
 
 # 主程序
 def main():
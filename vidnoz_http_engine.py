@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""Browser-less deploy engine calling the admin panel's backend endpoints directly
+
+The buttons on manage-*.vidnoz.com only trigger backend requests, so this engine
+logs in and calls those endpoints over keep-alive HTTP connections instead of
+driving Chrome. It follows the same result contract as process_site:
+True (success), False (failure) or None (unknown).
+
+The backend's endpoint paths are not published, so nothing is assumed: they
+are configured in an http_endpoints.json file next to sites.json, and a run
+does not start while the login or one of its actions has no endpoint
+(missing_endpoints). vidnoz_mock_server.MOCK_ENDPOINTS are the paths of the
+mock panel.
+"""
+import http.client
+import http.cookies
+import json
+import os
+import ssl
+import threading
+from urllib.parse import urlsplit
+from vidnoz_plan import build_plan
+from vidnoz_rate_limit import LIMITER
+from vidnoz_trace import TRACER
+from vidnoz_log import LOG
+from vidnoz_progress import PROGRESS
+
+DEFAULT_ENDPOINTS_FILE = "http_endpoints.json"
+
+# Action deployed by a run without the multi-page update
+SINGLE_PAGE_ACTION = "更新公共样式"
+
+# JSON "code" values the backend uses for success
+SUCCESS_CODES = (0, 200)
+
+class HttpError(Exception):
+    """Network level failure, the outcome of the request is unknown"""
+
+def load_endpoints(file_path=DEFAULT_ENDPOINTS_FILE):
+    """Return the endpoints configured in file_path, none when it does not exist
+
+    The file holds the login path and, per button text, the path the button
+    triggers, all relative to the site's base URL:
+    {"login": "/api/login", "actions": {"更新公共样式": "/api/..."}}
+    """
+    endpoints = {"login": None, "actions": {}}
+    if file_path and os.path.exists(file_path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            configured = json.load(f)
+        endpoints["login"] = configured.get("login")
+        endpoints["actions"].update(configured.get("actions", {}))
+    return endpoints
+
+def required_actions(multi_page, plan=None, site_ids=()):
+    """Button texts a run deploys on site_ids, every one needs an endpoint"""
+    if not multi_page:
+        return [SINGLE_PAGE_ACTION]
+    return list(dict.fromkeys(button for site_id in site_ids
+                              for step in build_plan(plan, site_id) for button in step.buttons))
+
+def missing_endpoints(endpoints, actions):
+    """"login" and the actions without a configured endpoint, empty when the run can start"""
+    missing = [] if endpoints.get("login") else ["login"]
+    return missing + [action for action in actions if not endpoints.get("actions", {}).get(action)]
+
+class HttpConnectionPool:
+    """Thread-safe pool of keep-alive connections, one idle list per host"""
+
+    def __init__(self, timeout=60, max_idle_per_host=4, verify_certificates=True):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+        if not verify_certificates:
+            # Explicit opt-in for panels with self-signed certificates, the login password is sent unverified
+            self._ssl_context.check_hostname = False
+            self._ssl_context.verify_mode = ssl.CERT_NONE
+
+    def _new_connection(self, key):
+        scheme, host, port = key
+        # Browsers resolve *.localhost to the loopback address, the resolver may not
+        if host.endswith(".localhost"):
+            host = "127.0.0.1"
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self._ssl_context)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _get_connection(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._new_connection(key), False
+
+    def _put_connection(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method, url, body=None, headers=None):
+        """Send a request and return (status, headers, body bytes), raises HttpError on network errors"""
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = dict(headers or {})
+        headers.setdefault("Host", parts.netloc)
+
+        for attempt in range(2):
+            conn, reused = self._get_connection(key)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                # A reused keep-alive connection may have been closed by the server, retry once
+                if reused and attempt == 0:
+                    continue
+                raise HttpError(str(e))
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise HttpError(str(e))
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._put_connection(key, conn)
+            return response.status, response.getheaders(), data
+        raise HttpError("request failed")
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+class HttpSession:
+    """Cookies and auth token of one logged-in admin panel"""
+
+    def __init__(self, pool, base_url, endpoints=None):
+        self.pool = pool
+        self.base_url = base_url
+        self.endpoints = endpoints or load_endpoints()
+        self.cookies = {}
+        self.token = None
+
+    def _headers(self):
+        headers = {
+            "Content-Type": "application/json;charset=UTF-8",
+            "Accept": "application/json",
+            "Connection": "keep-alive",
+        }
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    def post_json(self, path, payload):
+        """POST a JSON payload, returns (status, parsed JSON or None)"""
+        body = json.dumps(payload).encode("utf-8")
+        status, headers, data = self.pool.request("POST", self.base_url + path, body, self._headers())
+        for name, value in headers:
+            if name.lower() == "set-cookie":
+                cookie = http.cookies.SimpleCookie()
+                cookie.load(value)
+                for morsel in cookie.values():
+                    self.cookies[morsel.key] = morsel.value
+        try:
+            return status, json.loads(data.decode("utf-8")) if data else None
+        except ValueError:
+            return status, None
+
+    def login(self, username, password):
+        """Log in, returns True when the backend accepted the credentials"""
+        status, data = self.post_json(self.endpoints["login"], {"username": username, "password": password})
+        if status != 200 or not isinstance(data, dict) or data.get("code") not in SUCCESS_CODES:
+            return False
+        if isinstance(data.get("data"), dict) and data["data"].get("token"):
+            self.token = data["data"]["token"]
+        return True
+
+def interpret_response(status, data):
+    """Map an action response to True (success), False (failure) or None (unknown)"""
+    if status in (401, 403):
+        # Logged out, the browser engine reports this as a failed deployment
+        return False
+    if status == 429 or status >= 500 or not isinstance(data, dict):
+        # Throttled or server error: the deploy may not have run, whatever the body says
+        return None
+    if status == 200 and data.get("code") in SUCCESS_CODES:
+        return True
+    return False
+
+def process_site_http(pool, site_url, site_label=None, username=None, password=None,
+                      multi_page=False, endpoints=None, steps=None):
+    """Process a single site through the backend endpoints, same result contract as process_site
+
+    steps is the site's multi-page plan (vidnoz_plan.build_plan), the default plan when omitted.
+    """
+    endpoints = endpoints or load_endpoints()
+    label_info = f" [{site_label}]" if site_label else ""
+    base_url = '/'.join(site_url.split('/')[:3])
+    session = HttpSession(pool, base_url, endpoints)
+
+    LOG.info("===== Processing site%s over HTTP: %s =====", label_info, base_url)
+    try:
+        TRACER.phase("login")
+        LIMITER.acquire(base_url)
+        if not session.login(username, password):
+            LIMITER.report(base_url, False)
+            LOG.error("[X] Site%s login failed", label_info)
+            return False
+        LIMITER.report(base_url, True)
+        LOG.info("Login successful!")
+        TRACER.phase("update")
+
+        if not multi_page:
+            steps = [(None, [SINGLE_PAGE_ACTION], False, [])]
+        else:
+            steps = [(step.page, step.buttons, step.optional, step.site_wide)
+                     for step in (steps if steps is not None else build_plan(site_id=site_label))]
+
+        overall = True
+        carried = []
+        for page, page_buttons, optional, site_wide in steps:
+            buttons = carried + page_buttons
+            carried = []
+            for button_text in buttons:
+                path = endpoints["actions"].get(button_text)
+                if not path:
+                    LOG.warning("[!] No endpoint configured for '%s'", button_text)
+                    return False
+                payload = {"page": page} if page else {}
+                with TRACER.span(f"deploy {button_text}", page=page) as span:
+                    LIMITER.acquire(base_url)
+                    status, data = session.post_json(path, payload)
+                    span["status"] = status
+                if status == 404 and optional:
+                    # Site-wide actions still have to run, on the next page
+                    LOG.info("Page %s doesn't exist, skipping this page", page)
+                    carried = [b for b in buttons if b not in page_buttons or b in site_wide]
+                    break
+                result = interpret_response(status, data)
+                PROGRESS.emit("deploy", action=button_text, page=page, result=result)
+                if result is not None or status == 429 or status >= 500:
+                    # Throttling and server errors slow the backend's rate down like failed deploys
+                    LIMITER.report(base_url, result is True)
+                where = f" on {page}" if page else ""
+                if result is True:
+                    LOG.info("[+] '%s'%s deployed successfully", button_text, where)
+                elif result is False:
+                    message = data.get("msg") if isinstance(data, dict) else status
+                    LOG.error("[X] '%s'%s deployment failed: %s", button_text, where, message)
+                    return False
+                else:
+                    LOG.warning("[!] '%s'%s deployment status unknown (HTTP %s)", button_text, where, status)
+                    overall = None
+        return overall
+    except HttpError as e:
+        LOG.warning("[!] Site%s request error, deployment status unknown: %s", label_info, e)
+        return None
+    except Exception as e:
+        LOG.error("[X] Site%s processing error: %s", label_info, e, exc_info=True)
+        return False
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Append-only run journal, the checkpoint of --resume and --retry-failed
+
+While a run is journaled, the progress events that matter for resuming
+(site started, deploy with its page and action, site finished) are appended
+to runs/<run_id>/journal.jsonl and synced to disk one line at a time, so a
+crash or reboot loses at most the step in flight:
+
+    {"event": "site_started", "time": 1718000000.0, "site": "tw", "url": "..."}
+    {"event": "deploy", "time": ..., "site": "tw", "page": "faq-list", "action": "更新faq全部列表", "result": true}
+    {"event": "site_finished", "time": ..., "site": "tw", "result": true}
+
+Every run gets a directory of its own (new_run_id). Opening the journal of
+an earlier run to resume it replays it: sites_to_run() leaves out the sites
+that already succeeded and remaining_steps() the deploys that already
+succeeded, so a resumed run only does what is left.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+from vidnoz_plan import PlanStep
+from vidnoz_progress import PROGRESS
+
+JOURNAL_FILE = "journal.jsonl"
+
+# Progress events written to the journal, phases are left to the trace
+JOURNALED_EVENTS = ("run_started", "site_started", "deploy", "site_finished", "run_finished")
+
+# Ends the id of a dry run, whose sites were replayed and must not be retried against the real panels
+DRY_RUN_SUFFIX = "-dry-run"
+
+def new_run_id(dry_run=False):
+    """Id of a new run, its start time plus a random part so runs started in the same second never share it"""
+    run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    return run_id + DRY_RUN_SUFFIX if dry_run else run_id
+
+def journal_path(runs_dir, run_id):
+    return os.path.join(runs_dir, run_id, JOURNAL_FILE)
+
+def latest_run(runs_dir):
+    """Id of the most recent run in runs_dir that has a journal, None when there is none
+
+    Dry runs are left out.
+    """
+    try:
+        run_ids = sorted(os.listdir(runs_dir), reverse=True)
+    except OSError:
+        return None
+    return next((run_id for run_id in run_ids if not run_id.endswith(DRY_RUN_SUFFIX)
+                 and os.path.exists(journal_path(runs_dir, run_id))), None)
+
+class _SiteState:
+    def __init__(self):
+        self.finished = False
+        self.result = None
+        self.deployed = set()  # (page, action) of the successful deploys
+
+class RunJournal:
+    """Journal of the current run, fed by PROGRESS while open"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self.path = None
+        self.sites = {}
+
+    def open(self, path, replay=False):
+        """Append the entries of the run to the journal at path, after loading its entries with replay
+
+        replay is set when resuming an earlier run; a new run never picks up
+        entries it did not write. The journal follows PROGRESS even when the
+        file cannot be read or written (OSError is raised), its entries are
+        then kept in memory only.
+        """
+        self.close()
+        self.sites = {}
+        self.path = path
+        PROGRESS.subscribe(self.on_progress)
+        complete = True
+        if replay and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    complete = line.endswith("\n")
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        # A line cut short by a crash, the entries before it still count
+                        continue
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        if not complete:
+            self._file.write("\n")
+        return self
+
+    def close(self):
+        PROGRESS.unsubscribe(self.on_progress)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self._file = None
+
+    def _apply(self, entry):
+        site = entry.get("site")
+        if not site or entry.get("event") not in ("site_started", "deploy", "site_finished"):
+            return
+        state = self.sites.setdefault(site, _SiteState())
+        if entry["event"] == "site_started":
+            state.finished = False
+        elif entry["event"] == "deploy":
+            if entry.get("result") is True:
+                state.deployed.add((entry.get("page"), entry.get("action")))
+        elif entry.get("cancelled"):
+            # A site stopped by a cancelled run was not processed, resuming runs it again
+            state.finished = False
+        else:
+            state.finished = True
+            state.result = entry.get("result")
+
+    def record(self, entry):
+        """Apply one entry and, when the journal file is open, append it and sync it to disk
+
+        The entry is applied in memory even without a file (e.g. the journal
+        could not be opened), so crash recovery still skips the deploys that
+        already succeeded in this run.
+        """
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            self._apply(entry)
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def on_progress(self, event):
+        if event["event"] in JOURNALED_EVENTS:
+            self.record({key: value for key, value in event.items() if value is not None or key == "result"})
+
+    def result(self, site):
+        """Final result of site in the journal, None when it never finished"""
+        state = self.sites.get(site)
+        return state.result if state is not None and state.finished else None
+
+    def sites_to_run(self, sites_dict, retry_failed=False):
+        """The sites of sites_dict that still have to run
+
+        Resuming runs every site without a successful result; retry_failed
+        only the sites that finished with False or None.
+        """
+        pending = {}
+        for site_id, site_url in sites_dict.items():
+            state = self.sites.get(site_id)
+            if retry_failed:
+                if state is not None and state.finished and state.result is not True:
+                    pending[site_id] = site_url
+            elif state is None or not state.finished or state.result is not True:
+                pending[site_id] = site_url
+        return pending
+
+    def remaining_steps(self, site, steps):
+        """steps (PlanStep list) without the deploys the journal records as successful
+
+        A site-wide action counts as done on whichever page it was deployed.
+        """
+        state = self.sites.get(site)
+        if state is None or not state.deployed:
+            return steps
+        deployed_actions = {action for _, action in state.deployed}
+        remaining = []
+        for step in steps:
+            buttons = [button for button in step.buttons
+                       if (step.page, button) not in state.deployed
+                       and not (button in step.site_wide and button in deployed_actions)]
+            if buttons:
+                remaining.append(PlanStep(step.page, buttons, step.optional, step.site_wide))
+        return remaining
+
+# Journal of the current run, opened by automate_vidnoz()
+JOURNAL = RunJournal()
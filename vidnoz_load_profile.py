@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Page loading profiles of the browsers, trading page fidelity for load time and memory
+
+The admin panel is a single page app: the automation only needs its DOM,
+scripts and stylesheets. A profile sets Chrome's page load strategy and the
+resources the browser does not fetch at all:
+
+    full     pageLoadStrategy normal, nothing blocked (what a user sees)
+    lean     pageLoadStrategy eager, images, media, fonts and trackers blocked
+    minimal  pageLoadStrategy none, same blocks as lean
+
+With eager a navigation returns once the DOM is parsed instead of after
+every image and font; with none it returns right away. The engines never
+rely on the load event, every step waits for its own condition (login form,
+panel ready, dialogs), so the shorter navigations should be safe. full stays
+the default until lean and minimal have been verified on the real panel,
+they are opt-in through LOAD_PROFILE or --load-profile.
+
+Blocking uses Network.setBlockedURLs of the DevTools protocol, applied once
+per browser (apply_to_driver) or tab (apply_to_page). Third-party blocking
+is a list of analytics and ad hosts rather than "every other host", because
+the panel's own bundles may be served from a CDN.
+"""
+
+# Page load strategy and blocked resource groups of each profile
+LOAD_PROFILES = {
+    "full": {"page_load_strategy": "normal", "block": []},
+    "lean": {"page_load_strategy": "eager", "block": ["images", "media", "fonts", "third_party"]},
+    "minimal": {"page_load_strategy": "none", "block": ["images", "media", "fonts", "third_party"]},
+}
+DEFAULT_LOAD_PROFILE = "full"
+
+_EXTENSIONS = {
+    "images": ["png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "bmp", "avif"],
+    "media": ["mp4", "webm", "ogg", "mp3", "wav", "m4a", "mov", "m3u8"],
+    "fonts": ["woff", "woff2", "ttf", "otf", "eot"],
+}
+
+# Hosts of analytics, tag managers and ads embedded in the panel or the pages it previews
+THIRD_PARTY_HOSTS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "googleadservices.com", "connect.facebook.net", "static.hotjar.com", "clarity.ms",
+    "hm.baidu.com", "cnzz.com", "tiktok.com/i18n/pixel", "bat.bing.com",
+]
+
+# URL patterns of Network.setBlockedURLs per resource group, "*" matches any characters
+BLOCKED_PATTERNS = {
+    group: [pattern for extension in extensions for pattern in (f"*.{extension}", f"*.{extension}?*")]
+    for group, extensions in _EXTENSIONS.items()
+}
+BLOCKED_PATTERNS["third_party"] = [f"*{host}*" for host in THIRD_PARTY_HOSTS]
+
+def get_profile(name):
+    """Settings of the named profile, raises ValueError for an unknown name"""
+    try:
+        return LOAD_PROFILES[name or DEFAULT_LOAD_PROFILE]
+    except KeyError:
+        raise ValueError(f"Unknown load profile {name!r}, expected one of {', '.join(LOAD_PROFILES)}") from None
+
+def blocked_url_patterns(name):
+    return [pattern for group in get_profile(name)["block"] for pattern in BLOCKED_PATTERNS[group]]
+
+def chrome_arguments(name):
+    """Command line switches of the profile, images are also switched off in the renderer"""
+    return ["--blink-settings=imagesEnabled=false"] if "images" in get_profile(name)["block"] else []
+
+def apply_to_options(options, name):
+    """Set the page load strategy and switches of the profile on selenium ChromeOptions"""
+    options.page_load_strategy = get_profile(name)["page_load_strategy"]
+    for argument in chrome_arguments(name):
+        options.add_argument(argument)
+    return options
+
+def apply_to_driver(driver, name):
+    """Block the profile's resources in a WebDriver session, kept for the driver's lifetime"""
+    patterns = blocked_url_patterns(name)
+    if patterns:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+async def apply_to_page(page, name):
+    """Block the profile's resources in a vidnoz_cdp.CDPPage"""
+    patterns = blocked_url_patterns(name)
+    if patterns:
+        await page.send("Network.enable")
+        await page.send("Network.setBlockedURLs", {"urls": patterns})
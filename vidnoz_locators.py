@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Locator engine evaluating all strategies for an element in one polling loop
+
+Instead of waiting for a primary locator to time out before trying the next
+one, every poll evaluates all strategies of an element inside the page and
+takes the first one that matches, in list order. Strategies are plain dicts,
+so the same definitions are used by Selenium (locate) and by the DevTools
+engine. A fallback strategy stays behind the others: it wins only a poll in
+which none of them matches, and is never remembered as a site's winner.
+"""
+import vidnoz_scripts as scripts
+from vidnoz_waits import wait_until
+
+# Button texts accepted as "confirm" in a confirmation dialog
+CONFIRM_WORDS = ["sure", "yes", "ok", "确认", "confirm"]
+
+def strategy(name, kind, value, selector=None, ignore_case=False, within=None, within_text=None, fallback=False):
+    """Describe one way of finding an element, see vidnoz_scripts.LOCATE_FUNCTION"""
+    return {
+        "name": name,
+        "kind": kind,
+        "value": value,
+        "selector": selector,
+        "ignore_case": ignore_case,
+        "within": within,
+        "within_text": within_text,
+        "fallback": fallback,
+    }
+
+def button_with_text(text):
+    """Strategies for an admin panel button whose label contains text"""
+    return [
+        strategy("xpath", "xpath", f"//button[contains(., '{text}')]"),
+        strategy("button-text", "text", text, selector="button, [role='button'], .el-button"),
+    ]
+
+# Login form submit button, the first button of the login form when no specific strategy matches
+LOGIN_BUTTON = [
+    strategy("xpath", "xpath", "//button[contains(., 'login')]"),
+    strategy("button-text", "text", "login", selector="button", ignore_case=True),
+    strategy("submit", "css", "button[type='submit'], input[type='submit']"),
+    strategy("form-button", "css", "form button, .el-form button, .login-form button", fallback=True),
+]
+
+# Confirm button of the confirmation dialog shown after every update button
+CONFIRM_BUTTON = [
+    strategy("dialog-text", "text", CONFIRM_WORDS, selector="button", ignore_case=True,
+             within=scripts.DIALOG_SELECTOR, within_text="确认"),
+    strategy("primary-button", "css",
+             ".el-message-box__btns .el-button--primary, .el-dialog__footer .el-button--primary, "
+             ".btn-primary, .confirm-btn"),
+]
+
+class Match:
+    """Element found by locate() and the name of the strategy that found it"""
+
+    def __init__(self, element, strategy, text=""):
+        self.element = element
+        self.strategy = strategy
+        self.text = text
+
+def locate(driver, strategies, timeout=10, name="locate", click=False, profile=None, key=None):
+    """Poll all strategies together until one matches, at most `timeout` seconds
+
+    When click is True the match is clicked in the same call. With a SiteProfile
+    the strategy that won last time for `key` is tried first, and the winner (or
+    the miss) is recorded for the next run. Returns a Match, or None when no
+    strategy matched in time.
+    """
+    if profile is not None and key:
+        strategies = profile.order(key, strategies)
+
+    def condition(d):
+        try:
+            return d.execute_script(scripts.LOCATE, strategies, click)
+        except Exception:
+            return None
+
+    found = wait_until(driver, condition, timeout, name)
+    if profile is not None and key:
+        fallbacks = {s["name"] for s in strategies if s.get("fallback")}
+        winner = found.get("strategy") if found else None
+        profile.record_locator(key, winner if winner not in fallbacks else None)
+    if not found:
+        return None
+    return Match(found.get("element"), found.get("strategy"), found.get("text") or "")
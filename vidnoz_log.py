@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Leveled, structured logging of the automation
+
+Every module logs through the shared LOG logger with %-style arguments, so a
+message is only formatted when a handler accepts its level. Context fields
+(the site being processed, the page of a parallel group) live in a context
+variable like the trace tracks: worker threads and asyncio tasks enter
+log_context() once and every record they emit carries the fields.
+
+configure_logging() installs the console handler and a size-rotated JSON
+lines file; the GUI adds its own handler with add_handler().
+
+    with log_context(site="en"):
+        LOG.info("Clicked button '%s'", text)
+        if debug_enabled():
+            LOG.debug("Dialog: %s", fetch_dialog_text())
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import time
+
+LOG_FILE = "logs/vidnoz.jsonl"  # Rotated JSON lines log, one record per line
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024  # Size at which the log file is rotated
+LOG_FILE_BACKUPS = 5  # Rotated files kept next to the log file
+
+LOG = logging.getLogger("vidnoz")
+LOG.propagate = False
+
+_context = contextvars.ContextVar("vidnoz_log_context", default={})
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Attach fields (e.g. site="en") to every record emitted by the enclosed code"""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+def current_context():
+    return dict(_context.get())
+
+def debug_enabled():
+    """True when debug records are kept, lets callers skip fetching debug-only payloads"""
+    return LOG.isEnabledFor(logging.DEBUG)
+
+class ContextFilter(logging.Filter):
+    """Copies the context fields onto each record, record.site is None outside of a site"""
+
+    def filter(self, record):
+        context = _context.get()
+        record.context = context
+        record.site = context.get("site")
+        return True
+
+class ConsoleFormatter(logging.Formatter):
+    """The message prefixed with its site, so interleaved parallel output stays attributable"""
+
+    def format(self, record):
+        message = super().format(record)
+        site = getattr(record, "site", None)
+        return f"[{site}] {message}" if site else message
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, context fields, message and exception"""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            **getattr(record, "context", {}),
+            "message": record.getMessage(),
+            "function": record.funcName,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class ConsoleHandler(logging.StreamHandler):
+    """Writes to the current sys.stdout, which may be redirected after logging is configured"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+class CallbackHandler(logging.Handler):
+    """Hands every formatted record to callback(message, record), used by the GUI"""
+
+    def __init__(self, callback, level=logging.NOTSET):
+        super().__init__(level)
+        self.callback = callback
+        self.addFilter(ContextFilter())
+        self.setFormatter(ConsoleFormatter())
+
+    def emit(self, record):
+        try:
+            self.callback(self.format(record), record)
+        except Exception:
+            self.handleError(record)
+
+_installed = []
+
+def configure_logging(level="INFO", log_file=LOG_FILE, console=True):
+    """(Re)install the console and JSON lines handlers, safe to call before every run
+
+    Handlers added with add_handler() are kept.
+    """
+    LOG.setLevel(level if isinstance(level, int) else logging.getLevelName(str(level).upper()))
+    for handler in _installed:
+        LOG.removeHandler(handler)
+        handler.close()
+    _installed.clear()
+    if console:
+        handler = ConsoleHandler()
+        handler.setFormatter(ConsoleFormatter())
+        _installed.append(handler)
+    if log_file:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_FILE_MAX_BYTES,
+                                                           backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+            handler.setFormatter(JsonFormatter())
+            _installed.append(handler)
+        except OSError as e:
+            LOG.warning("Cannot open log file %s: %s", log_file, e)
+    for handler in _installed:
+        handler.addFilter(ContextFilter())
+        LOG.addHandler(handler)
+    return LOG
+
+def add_handler(handler):
+    LOG.addHandler(handler)
+    return handler
+
+def remove_handler(handler):
+    LOG.removeHandler(handler)
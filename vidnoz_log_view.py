@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Thread-safe log view of the GUIs
+
+Worker threads only put lines on a queue: LogSink is both a logging handler
+(records keep their level) and a stdout replacement (stray prints and
+tracebacks). The Tk thread drains the queue in batches with LogView.drain(),
+keeps a capped ring of recent lines and shows the ones at or above the
+selected level, so the Text widget never grows without bound.
+"""
+import collections
+import logging
+import queue
+import threading
+import tkinter as tk
+from tkinter import scrolledtext
+
+from vidnoz_log import CallbackHandler
+
+MAX_LINES = 5000  # Lines kept in the ring and shown in the widget
+MAX_BATCH = 2000  # Lines moved from the queue to the widget per refresh
+REFRESH_MS = 100  # Interval of the Tk thread's refresh
+
+# Filter choices of the GUI, label -> lowest level shown
+LEVELS = {"调试": logging.DEBUG, "信息": logging.INFO, "警告": logging.WARNING, "错误": logging.ERROR}
+LEVEL_COLORS = {logging.WARNING: "#b36b00", logging.ERROR: "#c00000", logging.DEBUG: "#808080"}
+
+class LogSink:
+    """Collects log records and written text from any thread"""
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.handler = CallbackHandler(self._put_record)
+        self._lock = threading.Lock()
+        self._partial = ""
+
+    def _put_record(self, message, record):
+        for line in message.split("\n"):
+            self.queue.put((record.levelno, line))
+
+    def write(self, text):
+        """File-like write for sys.stdout, complete lines are queued as INFO"""
+        with self._lock:
+            lines = (self._partial + text).split("\n")
+            self._partial = lines.pop()
+        for line in lines:
+            self.queue.put((logging.INFO, line))
+        return len(text)
+
+    def flush(self):
+        with self._lock:
+            partial, self._partial = self._partial, ""
+        if partial:
+            self.queue.put((logging.INFO, partial))
+
+class LogView:
+    """ScrolledText fed by a LogSink, only touched from the Tk thread"""
+
+    def __init__(self, parent, sink, level=logging.INFO, **options):
+        self.sink = sink
+        self.level = level
+        self.lines = collections.deque(maxlen=MAX_LINES)
+        self.text = scrolledtext.ScrolledText(parent, state=tk.DISABLED, **options)
+        for levelno, color in LEVEL_COLORS.items():
+            self.text.tag_configure(logging.getLevelName(levelno), foreground=color)
+
+    def pack(self, **options):
+        self.text.pack(**options)
+
+    def _insert(self, lines):
+        # One insert call with (text, tag) pairs per batch
+        chunks = []
+        for levelno, line in lines:
+            if levelno >= self.level:
+                chunks.extend((line + "\n", logging.getLevelName(levelno)))
+        if not chunks:
+            return
+        follow = self.text.yview()[1] >= 0.999
+        self.text.configure(state=tk.NORMAL)
+        self.text.insert(tk.END, *chunks)
+        excess = int(self.text.index("end-1c").split(".")[0]) - 1 - MAX_LINES
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+        self.text.configure(state=tk.DISABLED)
+        if follow:
+            self.text.see(tk.END)
+
+    def drain(self):
+        """Move up to MAX_BATCH queued lines to the ring and the widget"""
+        batch = []
+        try:
+            while len(batch) < MAX_BATCH:
+                batch.append(self.sink.queue.get_nowait())
+        except queue.Empty:
+            pass
+        if batch:
+            self.lines.extend(batch)
+            self._insert(batch[-MAX_LINES:])
+        return len(batch)
+
+    def set_level(self, level):
+        """Show the lines of the ring at or above level"""
+        self.level = level
+        self.text.configure(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.configure(state=tk.DISABLED)
+        self._insert(list(self.lines))
+
+    def clear(self):
+        self.lines.clear()
+        self.set_level(self.level)
@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for the manage-*.vidnoz.com admin panel
+
+Emulates the login and deploy endpoints used by vidnoz_http_engine.py and
+serves a minimal HTML version of the panel for the browser engines: the login
+form with the "User Name"/"Password" placeholders, the list pages with their
+"更新..." buttons, an Element UI style confirm box, and the
+.el-message--success toast or the .blog-login indicator once a deploy
+finished. Every Host header is treated as a separate site, so several
+synthetic sites can share one server (e.g. http://site1.localhost:8765,
+http://site2.localhost:8765). Like the real panel, every page also loads a
+logo, a favicon and an icon font from /static/, which the load profiles of
+vidnoz_load_profile.py block.
+
+Usage:
+    python vidnoz_mock_server.py --port 8765 --latency 0.5 --failure-rate 0.1
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import base64
+import json
+import random
+import secrets
+import threading
+import time
+from vidnoz_plan import DEFAULT_PLAN
+
+# Backend endpoints of the mock panel, the http_endpoints.json of a run against it
+MOCK_ENDPOINTS = {
+    "login": "/api/login",
+    "actions": {
+        "更新公共样式": "/api/frontend/update-common-style",
+        "更新blog全部列表": "/api/frontend/update-blog-list",
+        "更新blog全部详情": "/api/frontend/update-blog-detail",
+        "更新faq全部列表": "/api/frontend/update-faq-list",
+        "更新faq全部详情": "/api/frontend/update-faq-detail",
+        "更新pressroom全部列表": "/api/frontend/update-pressroom-list",
+        "更新pressroom全部详情": "/api/frontend/update-pressroom-detail",
+    },
+}
+
+# Buttons of the panel's home page, shown after login and on /frontend/login
+HOME_BUTTONS = ["更新公共样式"]
+
+# Static assets of every page: 1x1 PNG logo and favicon, an (empty) icon font
+_PIXEL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==")
+STATIC_ASSETS = {
+    "/static/img/logo.png": ("image/png", _PIXEL_PNG),
+    "/static/favicon.ico": ("image/png", _PIXEL_PNG),
+    "/static/fonts/element-icons.woff": ("font/woff", b""),
+}
+
+PANEL_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Vidnoz Manage (mock)</title>
+<link rel="icon" href="/static/favicon.ico">
+<style>
+@font-face { font-family: element-icons; src: url("/static/fonts/element-icons.woff") format("woff"); }
+body { font-family: sans-serif; margin: 0; }
+.header { padding: 8px 40px; font-family: element-icons, sans-serif; }
+.header img { width: 24px; height: 24px; vertical-align: middle; }
+.login-form, .panel { padding: 40px; }
+.login-form input { display: block; margin: 8px 0; padding: 6px; width: 240px; }
+.el-button { margin: 6px; padding: 8px 16px; cursor: pointer; }
+.el-message-box__wrapper { position: fixed; top: 0; left: 0; right: 0; bottom: 0; background: rgba(0, 0, 0, .5); }
+.el-message-box { width: 420px; margin: 20vh auto 0; padding: 16px; background: #fff; }
+.el-message { position: fixed; top: 20px; left: 50%; padding: 10px 20px; background: #f0f9eb; }
+.el-message--error { background: #fef0f0; }
+.blog-login { padding: 20px; background: #fdf6ec; }
+</style>
+</head>
+<body>
+<div class="header"><img src="/static/img/logo.png" alt=""> Vidnoz Manage</div>
+<div id="app"></div>
+<script>
+var CONFIG = __CONFIG__;
+var app = document.getElementById("app");
+
+function element(tag, className, text) {
+    var el = document.createElement(tag);
+    if (className) { el.className = className; }
+    if (text) { el.textContent = text; }
+    return el;
+}
+
+function toast(type, text) {
+    var message = element("div", "el-message el-message--" + type);
+    message.appendChild(element("p", "el-message__content", text));
+    document.body.appendChild(message);
+    setTimeout(function () { message.remove(); }, CONFIG.toastDuration);
+}
+
+function showLoggedOut(text) {
+    var indicator = element("div", "blog-login", text);
+    document.body.appendChild(indicator);
+}
+
+function renderLogin() {
+    var form = element("div", "login-form");
+    var user = element("input");
+    user.placeholder = "User Name";
+    var pass = element("input");
+    pass.type = "password";
+    pass.placeholder = "Password";
+    var button = element("button", "el-button el-button--primary", "login");
+    button.type = "button";
+    button.onclick = function () {
+        fetch(CONFIG.loginPath, {method: "POST", headers: {"Content-Type": "application/json"},
+                                 body: JSON.stringify({username: user.value, password: pass.value})})
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                if (data.code === 0) { location.reload(); } else { toast("error", data.msg); }
+            });
+    };
+    form.appendChild(user);
+    form.appendChild(pass);
+    form.appendChild(button);
+    app.appendChild(form);
+}
+
+function deploy(text) {
+    fetch(CONFIG.actions[text], {method: "POST", headers: {"Content-Type": "application/json"},
+                                 body: JSON.stringify({page: CONFIG.page})})
+        .then(function (response) { return response.json().then(function (data) { return [response.status, data]; }); })
+        .then(function (result) {
+            if (result[0] === 200 && result[1].code === 0) {
+                toast("success", "部署成功 " + text);
+            } else {
+                showLoggedOut("登录已过期，请重新登录");
+            }
+        });
+}
+
+function confirmBox(text) {
+    var wrapper = element("div", "el-message-box__wrapper");
+    var box = element("div", "el-message-box");
+    box.appendChild(element("div", "el-message-box__header", "提示"));
+    box.appendChild(element("div", "el-message-box__content", "确认执行 " + text + "?"));
+    var buttons = element("div", "el-message-box__btns");
+    var cancel = element("button", "el-button el-button--default el-button--small", "取消");
+    var ok = element("button", "el-button el-button--default el-button--small el-button--primary", "确认");
+    cancel.onclick = function () { wrapper.remove(); };
+    ok.onclick = function () { wrapper.remove(); deploy(text); };
+    buttons.appendChild(cancel);
+    buttons.appendChild(ok);
+    box.appendChild(buttons);
+    wrapper.appendChild(box);
+    document.body.appendChild(wrapper);
+}
+
+function renderPanel() {
+    var panel = element("div", "panel");
+    panel.appendChild(element("h2", null, CONFIG.page || "Vidnoz Manage"));
+    if (!CONFIG.exists) {
+        panel.appendChild(element("p", null, "404 Page not found"));
+    }
+    CONFIG.buttons.forEach(function (text) {
+        var button = element("button", "el-button el-button--primary", text);
+        button.type = "button";
+        button.onclick = function () { setTimeout(function () { confirmBox(text); }, CONFIG.dialogDelay); };
+        panel.appendChild(button);
+    });
+    if (CONFIG.items !== null) {
+        renderList(panel);
+    }
+    app.appendChild(panel);
+}
+
+// Element UI style table with a pager, CONFIG.pageSize rows per page; the last item carries
+// the list version, so a change can be made on a later page
+function renderList(panel) {
+    var pages = Math.max(1, Math.ceil(CONFIG.items / CONFIG.pageSize));
+    var current = 1;
+    var table = element("table", "el-table");
+    var body = element("tbody", "el-table__body");
+    table.appendChild(body);
+    var pagination = element("div", "el-pagination");
+    pagination.appendChild(element("span", "el-pagination__total", "共 " + CONFIG.items + " 条"));
+    var pager = element("ul", "el-pager");
+    var next = element("button", "btn-next", ">");
+    function show(page) {
+        current = page;
+        body.innerHTML = "";
+        for (var i = (page - 1) * CONFIG.pageSize + 1; i <= Math.min(CONFIG.items, page * CONFIG.pageSize); i++) {
+            var row = element("tr", "el-table__row");
+            row.appendChild(element("td", null, "条目 " + i + (i === CONFIG.items ? " v" + CONFIG.listVersion : "")));
+            body.appendChild(row);
+        }
+        next.disabled = page >= pages;
+        Array.prototype.forEach.call(pager.children, function (item, index) {
+            item.className = "number" + (index + 1 === page ? " active" : "");
+        });
+    }
+    for (var page = 1; page <= pages; page++) {
+        var item = element("li", "number", String(page));
+        item.onclick = show.bind(null, page);
+        pager.appendChild(item);
+    }
+    next.onclick = function () { if (current < pages) { show(current + 1); } };
+    pagination.appendChild(pager);
+    pagination.appendChild(next);
+    panel.appendChild(table);
+    panel.appendChild(pagination);
+    show(1);
+}
+
+// The real panel is a single-page app, its content appears some time after the load event
+setTimeout(CONFIG.loggedIn ? renderPanel : renderLogin, CONFIG.renderDelay);
+</script>
+</body>
+</html>
+"""
+
+class MockConfig:
+    """Behaviour of the mock panel"""
+
+    def __init__(self, username="lixiaohui@qq.com", password="123456", latency=0.0,
+                 deploy_latency=0.0, failure_rate=0.0, has_pressroom=True, render_delay=0.0,
+                 dialog_delay=0.0, toast_duration=3.0, list_items=20, asset_latency=0.0, page_size=10,
+                 list_version=1):
+        self.username = username
+        self.password = password
+        self.latency = latency  # Seconds added to every response
+        self.deploy_latency = deploy_latency  # Extra seconds a deploy action takes
+        self.failure_rate = failure_rate  # Probability that a deploy action fails
+        self.has_pressroom = has_pressroom  # Whether the pressroom-list page exists
+        self.render_delay = render_delay  # Seconds before a loaded page renders its form or buttons
+        self.dialog_delay = dialog_delay  # Seconds between a button click and its confirm box
+        self.toast_duration = toast_duration  # Seconds a toast message stays visible
+        self.list_items = list_items  # Item total shown on the list pages, the input of change detection
+        self.asset_latency = asset_latency  # Extra seconds every /static/ asset takes, delays the load event
+        self.page_size = page_size  # Rows per page of the list pages
+        self.list_version = list_version  # Shown on the last list item, changing it changes a later page
+
+class MockState:
+    """Sessions and request counters shared by all handler threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.requests = {}
+        self.deploys = []
+
+    def count(self, key):
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+class MockPanelHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "VidnozMock/1.0"
+
+    def log_message(self, format, *args):
+        # Keep the console quiet, requests are counted in MockState
+        pass
+
+    @property
+    def config(self):
+        return self.server.mock_config
+
+    @property
+    def state(self):
+        return self.server.mock_state
+
+    def _send(self, status, body, content_type="application/json;charset=UTF-8", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False)
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError:
+            return {}
+
+    def _session_token(self):
+        auth = self.headers.get("Authorization", "")
+        if auth.startswith("Bearer "):
+            return auth[len("Bearer "):]
+        for part in self.headers.get("Cookie", "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "vidnoz_session":
+                return value
+        return None
+
+    def _site(self):
+        return (self.headers.get("Host") or "").split(":")[0]
+
+    def _logged_in(self):
+        token = self._session_token()
+        with self.state.lock:
+            return token is not None and token in self.state.sessions
+
+    def _page_buttons(self, page):
+        """Buttons of a list page, None when the page does not exist on this site"""
+        if page == "pressroom-list" and not self.config.has_pressroom:
+            return None
+        for entry in DEFAULT_PLAN["pages"]:
+            if entry["name"] == page:
+                return entry["buttons"]
+        return None
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        self.state.count(f"GET {path}")
+        if self.config.latency:
+            time.sleep(self.config.latency)
+
+        if path in STATIC_ASSETS:
+            if self.config.asset_latency:
+                time.sleep(self.config.asset_latency)
+            content_type, body = STATIC_ASSETS[path]
+            self._send(200, body, content_type, {"Cache-Control": "no-cache"})
+            return
+        if path in ("/", "/frontend", "/frontend/", "/frontend/login"):
+            page, buttons = None, HOME_BUTTONS
+        elif path.startswith("/frontend/page/"):
+            page = path[len("/frontend/page/"):].strip("/")
+            buttons = self._page_buttons(page)
+        else:
+            self._send(404, "Not found", "text/plain;charset=UTF-8")
+            return
+
+        logged_in = self._logged_in()
+        config = {
+            "loggedIn": logged_in,
+            "page": page,
+            "exists": buttons is not None,
+            "buttons": buttons or [],
+            "items": self.config.list_items if page and buttons is not None else None,
+            "pageSize": self.config.page_size,
+            "listVersion": self.config.list_version,
+            "actions": MOCK_ENDPOINTS["actions"],
+            "loginPath": MOCK_ENDPOINTS["login"],
+            "renderDelay": int(self.config.render_delay * 1000),
+            "dialogDelay": int(self.config.dialog_delay * 1000),
+            "toastDuration": int(self.config.toast_duration * 1000),
+        }
+        status = 404 if logged_in and buttons is None else 200
+        html = PANEL_HTML.replace("__CONFIG__", json.dumps(config, ensure_ascii=False).replace("</", "<\\/"))
+        self._send(status, html, "text/html;charset=UTF-8")
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        self.state.count(f"POST {path}")
+        if self.config.latency:
+            time.sleep(self.config.latency)
+
+        if path == "/api/login":
+            payload = self._read_json()
+            if payload.get("username") != self.config.username or payload.get("password") != self.config.password:
+                self._send(200, {"code": 1001, "msg": "Invalid user name or password"})
+                return
+            token = secrets.token_hex(16)
+            with self.state.lock:
+                self.state.sessions.add(token)
+            self._send(200, {"code": 0, "msg": "ok", "data": {"token": token}},
+                       headers={"Set-Cookie": f"vidnoz_session={token}; Path=/; HttpOnly"})
+            return
+
+        if path.startswith("/api/frontend/update-"):
+            payload = self._read_json()
+            if not self._logged_in():
+                self._send(401, {"code": 401, "msg": "Please login"})
+                return
+            action = path[len("/api/frontend/"):]
+            page = payload.get("page") or ""
+            if ("pressroom" in action or page == "pressroom-list") and not self.config.has_pressroom:
+                self._send(404, {"code": 404, "msg": "Page not found"})
+                return
+            if self.config.deploy_latency:
+                time.sleep(self.config.deploy_latency)
+            failed = random.random() < self.config.failure_rate
+            with self.state.lock:
+                self.state.deploys.append((self._site(), action, not failed))
+            if failed:
+                self._send(200, {"code": 500, "msg": "Deploy failed"})
+            else:
+                self._send(200, {"code": 0, "msg": "Deploy succeeded"})
+            return
+
+        self._send(404, {"code": 404, "msg": "Not found"})
+
+def start_mock_server(port=0, host="127.0.0.1", config=None):
+    """Start the mock panel in a background thread, returns the server (server.server_port is the bound port)"""
+    server = ThreadingHTTPServer((host, port), MockPanelHandler)
+    server.daemon_threads = True
+    server.mock_config = config or MockConfig()
+    server.mock_state = MockState()
+    thread = threading.Thread(target=server.serve_forever, name="vidnoz-mock-server", daemon=True)
+    thread.start()
+    return server
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Local mock of the Vidnoz admin panel')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--deploy-latency', type=float, default=0.0, help='Extra seconds a deploy action takes')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Probability that a deploy fails (0-1)')
+    parser.add_argument('--no-pressroom', action='store_true', help='Emulate sites without a pressroom-list page')
+    parser.add_argument('--render-delay', type=float, default=0.0,
+                        help='Seconds before a loaded page renders its form or buttons')
+    parser.add_argument('--dialog-delay', type=float, default=0.0,
+                        help='Seconds between a button click and its confirm box')
+    parser.add_argument('--asset-latency', type=float, default=0.0,
+                        help='Extra seconds every static asset (logo, favicon, icon font) takes')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    mock_config = MockConfig(latency=args.latency, deploy_latency=args.deploy_latency,
+                             failure_rate=args.failure_rate, has_pressroom=not args.no_pressroom,
+                             render_delay=args.render_delay, dialog_delay=args.dialog_delay,
+                             asset_latency=args.asset_latency)
+    mock_server = start_mock_server(args.port, args.host, mock_config)
+    print(f"Mock admin panel listening on http://{args.host}:{mock_server.server_port}")
+    print(f"Sites can be addressed as http://<site>.localhost:{mock_server.server_port}/frontend/login")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        mock_server.shutdown()
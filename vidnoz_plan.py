@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Declarative multi-page update plan
+
+The pages and buttons of the global refresh mode are described as data and can
+be overridden with an update_plan.json file next to sites.json:
+
+    {
+      "site_wide_actions": ["更新公共样式"],
+      "pages": [
+        {"name": "aritcle-list", "buttons": ["更新公共样式", "更新blog全部列表", "更新blog全部详情"]},
+        {"name": "pressroom-list", "buttons": ["更新pressroom全部列表"], "optional": true}
+      ],
+      "sites": {
+        "tw": {"drop_pages": ["pressroom-list"]},
+        "en": {"add_pages": [{"name": "tools-list", "buttons": ["更新tools全部列表"]}]}
+      }
+    }
+
+Site-wide actions deploy the whole site no matter which page they are clicked
+on, so build_plan() keeps a single occurrence of each and runs it on the first
+required page.
+"""
+import copy
+import json
+import os
+
+DEFAULT_PLAN_FILE = "update_plan.json"
+
+DEFAULT_PLAN = {
+    # Buttons whose deploy covers the whole site, run once per site
+    "site_wide_actions": ["更新公共样式"],
+    "pages": [
+        {"name": "aritcle-list", "buttons": ["更新公共样式", "更新blog全部列表", "更新blog全部详情"], "optional": False},
+        {"name": "faq-list", "buttons": ["更新公共样式", "更新faq全部列表", "更新faq全部详情"], "optional": False},
+        {"name": "pressroom-list", "buttons": ["更新公共样式", "更新pressroom全部列表", "更新pressroom全部详情"],
+         "optional": True},
+    ],
+    # Per-site overrides: drop_pages, add_pages, and pages replacing a page of the same name
+    "sites": {},
+}
+
+class PlanStep:
+    """One page of the plan and the buttons clicked on it, in order"""
+
+    def __init__(self, page, buttons, optional=False, site_wide=()):
+        self.page = page
+        self.buttons = list(buttons)
+        self.optional = optional
+        self.site_wide = [button for button in self.buttons if button in site_wide]
+
+    def __repr__(self):
+        return f"PlanStep({self.page!r}, {self.buttons!r}, optional={self.optional})"
+
+def load_plan(file_path=DEFAULT_PLAN_FILE):
+    """Return DEFAULT_PLAN, replaced key by key with the contents of file_path if it exists"""
+    plan = copy.deepcopy(DEFAULT_PLAN)
+    if file_path and os.path.exists(file_path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        for key in ("site_wide_actions", "pages", "sites"):
+            if key in overrides:
+                plan[key] = overrides[key]
+    return plan
+
+def build_plan(plan=None, site_id=None):
+    """Turn a plan into the minimal list of PlanStep for one site
+
+    Per-site overrides are applied first; every site-wide action is then kept
+    once, at the front of the first required page (or the first page when all
+    pages are optional). Page and button order are otherwise preserved.
+    """
+    plan = plan or DEFAULT_PLAN
+    pages = [dict(page) for page in plan.get("pages", [])]
+
+    overrides = plan.get("sites", {}).get(site_id, {}) if site_id else {}
+    if overrides:
+        dropped = set(overrides.get("drop_pages", []))
+        replaced = {page["name"]: page for page in overrides.get("pages", [])}
+        pages = [dict(replaced.get(page["name"], page)) for page in pages if page["name"] not in dropped]
+        known = {page["name"] for page in pages}
+        pages.extend(dict(page) for page in overrides.get("add_pages", []) if page["name"] not in known)
+
+    site_wide = list(plan.get("site_wide_actions", []))
+    found = []
+    for page in pages:
+        for button in page.get("buttons", []):
+            if button in site_wide and button not in found:
+                found.append(button)
+        page["buttons"] = [button for button in page.get("buttons", []) if button not in site_wide]
+
+    if found and pages:
+        host = next((page for page in pages if not page.get("optional")), pages[0])
+        host["buttons"] = found + host["buttons"]
+
+    return [PlanStep(page["name"], page["buttons"], bool(page.get("optional")), site_wide)
+            for page in pages if page["buttons"]]
+
+def count_actions(steps):
+    """Number of deploy actions a plan performs"""
+    return sum(len(step.buttons) for step in steps)
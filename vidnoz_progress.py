@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Structured progress events of a run, delivered to subscribers such as the GUI
+
+Each event is a dict with "event", "time" and "site" plus event specific
+fields:
+
+    run_started    sites (ids in order), concurrency, engine
+    site_started   url
+    phase          phase (the phases recorded by TRACER.phase)
+    deploy         result (True/False/None), action and page when known
+    site_finished  result, cancelled (stopped by a cancelled run, result is None), duration
+    run_finished   successful, failed, unknown, cancelled, duration
+
+The site defaults to the "site" field of the current log context, so code
+running for a site (worker threads, helper browsers, asyncio tasks) emits
+attributable events without passing the site around. Subscribers are called
+on the emitting thread and must only hand the event over, e.g. queue.put.
+"""
+import threading
+import time
+
+from vidnoz_log import current_context
+from vidnoz_trace import TRACER
+
+class ProgressEvents:
+    """Fan-out of progress events to the subscribed callbacks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if subscriber is not callback]
+
+    def emit(self, event, site=None, **fields):
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        payload = {"event": event, "time": time.time(), "site": site or current_context().get("site"), **fields}
+        for callback in subscribers:
+            try:
+                callback(payload)
+            except Exception:
+                pass
+
+# Shared progress events of the current run
+PROGRESS = ProgressEvents()
+
+# Every phase started on a site's track is a progress event as well
+TRACER.phase_listeners.append(lambda name: PROGRESS.emit("phase", phase=name))
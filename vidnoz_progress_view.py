@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Live per-site progress grid of the GUIs
+
+ProgressGrid subscribes to vidnoz_progress.PROGRESS through a queue; the Tk
+thread drains it with drain(), which also advances the elapsed times and
+returns the run's summary line with an ETA for the status bar.
+"""
+import queue
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from vidnoz_progress import PROGRESS
+
+PHASE_LABELS = {
+    "navigate": "打开页面",
+    "session_restore": "恢复会话",
+    "login": "登录",
+    "session_save": "保存会话",
+    "panel_navigate": "进入后台",
+    "update": "更新",
+}
+RESULT_LABELS = {True: "成功", False: "失败", None: "未知", "cancelled": "已取消"}
+
+def _duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+class _SiteRow:
+    def __init__(self):
+        self.phase = "等待中"
+        self.started = None
+        self.duration = None
+        self.result = ""
+        self.deploys = 0
+        self.deployed = 0
+
+class ProgressGrid:
+    """One Treeview row per site: phase, elapsed time, deployments and result"""
+
+    COLUMNS = (("phase", "阶段", 110), ("elapsed", "耗时", 70), ("deploys", "部署成功", 80), ("result", "结果", 70))
+
+    def __init__(self, parent, height=8):
+        self.events = queue.SimpleQueue()
+        self.rows = {}
+        self.total = 0
+        self.concurrency = 1
+        self.finished = None
+        self.tree = ttk.Treeview(parent, columns=[name for name, _, _ in self.COLUMNS], height=height)
+        self.tree.heading("#0", text="站点")
+        self.tree.column("#0", width=120)
+        for name, label, width in self.COLUMNS:
+            self.tree.heading(name, text=label)
+            self.tree.column(name, width=width, anchor=tk.CENTER)
+        self.tree.tag_configure("failed", foreground="#c00000")
+        self.tree.tag_configure("succeeded", foreground="#007000")
+        PROGRESS.subscribe(self.events.put)
+
+    def pack(self, **options):
+        self.tree.pack(**options)
+
+    def close(self):
+        PROGRESS.unsubscribe(self.events.put)
+
+    def _handle(self, event):
+        kind, site = event["event"], event.get("site")
+        if kind == "run_started":
+            self.tree.delete(*self.tree.get_children())
+            self.rows = {site_id: _SiteRow() for site_id in event["sites"]}
+            self.total = len(self.rows)
+            self.concurrency = max(1, event.get("concurrency") or 1)
+            self.finished = None
+            for site_id in event["sites"]:
+                self.tree.insert("", tk.END, iid=site_id, text=site_id)
+            return
+        if kind == "run_finished":
+            self.finished = event
+            return
+        row = self.rows.get(site)
+        if row is None:
+            return
+        if kind == "site_started":
+            row.started = event["time"]
+            row.phase = "开始"
+        elif kind == "phase":
+            row.phase = PHASE_LABELS.get(event["phase"], event["phase"])
+        elif kind == "deploy":
+            row.deploys += 1
+            row.deployed += event.get("result") is True
+        elif kind == "site_finished":
+            row.duration = event["duration"]
+            row.result = "cancelled" if event.get("cancelled") else event["result"]
+            row.phase = "已停止" if event.get("cancelled") else "完成"
+        self._render(site, row)
+
+    def _render(self, site, row):
+        if row.duration is not None:
+            elapsed = _duration(row.duration)
+        elif row.started is not None:
+            elapsed = _duration(time.time() - row.started)
+        else:
+            elapsed = ""
+        result = RESULT_LABELS[row.result] if row.duration is not None else ""
+        tags = ("failed",) if row.result is False else ("succeeded",) if row.result is True else ()
+        self.tree.item(site, values=(row.phase, elapsed, f"{row.deployed}/{row.deploys}" if row.deploys else "",
+                                     result), tags=tags)
+
+    def drain(self):
+        """Apply the queued events, advance running timers; returns the status line or None"""
+        while True:
+            try:
+                self._handle(self.events.get_nowait())
+            except queue.Empty:
+                break
+        if not self.rows:
+            return None
+        running = [(site, row) for site, row in self.rows.items() if row.started is not None and row.duration is None]
+        for site, row in running:
+            self._render(site, row)
+        done = [row for row in self.rows.values() if row.duration is not None]
+        if self.finished is not None:
+            cancelled = f"，已取消 {self.finished['cancelled']}" if self.finished.get("cancelled") else ""
+            return (f"执行完成: 成功 {self.finished['successful']}，失败 {self.finished['failed']}，"
+                    f"未知 {self.finished['unknown']}{cancelled}，用时 {_duration(self.finished['duration'])}")
+        status = f"正在执行... {len(done)}/{self.total} 个站点完成，{len(running)} 个进行中"
+        if done:
+            # Remaining sites at the average duration so far, spread over the parallel workers
+            average = sum(row.duration for row in done) / len(done)
+            elapsed = sum(time.time() - row.started for _, row in running)
+            eta = max(0.0, (average * (self.total - len(done)) - elapsed) / self.concurrency)
+            status += f"，预计剩余 {_duration(eta)}"
+        return status
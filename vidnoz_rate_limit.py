@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Adaptive per-host rate limiting of admin panel actions
+
+Every backend (a host, or a group of hosts sharing a backend) gets its own
+token bucket, so sites on different backends never wait for each other. The
+rate of a bucket adapts to what the backend can take: it is cut on error
+toasts, failed deploys or failed logins and grows back slowly while responses
+are healthy.
+
+The limits are configured in the "rate_limits" section of sites.json:
+
+    "rate_limits": {
+      "default": {"rate": 0.5, "burst": 3},
+      "groups": {"asia": {"hosts": ["manage-jp.vidnoz.com", "manage-kr.vidnoz.com"], "rate": 1.0}},
+      "hosts": {"manage.vidnoz.com": {"rate": 0.2}}
+    }
+
+rate is in actions per second; see DEFAULT_LIMITS for all settings.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+from vidnoz_cancel import current_token
+
+DEFAULT_LIMITS = {
+    "rate": 0.5,        # Starting rate, actions per second
+    "burst": 3,         # Actions allowed back to back before the rate applies
+    "min_rate": 0.05,   # Lowest rate after repeated backoff (one action every 20 seconds)
+    "max_rate": 2.0,    # Highest rate reached while the backend stays healthy, never below the configured rate
+    "backoff": 0.5,     # Rate multiplier applied on an error
+    "recovery": 0.05,   # Rate added after every healthy response
+}
+
+# Seconds between two cancellation checks while an asyncio caller waits for its token
+CANCEL_POLL = 0.1
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate adapts with report()"""
+
+    def __init__(self, rate, burst, min_rate, max_rate, backoff, recovery):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        # A configured rate above the default ceiling raises the ceiling, recovery must not cap it
+        self.max_rate = max(max_rate, rate)
+        self.backoff = backoff
+        self.recovery = recovery
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return the seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens may go negative, later callers queue up behind earlier reservations
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def report(self, ok):
+        """Slow down after an error, speed up again after a healthy response"""
+        with self._lock:
+            if ok:
+                self.rate = min(self.max_rate, self.rate + self.recovery)
+            else:
+                self.rate = max(self.min_rate, self.rate * self.backoff)
+                # Do not let a burst hit a backend that just reported an error
+                self._tokens = min(self._tokens, 0.0)
+
+class RateLimiter:
+    """Token buckets keyed by backend group or host"""
+
+    def __init__(self, config=None):
+        self.configure(config)
+
+    def configure(self, config=None):
+        """Apply a "rate_limits" configuration, resets all buckets"""
+        config = config or {}
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._defaults = dict(DEFAULT_LIMITS)
+        self._defaults.update({k: v for k, v in config.get("default", {}).items() if k in DEFAULT_LIMITS})
+        self._groups = config.get("groups", {})
+        self._hosts = config.get("hosts", {})
+        self._host_groups = {}
+        for group, settings in self._groups.items():
+            for host in settings.get("hosts", []):
+                self._host_groups[host] = group
+
+    def key_for(self, url):
+        """Bucket key of a URL: its backend group, or its host"""
+        host = urlsplit(url).hostname or url
+        return self._host_groups.get(host, host)
+
+    def bucket(self, url):
+        key = self.key_for(url)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                settings = dict(self._defaults)
+                settings.update({k: v for k, v in self._groups.get(key, {}).items() if k in DEFAULT_LIMITS})
+                settings.update({k: v for k, v in self._hosts.get(key, {}).items() if k in DEFAULT_LIMITS})
+                bucket = TokenBucket(**settings)
+                self._buckets[key] = bucket
+            return bucket
+
+    def acquire(self, url, name="rate_limit", recorder=None, cancel_token=None):
+        """Block until the backend of url may receive the next action, returns the seconds waited
+
+        The wait is interrupted by cancelling the run (vidnoz_cancel.Cancelled is raised).
+        """
+        token = cancel_token or current_token()
+        token.check()
+        waited = self.bucket(url).reserve()
+        if waited > 0:
+            token.sleep(waited)
+        if recorder is not None:
+            recorder.record(name, waited, waited, True)
+        return waited
+
+    async def acquire_async(self, url, cancel_token=None):
+        """acquire() for the asyncio engine
+
+        A cancelled run raises asyncio.CancelledError, checked before the
+        reservation and every CANCEL_POLL seconds of the wait.
+        """
+        token = cancel_token or current_token()
+        if token.cancelled:
+            raise asyncio.CancelledError()
+        waited = self.bucket(url).reserve()
+        deadline = time.monotonic() + waited
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return waited
+            await asyncio.sleep(min(remaining, CANCEL_POLL))
+            if token.cancelled:
+                raise asyncio.CancelledError()
+
+    def report(self, url, ok):
+        """Feed the outcome of an action back into the backend's rate"""
+        self.bucket(url).report(ok)
+
+    def summary(self):
+        """Return {bucket key: current rate} for the run summary"""
+        with self._lock:
+            return {key: bucket.rate for key, bucket in self._buckets.items()}
+
+def load_rate_limits(file_path):
+    """Return the "rate_limits" section of a sites.json file, or None"""
+    if not file_path or not os.path.exists(file_path) or not file_path.lower().endswith('.json'):
+        return None
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if isinstance(data, dict) and isinstance(data.get("rate_limits"), dict):
+        return data["rate_limits"]
+    return None
+
+# Shared limiter for the current run
+LIMITER = RateLimiter()
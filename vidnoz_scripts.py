@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""JavaScript snippets injected into the admin panel
+
+Every snippet is a function body that reads its parameters from `arguments`,
+so it can be passed to Selenium's execute_script as is. Asynchronous snippets
+return a Promise; run_async_script() adapts them to execute_async_script and
+as_expression() turns any snippet into an expression for the DevTools
+protocol's Runtime.evaluate.
+"""
+import json
+
+# Returns "login" when the login form is shown, "panel" when admin buttons are rendered
+LOGIN_STATE = """
+var fields = document.querySelectorAll("input[placeholder='User Name']");
+for (var i = 0; i < fields.length; i++) {
+    if (fields[i].offsetParent !== null) { return "login"; }
+}
+var buttons = document.querySelectorAll("button");
+for (var j = 0; j < buttons.length; j++) {
+    if (buttons[j].innerText.indexOf("更新") !== -1) { return "panel"; }
+}
+return null;
+"""
+
+# True when both login fields are rendered and visible
+LOGIN_FORM_READY = """
+var user = document.querySelector("input[placeholder='User Name']");
+var pass = document.querySelector("input[placeholder='Password']");
+return !!(user && pass && user.offsetParent !== null && pass.offsetParent !== null);
+"""
+
+# "done" when the login form disappeared, "error" when the panel shows a login error, else null
+LOGIN_FINISHED = """
+var errors = document.querySelectorAll('.el-message--error, .error-message, .alert-danger');
+for (var i = 0; i < errors.length; i++) {
+    if (errors[i].offsetParent !== null) { return "error"; }
+}
+var fields = document.querySelectorAll("input[placeholder='User Name']");
+for (var j = 0; j < fields.length; j++) {
+    if (fields[j].offsetParent !== null) { return null; }
+}
+return "done";
+"""
+
+# True when a visible button whose text contains arguments[0] is rendered
+PANEL_READY = """
+var buttons = document.querySelectorAll('button');
+for (var i = 0; i < buttons.length; i++) {
+    if (buttons[i].innerText.indexOf(arguments[0]) !== -1 && buttons[i].offsetParent !== null) {
+        return true;
+    }
+}
+return false;
+"""
+
+# True when an element matching the selector arguments[0] is visible (fixed overlays included)
+ANY_VISIBLE = """
+var elements = document.querySelectorAll(arguments[0]);
+for (var i = 0; i < elements.length; i++) {
+    var rect = elements[i].getBoundingClientRect();
+    if (rect.width > 0 && rect.height > 0 && getComputedStyle(elements[i]).visibility !== "hidden") {
+        return true;
+    }
+}
+return false;
+"""
+
+# True when no element matching the selector arguments[0] is visible
+NONE_VISIBLE = f"return !(function () {{\n{ANY_VISIBLE}\n}}).apply(null, arguments);"
+
+# Dialog containers used by the admin panel (Element UI) and common frameworks
+DIALOG_SELECTOR = ".el-message-box, .el-dialog, .modal, .dialog, [role='dialog']"
+
+# Toast messages shown by Element UI
+TOAST_SELECTOR = ".el-message"
+
+# In-page half of the locator engine (vidnoz_locators). locate(strategies) evaluates every
+# strategy in priority order against the current DOM and returns the first visible, enabled
+# match as {element, strategy, scope}, or null. A strategy is a dict:
+#   kind: "xpath" | "css" | "text"; value: expression, or text(s) for "text";
+#   selector: candidates of a "text" strategy; ignore_case;
+#   within / within_text: the match must sit in a visible container containing that text.
+LOCATE_FUNCTION = """
+function locate(strategies) {
+    function visible(el) {
+        var rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== "hidden";
+    }
+    function textOf(el) {
+        return (el.innerText || el.textContent || "").trim();
+    }
+    function candidates(s) {
+        if (s.kind === "xpath") {
+            var snapshot = document.evaluate(s.value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            var found = [];
+            for (var n = 0; n < snapshot.snapshotLength; n++) { found.push(snapshot.snapshotItem(n)); }
+            return found;
+        }
+        var nodes = Array.prototype.slice.call(
+            document.querySelectorAll(s.kind === "css" ? s.value : (s.selector || "button")));
+        if (s.kind !== "text") { return nodes; }
+        var words = [].concat(s.value).map(function (w) { return s.ignore_case ? w.toLowerCase() : w; });
+        return nodes.filter(function (el) {
+            var text = s.ignore_case ? textOf(el).toLowerCase() : textOf(el);
+            return words.some(function (w) { return text.indexOf(w) !== -1; });
+        });
+    }
+    for (var i = 0; i < strategies.length; i++) {
+        var s = strategies[i];
+        var nodes;
+        try { nodes = candidates(s); } catch (e) { continue; }
+        for (var j = 0; j < nodes.length; j++) {
+            var el = nodes[j];
+            if (!visible(el) || el.disabled) { continue; }
+            var scope = null;
+            if (s.within) {
+                scope = el.closest(s.within);
+                if (!scope || !visible(scope)) { continue; }
+                if (s.within_text && textOf(scope).indexOf(s.within_text) === -1) { continue; }
+            }
+            return {element: el, strategy: s.name, scope: scope};
+        }
+    }
+    return null;
+}
+"""
+
+# Runs locate(arguments[0]) once and clicks the match when arguments[1] is true.
+# Returns {element, strategy, text} or null.
+LOCATE = LOCATE_FUNCTION + """
+var found = locate(arguments[0]);
+if (!found) { return null; }
+if (arguments[1]) { found.element.click(); }
+return {element: found.element, strategy: found.strategy, text: (found.element.innerText || "").trim()};
+"""
+
+# Success indicators of a deployment, the Element UI toast first
+SUCCESS_SELECTOR = ".el-message--success, .success, .alert-success, .text-success"
+# Error toast of a rejected or throttled deployment
+ERROR_SELECTOR = ".el-message--error"
+
+# Waits up to arguments[0] ms for the confirm button described by the strategies arguments[1]
+# (see vidnoz_locators.CONFIRM_BUTTON) and clicks it. Success indicators and error toasts visible
+# at the moment of the click (e.g. the toast of the previous action) are marked data-vidnoz-stale
+# first.
+# Resolves {clicked, button, dialog, dialog_class, strategy, waited} in a single round-trip;
+# the dialog text is only read and transferred when arguments[2] is true (debug logging).
+CONFIRM_DIALOG = LOCATE_FUNCTION + """
+var STATUS = '""" + SUCCESS_SELECTOR + ", " + ERROR_SELECTOR + """';
+var timeoutMs = arguments[0];
+var strategies = arguments[1];
+var withText = !!arguments[2];
+var started = Date.now();
+
+return new Promise(function (resolve) {
+    var observer = null;
+    var timer = null;
+    function attempt() {
+        var found = locate(strategies);
+        if (!found) { return false; }
+        if (observer) { observer.disconnect(); }
+        if (timer) { clearTimeout(timer); }
+        Array.prototype.forEach.call(document.querySelectorAll(STATUS), function (el) {
+            var rect = el.getBoundingClientRect();
+            if (rect.width > 0 && rect.height > 0) { el.setAttribute("data-vidnoz-stale", ""); }
+        });
+        found.element.click();
+        resolve({
+            clicked: true,
+            button: (found.element.innerText || "").trim(),
+            dialog: found.scope && withText ? (found.scope.innerText || "").trim().slice(0, 200) : null,
+            dialog_class: found.scope ? found.scope.className : null,
+            strategy: found.strategy,
+            waited: Date.now() - started
+        });
+        return true;
+    }
+    if (attempt()) { return; }
+    observer = new MutationObserver(attempt);
+    observer.observe(document.body, {childList: true, subtree: true, attributes: true,
+                                     attributeFilter: ["style", "class"]});
+    timer = setTimeout(function () {
+        observer.disconnect();
+        resolve({clicked: false, waited: Date.now() - started});
+    }, timeoutMs);
+});
+"""
+
+# Resolves {status: "success"|"failure"|null, indicator, detail, waited} as soon as a deployment
+# indicator appears, status is null after arguments[0] ms. The logout indicator and an error
+# toast (indicator "login" or "error") are failures. When arguments[1] is true, toasts and
+# indicators left over from a previous action (marked stale by CONFIRM_DIALOG before its click)
+# are ignored; a toast appearing between that click and this call still counts.
+DEPLOYMENT_STATUS = """
+var timeoutMs = arguments[0];
+var ignoreExisting = !!arguments[1];
+var FAILURE = ".blog-login";
+var ERROR = '""" + ERROR_SELECTOR + """';
+var SUCCESS_TOAST = ".el-message--success";
+var SUCCESS = '""" + SUCCESS_SELECTOR + """';
+var started = Date.now();
+
+function visible(el) {
+    var rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== "hidden";
+}
+function visibleMatches(selector) {
+    return Array.prototype.filter.call(document.querySelectorAll(selector), visible);
+}
+
+return new Promise(function (resolve) {
+    var observer = null;
+    var timer = null;
+    function finish(status, el) {
+        if (observer) { observer.disconnect(); }
+        if (timer) { clearTimeout(timer); }
+        resolve({
+            status: status,
+            indicator: el ? (el.matches(SUCCESS_TOAST) ? "toast" : el.matches(FAILURE) ? "login"
+                             : el.matches(ERROR) ? "error" : "indicator") : null,
+            detail: el ? (el.innerText || "").trim().slice(0, 200) : null,
+            waited: Date.now() - started
+        });
+    }
+    function fresh(el) {
+        return !(ignoreExisting && el.hasAttribute("data-vidnoz-stale"));
+    }
+    function check() {
+        var failures = visibleMatches(FAILURE).concat(visibleMatches(ERROR).filter(fresh));
+        if (failures.length) { finish("failure", failures[0]); return true; }
+        var successes = visibleMatches(SUCCESS).filter(fresh);
+        // The Element UI toast is the authoritative signal, generic indicators come second
+        successes.sort(function (a, b) { return b.matches(SUCCESS_TOAST) - a.matches(SUCCESS_TOAST); });
+        if (successes.length) { finish("success", successes[0]); return true; }
+        return false;
+    }
+    if (check()) { return; }
+    observer = new MutationObserver(check);
+    observer.observe(document.body, {childList: true, subtree: true, attributes: true,
+                                     attributeFilter: ["style", "class"]});
+    timer = setTimeout(function () { finish(null); }, timeoutMs);
+});
+"""
+
+# Resolves the text of the visible elements matching arguments[0] (a list's item total and
+# rows) on every page of an Element UI pagination, pages joined by "\n--\n". The pages are
+# walked with the next button (at most arguments[1] pages, arguments[2] ms each) and the
+# first page is shown again, and waited for, before resolving. Resolves null right away when
+# the item total or the pager shows more than arguments[1] pages, and null when there is no
+# list, the list is still loading, or not every page could be read.
+LIST_CONTENT = """
+var selector = arguments[0];
+var maxPages = arguments[1] || 1;
+var pageTimeoutMs = arguments[2] || 5000;
+
+function shown(el) { return el.offsetParent !== null; }
+function loading() {
+    var masks = document.querySelectorAll(".el-loading-mask");
+    for (var i = 0; i < masks.length; i++) {
+        if (shown(masks[i]) && getComputedStyle(masks[i]).display !== "none") { return true; }
+    }
+    return false;
+}
+function content() {
+    var parts = [];
+    var elements = document.querySelectorAll(selector);
+    for (var j = 0; j < elements.length; j++) {
+        if (shown(elements[j])) { parts.push(elements[j].innerText.trim()); }
+    }
+    return parts.length ? parts.join("\\n") : null;
+}
+function rows() {
+    var body = document.querySelector(".el-table__body");
+    return body ? body.innerText : "";
+}
+function pageCount() {
+    // Last page number of the pager, or the item total over the rows of the first page
+    var count = 1;
+    var numbers = document.querySelectorAll(".el-pagination .el-pager li.number");
+    for (var i = 0; i < numbers.length; i++) {
+        count = Math.max(count, parseInt(numbers[i].innerText, 10) || 1);
+    }
+    var total = document.querySelector(".el-pagination__total");
+    var match = total ? total.innerText.replace(/,/g, "").match(/\d+/) : null;
+    var body = document.querySelector(".el-table__body");
+    var shownRows = body ? body.querySelectorAll("tr").length : 0;
+    if (match && shownRows) { count = Math.max(count, Math.ceil(parseInt(match[0], 10) / shownRows)); }
+    return count;
+}
+function nextButton() {
+    var buttons = document.querySelectorAll(".el-pagination .btn-next");
+    for (var k = 0; k < buttons.length; k++) {
+        var button = buttons[k];
+        if (shown(button) && !button.disabled && !button.classList.contains("is-disabled")) { return button; }
+    }
+    return null;
+}
+
+return new Promise(function (resolve) {
+    var pages = [];
+    var firstRows = rows();
+    function finish(value) {
+        var first = pages.length > 1 ? document.querySelector(".el-pagination .el-pager li.number") : null;
+        if (!first) { resolve(value); return; }
+        var started = Date.now();
+        first.click();
+        // The deploy buttons are clicked next, the list must not be reloading under them
+        (function poll() {
+            if (!loading() && rows() === firstRows) { resolve(value); return; }
+            if (Date.now() - started > pageTimeoutMs) { resolve(null); return; }
+            setTimeout(poll, 100);
+        })();
+    }
+    if (pageCount() > maxPages) { resolve(null); return; }
+    function read() {
+        var text = loading() ? null : content();
+        if (text === null) { finish(null); return; }
+        pages.push(text);
+        var next = nextButton();
+        if (!next) { finish(pages.join("\\n--\\n")); return; }
+        if (pages.length >= maxPages) { finish(null); return; }
+        var before = rows();
+        var started = Date.now();
+        next.click();
+        (function poll() {
+            if (!loading() && rows() !== before) { read(); return; }
+            if (Date.now() - started > pageTimeoutMs) { finish(null); return; }
+            setTimeout(poll, 100);
+        })();
+    }
+    read();
+});
+"""
+
+# Focuses the element matching arguments[0] and clears it, returns true if found
+FOCUS_AND_CLEAR = """
+var el = document.querySelector(arguments[0]);
+if (!el) { return false; }
+el.focus();
+var setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, "value").set;
+setter.call(el, "");
+el.dispatchEvent(new Event("input", {bubbles: true}));
+return true;
+"""
+
+# Marks the current document before a navigation; NEW_DOCUMENT is true once a document
+# without the mark has finished parsing (pageLoadStrategy "none" returns before that)
+MARK_DOCUMENT = "window.__vidnozPreviousDocument = true;"
+NEW_DOCUMENT = "return !window.__vidnozPreviousDocument && document.readyState !== 'loading';"
+
+ASYNC_WRAPPER = """
+var done = arguments[arguments.length - 1];
+var args = Array.prototype.slice.call(arguments, 0, -1);
+Promise.resolve((function () {
+%s
+}).apply(null, args)).then(done, function (error) { done({error: String(error)}); });
+"""
+
+def as_expression(body, *args):
+    """Turn a snippet into a self-invoking expression for Runtime.evaluate"""
+    return f"(function () {{\n{body}\n}}).apply(null, {json.dumps(list(args), ensure_ascii=False)})"
+
+def run_async_script(driver, body, *args, timeout=None):
+    """Run a Promise-returning snippet through Selenium's execute_async_script
+
+    timeout (seconds) raises the driver's script timeout so long waits are not cut off.
+    """
+    if timeout is not None:
+        driver.set_script_timeout(timeout)
+    return driver.execute_async_script(ASYNC_WRAPPER % body, *args)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""On-disk cache of authenticated admin panel sessions, keyed by site id"""
+import json
+import os
+import threading
+import time
+
+# Cookie fields accepted by WebDriver add_cookie
+COOKIE_FIELDS = ("name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite")
+
+READ_LOCAL_STORAGE_SCRIPT = """
+var items = {};
+try {
+    for (var i = 0; i < window.localStorage.length; i++) {
+        var key = window.localStorage.key(i);
+        items[key] = window.localStorage.getItem(key);
+    }
+} catch (e) {}
+return items;
+"""
+
+WRITE_LOCAL_STORAGE_SCRIPT = """
+var items = arguments[0];
+try {
+    for (var key in items) {
+        window.localStorage.setItem(key, items[key]);
+    }
+} catch (e) {}
+"""
+
+def origin_of(url):
+    """Return the scheme://host[:port] part of a URL"""
+    return '/'.join(url.split('/')[:3])
+
+class SessionCache:
+    """Stores cookies and localStorage after a successful login so later runs can skip it
+
+    Entries older than `max_age` seconds, or whose cookies have all expired, are ignored.
+    """
+
+    def __init__(self, path="session_cache.json", max_age=12 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load_entries(self):
+        if self._entries is None:
+            self._entries = {}
+            try:
+                if os.path.exists(self.path):
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if isinstance(data, dict):
+                        self._entries = data
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _write_entries(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, site_id, site_url=None):
+        """Return the cached session of a site, or None if missing or expired
+
+        When site_url is given, an entry captured on another origin is dropped and None is returned.
+        """
+        with self._lock:
+            entry = self._load_entries().get(site_id)
+            if entry and site_url and entry.get("origin") != origin_of(site_url):
+                del self._entries[site_id]
+                self._write_entries()
+                return None
+        if not entry:
+            return None
+        now = time.time()
+        if now - entry.get("saved_at", 0) > self.max_age:
+            return None
+        cookies = [c for c in entry.get("cookies", []) if not c.get("expiry") or c["expiry"] > now]
+        if not cookies and not entry.get("local_storage"):
+            return None
+        return dict(entry, cookies=cookies)
+
+    def save(self, site_id, driver):
+        """Capture the logged-in session of the driver's current origin"""
+        entry = self.capture(driver)
+        with self._lock:
+            self._load_entries()[site_id] = entry
+            self._write_entries()
+
+    def invalidate(self, site_id):
+        """Forget a site's session, e.g. after the panel logged us out"""
+        with self._lock:
+            if self._load_entries().pop(site_id, None) is not None:
+                self._write_entries()
+
+    @staticmethod
+    def capture(driver):
+        """Return the session (cookies and localStorage) of the driver's current origin as an entry"""
+        cookies = [{k: c[k] for k in COOKIE_FIELDS if k in c} for c in driver.get_cookies()]
+        try:
+            local_storage = driver.execute_script(READ_LOCAL_STORAGE_SCRIPT) or {}
+        except Exception:
+            local_storage = {}
+        return {
+            "saved_at": time.time(),
+            "origin": origin_of(driver.current_url),
+            "cookies": cookies,
+            "local_storage": local_storage,
+        }
+
+    @staticmethod
+    def inject(driver, entry):
+        """Restore a cached session into a driver already on the site's origin
+
+        Returns the number of cookies that were accepted.
+        """
+        added = 0
+        for cookie in entry.get("cookies", []):
+            cookie = dict(cookie)
+            if "expiry" in cookie:
+                cookie["expiry"] = int(cookie["expiry"])
+            try:
+                driver.add_cookie(cookie)
+                added += 1
+            except Exception:
+                # Cookies for another domain or with rejected attributes are skipped
+                cookie.pop("domain", None)
+                try:
+                    driver.add_cookie(cookie)
+                    added += 1
+                except Exception:
+                    pass
+        if entry.get("local_storage"):
+            try:
+                driver.execute_script(WRITE_LOCAL_STORAGE_SCRIPT, entry["local_storage"])
+            except Exception:
+                pass
+        return added
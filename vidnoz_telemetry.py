@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Opt-in telemetry of the WebDriver commands a run sends
+
+Every Selenium call (find_elements, is_displayed, .text, execute_script, and
+the calls WebElements make through their parent driver) ends up in
+WebDriver.execute. instrument() wraps that method on a driver instance and
+records, per command and per calling function, the number of calls, their
+latency and the size of the request and response payloads.
+"""
+import json
+import sys
+import threading
+import time
+
+DEFAULT_TOP_N = 15  # Rows of the printed tables
+
+# Frames of these modules are skipped when looking for the function that issued a command
+_HELPER_MODULES = ("selenium.", "vidnoz_telemetry", "vidnoz_waits", "vidnoz_trace", "vidnoz_locators",
+                   "vidnoz_scripts", "contextlib", "functools")
+
+def _payload_size(value):
+    try:
+        return len(json.dumps(value, default=str, ensure_ascii=False))
+    except (TypeError, ValueError):
+        return 0
+
+def _call_site():
+    """module.function of the innermost caller outside Selenium and the generic helpers"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module != "selenium" and not module.startswith(_HELPER_MODULES):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "<unknown>"
+
+class CommandTelemetry:
+    """Thread-safe per (command, call site) statistics of WebDriver commands"""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def instrument(self, driver):
+        """Record the commands of driver while telemetry is enabled, safe to call repeatedly"""
+        if getattr(driver, "_vidnoz_telemetry", False):
+            return driver
+        execute = driver.execute
+
+        def instrumented_execute(driver_command, params=None):
+            if not self.enabled:
+                return execute(driver_command, params)
+            site = _call_site()
+            start = time.perf_counter()
+            try:
+                response = execute(driver_command, params)
+            except Exception:
+                self.record(driver_command, site, time.perf_counter() - start, _payload_size(params), 0, error=True)
+                raise
+            elapsed = time.perf_counter() - start
+            value = response.get("value") if isinstance(response, dict) else response
+            self.record(driver_command, site, elapsed, _payload_size(params), _payload_size(value))
+            return response
+
+        driver.execute = instrumented_execute
+        driver._vidnoz_telemetry = True
+        return driver
+
+    def record(self, command, site, elapsed, sent, received, error=False):
+        with self._lock:
+            stat = self._stats.setdefault((command, site), {
+                "count": 0, "errors": 0, "elapsed": 0.0, "max": 0.0, "sent": 0, "received": 0
+            })
+            stat["count"] += 1
+            stat["elapsed"] += elapsed
+            stat["max"] = max(stat["max"], elapsed)
+            stat["sent"] += sent
+            stat["received"] += received
+            if error:
+                stat["errors"] += 1
+
+    def _grouped(self, key_index):
+        with self._lock:
+            items = list(self._stats.items())
+        groups = {}
+        for key, stat in items:
+            group = groups.setdefault(key[key_index], {
+                "count": 0, "errors": 0, "elapsed": 0.0, "max": 0.0, "sent": 0, "received": 0
+            })
+            for field in ("count", "errors", "elapsed", "sent", "received"):
+                group[field] += stat[field]
+            group["max"] = max(group["max"], stat["max"])
+        return groups
+
+    def report(self, top=DEFAULT_TOP_N):
+        """Return the statistics for the run report, heaviest entries first"""
+        with self._lock:
+            items = [dict(stat, command=command, call_site=site) for (command, site), stat in self._stats.items()]
+        items.sort(key=lambda stat: -stat["elapsed"])
+        by_command = sorted(({"command": name, **stat} for name, stat in self._grouped(0).items()),
+                            key=lambda stat: -stat["elapsed"])
+        by_site = sorted(({"call_site": name, **stat} for name, stat in self._grouped(1).items()),
+                         key=lambda stat: -stat["elapsed"])
+        return {
+            "total_commands": sum(stat["count"] for stat in items),
+            "total_seconds": sum(stat["elapsed"] for stat in items),
+            "by_command": by_command,
+            "by_call_site": by_site,
+            "top": items[:top],
+        }
+
+    def format_summary(self, top=DEFAULT_TOP_N):
+        """Return the top-N tables as printable lines"""
+        report = self.report(top)
+        if not report["total_commands"]:
+            return []
+        lines = [f"{report['total_commands']} commands, {report['total_seconds']:.1f}s in WebDriver calls", ""]
+        header = f"{'count':>6} {'total':>8} {'avg ms':>7} {'max ms':>7} {'sent':>8} {'received':>9}"
+
+        def row(stat):
+            average = stat["elapsed"] / stat["count"] * 1000
+            return (f"{stat['count']:>6} {stat['elapsed']:>7.1f}s {average:>7.1f} {stat['max'] * 1000:>7.1f} "
+                    f"{stat['sent']:>8} {stat['received']:>9}")
+
+        lines.append(f"{'call site':<44} {header}")
+        for stat in report["by_call_site"][:top]:
+            lines.append(f"{stat['call_site'][:44]:<44} {row(stat)}")
+        lines.append("")
+        lines.append(f"{'command':<44} {header}")
+        for stat in report["by_command"][:top]:
+            lines.append(f"{stat['command'][:44]:<44} {row(stat)}")
+        lines.append("")
+        lines.append(f"{'call site / command':<44} {header}")
+        for stat in report["top"]:
+            lines.append(f"{(stat['call_site'] + ' ' + stat['command'])[:44]:<44} {row(stat)}")
+        return lines
+
+# Shared telemetry for the current run
+TELEMETRY = CommandTelemetry()
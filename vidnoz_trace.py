@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""Per-phase timing spans of a run, exported as a Chrome trace-event file
+
+Spans are recorded on tracks: every site gets its own track (a "thread" in the
+trace viewer) and code running for that site inherits it through a context
+variable, so the worker threads and the asyncio tasks of the cdp engine need
+no extra parameters. The exported JSON opens in https://ui.perfetto.dev or
+chrome://tracing.
+
+    with TRACER.track("en", "site", url=url) as span:
+        TRACER.phase("login")
+        ...
+        span["result"] = True
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+RUN_TRACK = "run"  # Track of spans recorded outside of any site
+
+_current_track = contextvars.ContextVar("vidnoz_trace_track", default=None)
+
+class _Track:
+    """Name of a track and the phase currently open on it"""
+
+    def __init__(self, name):
+        self.name = name
+        self.phase = None
+
+class Tracer:
+    """Thread-safe collector of complete ("X") trace events"""
+
+    def __init__(self):
+        self.enabled = True
+        # Called with the name of every phase started, e.g. by vidnoz_progress
+        self.phase_listeners = []
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._tids = {}
+        self._origin = time.perf_counter()
+        # The run track is listed first, site tracks follow in the order they start
+        self._tid(RUN_TRACK)
+
+    def _now(self):
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def _tid(self, track):
+        # Called with the lock held, registers the track name on first use
+        tid = self._tids.get(track)
+        if tid is None:
+            tid = self._tids[track] = len(self._tids) + 1
+            self._events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": track}})
+            self._events.append({"name": "thread_sort_index", "ph": "M", "pid": 1, "tid": tid,
+                                 "args": {"sort_index": tid}})
+        return tid
+
+    def _add(self, name, start, end, args, track=None):
+        if not self.enabled:
+            return
+        track = track or self.current_track() or RUN_TRACK
+        with self._lock:
+            self._events.append({
+                "name": name, "ph": "X", "pid": 1, "tid": self._tid(track),
+                "ts": round(start, 1), "dur": round(max(0.0, end - start), 1),
+                "args": {key: _jsonable(value) for key, value in args.items()},
+            })
+
+    def current_track(self):
+        current = _current_track.get()
+        return current.name if current is not None else None
+
+    @contextlib.contextmanager
+    def track(self, name, span=None, **args):
+        """Record the spans of the enclosed code on the track `name`
+
+        With span, the whole block is recorded as a span of that name as well;
+        the yielded dict can be filled with more args.
+        """
+        token = _current_track.set(_Track(name))
+        start = self._now()
+        try:
+            yield args
+        finally:
+            self.end_phase()
+            if span:
+                self._add(span, start, self._now(), args)
+            _current_track.reset(token)
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Time the enclosed code; the yielded dict can be filled with more args"""
+        start = self._now()
+        try:
+            yield args
+        finally:
+            self._add(name, start, self._now(), args)
+
+    def phase(self, name, **args):
+        """End the open phase of the current track and start the next one
+
+        Phases mark the sequential steps of a long function without wrapping
+        each step in a with block; the last phase ends with the track.
+        """
+        self.end_phase()
+        current = _current_track.get()
+        if current is not None:
+            current.phase = (name, self._now(), args)
+        for listener in self.phase_listeners:
+            listener(name)
+
+    def end_phase(self, **args):
+        current = _current_track.get()
+        if current is None or current.phase is None:
+            return
+        name, start, phase_args = current.phase
+        current.phase = None
+        phase_args.update(args)
+        self._add(name, start, self._now(), phase_args, current.name)
+
+    def traced(self, name):
+        """Decorator recording each call as a span
+
+        name may reference the call's arguments, e.g. "deploy {button_text}";
+        a simple return value is stored in the span's "result" arg. Works for
+        coroutine functions as well.
+        """
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            def span_name(args, kwargs):
+                if "{" not in name:
+                    return name
+                bound = signature.bind(*args, **kwargs)
+                return name.format(**bound.arguments)
+
+            def store(span, result):
+                if result is None or isinstance(result, (bool, int, str)):
+                    span["result"] = result
+                return result
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    with self.span(span_name(args, kwargs)) as span:
+                        return store(span, await func(*args, **kwargs))
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.span(span_name(args, kwargs)) as span:
+                    return store(span, func(*args, **kwargs))
+            return wrapper
+        return decorator
+
+    def spans(self, name=None):
+        """Return the recorded spans as dicts (track, name, start and duration in seconds, args)"""
+        with self._lock:
+            events = [event for event in self._events if event["ph"] == "X"]
+            tracks = {tid: track for track, tid in self._tids.items()}
+        return [{"track": tracks[event["tid"]], "name": event["name"], "start": event["ts"] / 1e6,
+                 "duration": event["dur"] / 1e6, "args": event["args"]}
+                for event in events if name is None or event["name"] == name]
+
+    def export(self, path):
+        """Write the trace-event JSON file, returns the number of spans written"""
+        with self._lock:
+            events = list(self._events)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return sum(1 for event in events if event["ph"] == "X")
+
+def _jsonable(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+# Shared tracer for the current run
+TRACER = Tracer()
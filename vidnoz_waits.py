@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Condition-driven waits that return as soon as the page is ready
+
+Every wait declares the DOM condition it is waiting for and keeps the former
+fixed sleep as its upper bound. The time each wait actually took is recorded
+so a run can report how much idle time was avoided. Waits sleep on the run's
+CancelToken, so a cancelled run leaves them within one poll.
+"""
+from selenium.common.exceptions import NoSuchElementException
+import threading
+import time
+import vidnoz_scripts as scripts
+from vidnoz_trace import TRACER
+from vidnoz_cancel import current_token
+
+DEFAULT_POLL_FREQUENCY = 0.2  # Seconds between two condition checks
+
+class WaitRecorder:
+    """Collects the budget and the actual duration of every wait"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def record(self, name, budget, elapsed, satisfied):
+        with self._lock:
+            stat = self._stats.setdefault(name, {
+                "count": 0, "timeouts": 0, "budget": 0.0, "elapsed": 0.0, "max": 0.0
+            })
+            stat["count"] += 1
+            stat["budget"] += budget
+            stat["elapsed"] += elapsed
+            stat["max"] = max(stat["max"], elapsed)
+            if not satisfied:
+                stat["timeouts"] += 1
+
+    def summary(self):
+        """Return per-wait statistics including the idle time saved versus the fixed budget"""
+        with self._lock:
+            stats = {name: dict(stat) for name, stat in self._stats.items()}
+        for stat in stats.values():
+            stat["saved"] = max(0.0, stat["budget"] - stat["elapsed"])
+        return stats
+
+    def format_summary(self):
+        """Return the summary as printable lines"""
+        stats = self.summary()
+        if not stats:
+            return []
+        lines = [f"{'wait':<28} {'count':>5} {'timeouts':>8} {'waited':>9} {'budget':>9} {'saved':>9}"]
+        for name, stat in sorted(stats.items(), key=lambda item: -item[1]["saved"]):
+            lines.append(f"{name:<28} {stat['count']:>5} {stat['timeouts']:>8} "
+                         f"{stat['elapsed']:>8.1f}s {stat['budget']:>8.1f}s {stat['saved']:>8.1f}s")
+        total_elapsed = sum(stat["elapsed"] for stat in stats.values())
+        total_saved = sum(stat["saved"] for stat in stats.values())
+        lines.append(f"Total waited {total_elapsed:.1f}s, idle time saved {total_saved:.1f}s")
+        return lines
+
+# Shared recorder for the current run
+RECORDER = WaitRecorder()
+
+def wait_until(driver, condition, timeout, name, poll_frequency=DEFAULT_POLL_FREQUENCY, recorder=None,
+               cancel_token=None):
+    """Wait until condition(driver) returns a truthy value, at most `timeout` seconds
+
+    Returns the condition's value, or None when the timeout is reached. Raises
+    vidnoz_cancel.Cancelled when the run (or cancel_token) is cancelled.
+    """
+    recorder = recorder or RECORDER
+    token = cancel_token or current_token()
+    start_time = time.time()
+    deadline = time.monotonic() + timeout
+    with TRACER.span(name, timeout=timeout) as span:
+        while True:
+            token.check()
+            try:
+                value = condition(driver)
+            except NoSuchElementException:
+                value = None
+            if value:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                value = None
+                break
+            token.sleep(min(poll_frequency, remaining))
+        span["satisfied"] = value is not None
+    recorder.record(name, timeout, time.time() - start_time, value is not None)
+    return value
+
+def _script_condition(script, *args):
+    def condition(driver):
+        try:
+            return driver.execute_script(script, *args)
+        except Exception:
+            return None
+    return condition
+
+def new_document():
+    """The document of a navigation started after scripts.MARK_DOCUMENT finished parsing"""
+    return _script_condition(scripts.NEW_DOCUMENT)
+
+def load_page(driver, url=None, name="page_load", timeout=10, recorder=None):
+    """driver.get(url), or driver.refresh() without url, returning once the new document is parsed
+
+    Under pageLoadStrategy "none" (vidnoz_load_profile) WebDriver returns before
+    the navigation commits, so the old document is marked first and the wait
+    lasts until a document without the mark is shown. With the other
+    strategies WebDriver already waits and this is a plain get or refresh.
+    """
+    detached = (getattr(driver, "capabilities", None) or {}).get("pageLoadStrategy") == "none"
+    if detached:
+        driver.execute_script(scripts.MARK_DOCUMENT)
+    if url:
+        driver.get(url)
+    else:
+        driver.refresh()
+    if detached:
+        wait_until(driver, new_document(), timeout, name, recorder=recorder)
+
+def document_ready():
+    """The document finished parsing"""
+    return _script_condition(
+        "return document.readyState === 'complete' || document.readyState === 'interactive';"
+    )
+
+def login_form_ready():
+    """Both login fields are rendered and visible"""
+    return _script_condition(scripts.LOGIN_FORM_READY)
+
+def login_finished():
+    """The login form disappeared ("done") or the panel shows a login error ("error")"""
+    return _script_condition(scripts.LOGIN_FINISHED)
+
+def panel_ready(button_text="更新"):
+    """An admin panel button whose text contains button_text is rendered"""
+    return _script_condition(scripts.PANEL_READY, button_text)
+
+def dialog_visible():
+    """A confirmation dialog is visible"""
+    return _script_condition(scripts.ANY_VISIBLE, scripts.DIALOG_SELECTOR)
+
+def dialog_closed():
+    """No confirmation dialog is visible anymore"""
+    visible = dialog_visible()
+
+    def condition(driver):
+        return visible(driver) is False
+    return condition
+
+def overlays_cleared():
+    """No dialog and no toast message is visible, so the next action starts from a clean page"""
+    visible = _script_condition(scripts.ANY_VISIBLE, f"{scripts.DIALOG_SELECTOR}, {scripts.TOAST_SELECTOR}")
+
+    def condition(driver):
+        return visible(driver) is False
+    return condition